@@ -1,5 +1,8 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routes import router
+from .routes import router, startup_hooks, shutdown_hooks
+from .services.llm_client import http_client
+from .services.startup import start_startup_tasks, stop_startup_tasks, run_shutdown_hooks
 from .services.utils import get_env
 
 ENV = get_env("ENV", "dev")  # dev | prod
@@ -8,7 +11,19 @@ docs_url = "/docs" if ENV == "dev" else None
 redoc_url = "/redoc" if ENV == "dev" else None
 openapi_url = "/openapi.json" if ENV == "dev" else None
 
+# Arranque: las tareas pesadas de los proyectos (indexado, scraping) se lanzan en
+# background, de modo que el worker acepta peticiones (/health) de inmediato.
+# Apagado: primero los shutdown() de los proyectos (pueden necesitar el LLM), después el cliente HTTP.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_startup_tasks(startup_hooks)
+    yield
+    await stop_startup_tasks()
+    await run_shutdown_hooks(shutdown_hooks)
+    await http_client.aclose()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="LangChain Lab - AI Server",
     description="""
     Servidor de experimentación con modelos de IA, RAG y agentes.
@@ -1,33 +1,76 @@
+import importlib
 from fastapi import APIRouter
-from .services.llm_client import llm
-from projects.A1_chat_structured.router import router as a1_router
-from projects.A2_output_parser.router import router as a2_router
-from projects.A3_rag_basic.router import router as a3_router
-from projects.A3_rag_basic_v2.router import router as a3v2_router
-from projects.A4_rag_advanced.router import router as a4_router
-from projects.A4_rag_advanced_v2.router import router as a4v2_router
-from projects.A5_chains_routers.router import router as a5_router
-from projects.A6_memory.router import router as a6_router
+from fastapi.responses import JSONResponse
+from .services.llm_client import llm, llm_stats
+from .services.retrieval import retrieval_executor
+from .services.embedding_cache import query_embedding_cache
+from .services.answer_cache import answer_cache
+from .services.embedding_store import get_embedding_store
+from .services.bm25 import bm25_stats
+from .services.reranker import reranker_stats
+from .services.startup import startup_status, startup_ready
+from .services.index_state import index_states, indexes_ready
+from config_base import ENABLED_PROJECTS
 
 
 router = APIRouter()
 
+# Módulo del router de cada mini-proyecto
+PROJECT_ROUTERS = {
+    "A1": "projects.A1_chat_structured.router",
+    "A2": "projects.A2_output_parser.router",
+    "A3": "projects.A3_rag_basic.router",
+    "A3v2": "projects.A3_rag_basic_v2.router",
+    "A4": "projects.A4_rag_advanced.router",
+    "A4v2": "projects.A4_rag_advanced_v2.router",
+    "A5": "projects.A5_chains_routers.router",
+    "A6": "projects.A6_memory.router",
+}
+
+# Funciones startup() / shutdown() de los proyectos habilitados (las ejecuta el lifespan de app/main.py)
+startup_hooks = {}
+shutdown_hooks = {}
+
+# Liveness: responde siempre, aunque los índices se estén construyendo
 @router.get("/health")
 def health():
     return {"status": "ok"}
 
+# Readiness: 200 cuando las tareas de arranque han terminado y todos los índices están listos, 503 mientras tanto
+@router.get("/ready")
+def ready():
+    body = {
+        "ready": startup_ready() and indexes_ready(),
+        "projects": startup_status(),
+        "indexes": index_states(),
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+# Métricas internas de los servicios compartidos (para dimensionar pools y cachés)
+@router.get("/stats")
+def stats():
+    return {
+        "retrieval": retrieval_executor.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "embedding_store": get_embedding_store().stats(),
+        "bm25": bm25_stats(),
+        "reranker": reranker_stats(),
+        "llm": llm_stats(),
+    }
+
 @router.get("/test-llm")
 async def test_llm():
     answer = await llm("Dime una frase corta divertida como un astronauta para confirmar conexión.")
     return {"response": answer}
 
-# Rutas de los mini-proyectos
-router.include_router(a1_router)
-router.include_router(a2_router)
-router.include_router(a3_router)
-router.include_router(a3v2_router)
-router.include_router(a4_router)
-router.include_router(a4v2_router)
-router.include_router(a5_router)
-router.include_router(a6_router)
-
+# Rutas de los mini-proyectos (solo los habilitados en ENABLED_PROJECTS)
+for name in ENABLED_PROJECTS:
+    if name not in PROJECT_ROUTERS:
+        raise ValueError(f"Proyecto desconocido en ENABLED_PROJECTS: {name}. Opciones: {', '.join(PROJECT_ROUTERS)}")
+    module = importlib.import_module(PROJECT_ROUTERS[name])
+    router.include_router(module.router)
+    if hasattr(module, "startup"):
+        startup_hooks[name] = module.startup
+    if hasattr(module, "shutdown"):
+        shutdown_hooks[name] = module.shutdown
@@ -0,0 +1,306 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass
+import numpy as np
+from config_base import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    DEFAULT_LLM_MODEL,
+)
+from .embedding_cache import normalize_text
+from .embedding_batcher import aembed_query
+from .llm_client import track_llm_models
+
+# ============================================================
+# Caché de respuestas para endpoints RAG
+# ============================================================
+# La llamada al LLM domina la latencia de /a3/ask, /a4/query y /a4v2/query.
+# Si llega la misma pregunta y se recuperan los mismos chunks con el mismo prompt
+# y el mismo modelo, la respuesta se reutiliza.
+#
+# Clave base: (endpoint, IDs de chunks recuperados, hash del prompt, modelo)
+#   - modo exacto: además debe coincidir la pregunta normalizada
+#   - modo similitud (opcional): basta con que la pregunta sea una paráfrasis cercana
+#     (similitud coseno >= umbral) de una pregunta ya cacheada con la misma clave base
+#
+# Solo se guardan respuestas del modelo de la clave: si ha respondido el fallback
+# (error del principal o hedging) la respuesta se devuelve pero no se cachea.
+#
+# Invalidación: cada colección tiene un número de versión que se incrementa cuando
+# el indexado añade chunks nuevos. Las respuestas guardadas con una versión anterior
+# se descartan automáticamente.
+
+# ==========================================================
+# Versiones de índice por colección
+# ==========================================================
+
+_index_versions: dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+def get_index_version(collection_name: str) -> int:
+    return _index_versions.get(collection_name, 0)
+
+# Se llama desde el indexado cuando se añaden chunks a una colección.
+def bump_index_version(collection_name: str) -> int:
+    with _versions_lock:
+        version = _index_versions.get(collection_name, 0) + 1
+        _index_versions[collection_name] = version
+    answer_cache.invalidate_collection(collection_name)
+    return version
+
+# Hash estable del texto de un PromptTemplate (o de un string).
+# Acepta una tupla de plantillas si la respuesta pasa por varios prompts.
+def template_hash(template) -> str:
+    templates = template if isinstance(template, tuple) else (template,)
+    text = "\x00".join(str(getattr(t, "template", t)) for t in templates)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+# Construye la clave base de una respuesta.
+def answer_key(endpoint: str, chunk_ids: list[str], template, model: str) -> tuple:
+    return (endpoint, tuple(chunk_ids), template_hash(template), model)
+
+
+# ==========================================================
+# Caché
+# ==========================================================
+
+@dataclass
+class _Entry:
+    answer: str
+    collection: str
+    version: int
+    expires_at: float | None
+    question_vec: np.ndarray | None
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float | None = None,
+        similarity_threshold: float | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        # clave base → preguntas normalizadas cacheadas (para el modo similitud)
+        self._by_base: dict[tuple, set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.fallback_skips = 0  # Respuestas no cacheadas porque las dio el modelo de fallback
+
+    # Busca una respuesta. question_vec solo es necesario en modo similitud.
+    def get(self, key: tuple, question: str, question_vec=None) -> str | None:
+        norm = normalize_text(question)
+        with self._lock:
+            entry = self._valid_entry((key, norm))
+            if entry is not None:
+                self._entries.move_to_end((key, norm))
+                self.hits += 1
+                return entry.answer
+
+            if self.similarity_threshold is not None and question_vec is not None:
+                match = self._most_similar(key, np.asarray(question_vec, dtype=np.float32))
+                if match is not None:
+                    self._entries.move_to_end((key, match))
+                    self.similar_hits += 1
+                    return self._entries[(key, match)].answer
+
+            self.misses += 1
+            return None
+
+    # Guarda una respuesta asociada a una versión del índice de la colección
+    # (por defecto la actual; conviene pasar la que había ANTES de recuperar el contexto).
+    def put(
+        self,
+        key: tuple,
+        question: str,
+        answer: str,
+        collection_name: str,
+        question_vec=None,
+        version: int | None = None,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        if version is None:
+            version = get_index_version(collection_name)
+        norm = normalize_text(question)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        vec = np.asarray(question_vec, dtype=np.float32) if question_vec is not None else None
+        with self._lock:
+            self._entries[(key, norm)] = _Entry(
+                answer=answer,
+                collection=collection_name,
+                version=version,
+                expires_at=expires_at,
+                question_vec=vec,
+            )
+            self._entries.move_to_end((key, norm))
+            self._by_base.setdefault(key, set()).add(norm)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+
+    # Elimina todas las respuestas que dependen de una colección.
+    def invalidate_collection(self, collection_name: str) -> None:
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.collection == collection_name]
+            for k in stale:
+                del self._entries[k]
+                self._forget(k)
+            self.invalidations += len(stale)
+
+    def record_fallback_skip(self) -> None:
+        with self._lock:
+            self.fallback_skips += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "fallback_skips": self.fallback_skips,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+    # ---- Helpers internos (llamar con el lock tomado) ----
+
+    # Devuelve la entrada si existe, no ha caducado y su versión de índice sigue vigente.
+    def _valid_entry(self, full_key: tuple) -> _Entry | None:
+        entry = self._entries.get(full_key)
+        if entry is None:
+            return None
+        expired = entry.expires_at is not None and entry.expires_at <= time.monotonic()
+        stale = entry.version != get_index_version(entry.collection)
+        if expired or stale:
+            del self._entries[full_key]
+            self._forget(full_key)
+            if stale:
+                self.invalidations += 1
+            return None
+        return entry
+
+    # Pregunta cacheada (misma clave base) más parecida por encima del umbral.
+    def _most_similar(self, key: tuple, vec: np.ndarray) -> str | None:
+        best, best_score = None, self.similarity_threshold
+        vec_norm = np.linalg.norm(vec) or 1.0
+        for norm in list(self._by_base.get(key, ())):
+            entry = self._valid_entry((key, norm))
+            if entry is None or entry.question_vec is None:
+                continue
+            other = entry.question_vec
+            score = float(np.dot(vec, other) / (vec_norm * (np.linalg.norm(other) or 1.0)))
+            if score >= best_score:
+                best, best_score = norm, score
+        return best
+
+    def _forget(self, full_key: tuple) -> None:
+        key, norm = full_key
+        questions = self._by_base.get(key)
+        if questions is not None:
+            questions.discard(norm)
+            if not questions:
+                del self._by_base[key]
+
+
+# Caché compartida por todo el proceso
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY_THRESHOLD)
+
+
+# ==========================================================
+# Helper para endpoints
+# ==========================================================
+
+# True si todas las llamadas al LLM de la generación las respondió el modelo de la clave.
+def _answered_by(models: list[str], model: str) -> bool:
+    if all(m == model for m in models):
+        return True
+    answer_cache.record_fallback_skip()
+    return False
+
+# Devuelve la respuesta cacheada o ejecuta generate() (la llamada al LLM) y la guarda.
+# generate es una función sin argumentos que devuelve una corrutina con la respuesta.
+async def cached_llm_answer(
+    endpoint: str,
+    collection_name: str,
+    chunk_ids: list[str],
+    template,
+    question: str,
+    generate,
+    embedding_model: str | None = None,
+    model: str | None = None,
+) -> str:
+    # La versión se lee antes de generar: si el índice cambia mientras tanto, la respuesta nace caducada
+    version = get_index_version(collection_name)
+    model = model or DEFAULT_LLM_MODEL
+    key = answer_key(endpoint, chunk_ids, template, model)
+
+    question_vec = None
+    if answer_cache.similarity_threshold is not None:
+        question_vec = await aembed_query(question, embedding_model)
+
+    cached = answer_cache.get(key, question, question_vec)
+    if cached is not None:
+        return cached
+
+    with track_llm_models() as models:
+        answer = await generate()
+    if _answered_by(models, model):
+        answer_cache.put(key, question, answer, collection_name, question_vec, version=version)
+    return answer
+
+# Versión streaming de cached_llm_answer: si hay respuesta cacheada se emite de una vez;
+# si no, se reenvían los tokens de stream() y al terminar se guarda la respuesta completa.
+# stream es una función sin argumentos que devuelve un generador async de tokens.
+async def cached_llm_stream(
+    endpoint: str,
+    collection_name: str,
+    chunk_ids: list[str],
+    template,
+    question: str,
+    stream,
+    embedding_model: str | None = None,
+    model: str | None = None,
+):
+    version = get_index_version(collection_name)
+    model = model or DEFAULT_LLM_MODEL
+    key = answer_key(endpoint, chunk_ids, template, model)
+
+    question_vec = None
+    if answer_cache.similarity_threshold is not None:
+        question_vec = await aembed_query(question, embedding_model)
+
+    cached = answer_cache.get(key, question, question_vec)
+    if cached is not None:
+        yield cached
+        return
+
+    # El registro de modelos se activa solo mientras avanza stream() (nunca a través de un yield
+    # de este generador), para que set/reset ocurran siempre en el mismo contexto
+    tokens = []
+    models: list[str] = []
+    async with aclosing(stream()) as source:
+        while True:
+            with track_llm_models(models):
+                try:
+                    token = await source.__anext__()
+                except StopAsyncIteration:
+                    break
+            tokens.append(token)
+            yield token
+
+    # Solo se cachean respuestas completas (si el cliente corta el stream no llegamos aquí)
+    if _answered_by(models, model):
+        answer_cache.put(key, question, "".join(tokens).strip(), collection_name, question_vec, version=version)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+import zlib
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# Cola de tareas en background con orden por clave
+# ============================================================
+# Para sacar trabajo lento (p.ej. llamadas al LLM que no afectan a la
+# respuesta) del camino crítico de una petición:
+#   - submit(key, fn, *args) encola `await fn(*args)` y vuelve enseguida
+#   - las tareas se reparten en `shards` colas según la clave (crc32):
+#     cada cola tiene un único consumidor, así que las tareas de una
+#     misma clave (user_id, sesión...) se ejecutan EN ORDEN y sin solaparse
+#   - colas acotadas (maxsize): si una está llena, submit() espera a que
+#     haya hueco (backpressure) y se contabiliza en las métricas
+#   - flush() espera a que se vacíen (apagado del worker)
+# Los consumidores se crean en el primer submit(), dentro del event loop.
+
+
+class ShardedTaskQueue:
+    def __init__(self, name: str, shards: int = 4, maxsize: int = 1000):
+        self.name = name
+        self.shards = shards
+        self.maxsize = maxsize
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+        self.enqueued = 0
+        self.started = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.backpressure_waits = 0
+        self._backpressure_time = 0.0
+        self._lag_time = 0.0  # tiempo total desde submit() hasta que empieza la tarea
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.maxsize) for _ in range(self.shards)]
+        self._workers = [
+            asyncio.create_task(self._worker(queue), name=f"{self.name}-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+
+    def _queue_for(self, key: str) -> asyncio.Queue:
+        return self._queues[zlib.crc32(str(key).encode("utf-8")) % self.shards]
+
+    # Encola `await fn(*args)`. Solo espera si la cola de esa clave está llena.
+    async def submit(self, key: str, fn: Callable[..., Awaitable], *args):
+        self._ensure_workers()
+        queue = self._queue_for(key)
+        if queue.full():
+            self.backpressure_waits += 1
+            start = time.perf_counter()
+            await queue.put((fn, args, time.perf_counter()))
+            self._backpressure_time += time.perf_counter() - start
+        else:
+            queue.put_nowait((fn, args, time.perf_counter()))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, queue.qsize())
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            fn, args, enqueued_at = await queue.get()
+            self.started += 1
+            self._lag_time += time.perf_counter() - enqueued_at
+            try:
+                await fn(*args)
+            except Exception:
+                self.failed += 1
+                logger.exception("Error en una tarea de la cola %s", self.name)
+            finally:
+                self.processed += 1
+                queue.task_done()
+
+    # Espera (hasta `timeout` segundos) a que se procesen las tareas pendientes y para los consumidores.
+    async def flush(self, timeout: float | None = None):
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cola %s: %d tareas sin procesar al apagar", self.name, self.depth())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers, self._queues = [], []
+
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self) -> dict:
+        return {
+            "shards": self.shards,
+            "maxsize": self.maxsize,
+            "depth": [queue.qsize() for queue in self._queues],
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "backpressure_waits": self.backpressure_waits,
+            "avg_backpressure_ms": round(self._backpressure_time * 1000 / self.backpressure_waits, 1) if self.backpressure_waits else 0.0,
+            "avg_lag_ms": round(self._lag_time * 1000 / self.started, 1) if self.started else 0.0,
+        }
@@ -0,0 +1,151 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from config_base import BM25_K1, BM25_B, CHROMA_ID_LOOKUP_BATCH
+
+# ============================================================
+# Índice invertido BM25 en memoria (búsqueda léxica)
+# ============================================================
+# Complementa la búsqueda vectorial de Chroma con coincidencias exactas
+# de términos (códigos de error, nombres propios, siglas...), que los
+# embeddings pequeños suelen diluir. Se mantiene uno por colección con
+# los MISMOS chunks que la colección:
+#   - la primera vez que se usa se carga desde Chroma (ensure_loaded, una sola vez)
+#   - index_chunks() le añade los chunks nuevos de cada lote
+#   - el indexado le quita los chunks obsoletos que borra de Chroma
+# La fusión con los resultados vectoriales está en hybrid.py.
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+# Minúsculas, sin acentos, separando por caracteres no alfanuméricos.
+# Se descartan tokens de una letra salvo dígitos.
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [tok for tok in _TOKEN_RE.findall(text) if len(tok) > 1 or tok.isdigit()]
+
+
+class BM25Index:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.loaded = False  # True cuando ya se ha cargado desde la colección
+        # Cada documento ocupa un "slot" entero (más compacto que repetir el ID en cada posting)
+        self._postings: dict[str, dict[int, int]] = {}  # término → {slot: frecuencia}
+        self._slots: dict[str, int] = {}                 # ID de chunk → slot
+        self._ids: list[str | None] = []                 # slot → ID de chunk
+        self._terms: list[tuple[str, ...]] = []          # slot → términos (para poder borrarlo)
+        self._lengths: list[int] = []                    # slot → nº de tokens
+        self._free: list[int] = []                       # slots libres reutilizables
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # Una sola carga desde Chroma aunque lleguen varias consultas a la vez
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # Añade (o reemplaza) chunks.
+    def add(self, ids: list[str], texts: list[str]):
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            for chunk_id, counts in zip(ids, tokenized):
+                if chunk_id in self._slots:
+                    self._remove(chunk_id)
+                slot = self._free.pop() if self._free else len(self._ids)
+                if slot == len(self._ids):
+                    self._ids.append(None)
+                    self._terms.append(())
+                    self._lengths.append(0)
+                length = sum(counts.values())
+                self._ids[slot] = chunk_id
+                self._terms[slot] = tuple(counts)
+                self._lengths[slot] = length
+                self._slots[chunk_id] = slot
+                self._total_length += length
+                for term, freq in counts.items():
+                    self._postings.setdefault(term, {})[slot] = freq
+
+    def remove(self, ids: list[str]):
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._slots:
+                    self._remove(chunk_id)
+
+    def _remove(self, chunk_id: str):
+        slot = self._slots.pop(chunk_id)
+        for term in self._terms[slot]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths[slot]
+        self._ids[slot], self._terms[slot], self._lengths[slot] = None, (), 0
+        self._free.append(slot)
+
+    # Los k chunks con mayor puntuación BM25 para la consulta: [(id, score), ...]
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._slots)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slot, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / avg_length)
+                    scores[slot] = scores.get(slot, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._ids[slot], score) for slot, score in best]
+
+    # Carga todos los chunks de una colección Chroma (paginando, sin embeddings).
+    def load_from(self, collection, batch_size: int = CHROMA_ID_LOOKUP_BATCH):
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            self.add(page["ids"], [doc or "" for doc in page["documents"]])
+
+    # Carga el índice la primera vez. Las llamadas concurrentes esperan a esa única carga
+    # (nunca buscan en un índice a medio cargar) en lugar de recorrer la colección cada una.
+    def ensure_loaded(self, collection):
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load_from(collection)
+                self.loaded = True
+
+    def stats(self) -> dict:
+        return {"documents": len(self._slots), "terms": len(self._postings)}
+
+
+# Registro: nombre de colección → índice BM25
+_indexes: dict[str, BM25Index] = {}
+_registry_lock = threading.Lock()
+
+
+def get_bm25_index(name: str) -> BM25Index:
+    with _registry_lock:
+        if name not in _indexes:
+            _indexes[name] = BM25Index()
+        return _indexes[name]
+
+
+# Índice BM25 de la colección, cargándolo desde Chroma la primera vez (bloqueante).
+def ensure_bm25_index(collection) -> BM25Index:
+    index = get_bm25_index(collection.name)
+    index.ensure_loaded(collection)
+    return index
+
+
+def bm25_stats() -> dict:
+    return {name: index.stats() for name, index in _indexes.items()}
@@ -0,0 +1,87 @@
+import logging
+import threading
+from config_base import CHROMA_PATH, CHROMA_HNSW_DEFAULTS, CHROMA_HNSW_OVERRIDES
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# Cliente ChromaDB y registro de colecciones compartidos
+# ============================================================
+# Un único PersistentClient por proceso sobre CHROMA_PATH (varios clientes
+# sobre el mismo directorio duplican memoria y compiten por el lock de SQLite).
+# Los mini-proyectos piden sus colecciones por nombre con get_collection(),
+# o declaran un LazyCollection en su chroma_client.py (no abre Chroma al importar).
+#
+# Parámetros HNSW: CHROMA_HNSW_DEFAULTS + CHROMA_HNSW_OVERRIDES[nombre]
+# (o los que se pasen explícitamente). Se guardan como metadatos "hnsw:*"
+# al crear la colección; si una colección existente se creó con otros
+# valores se avisa en el log (hay que borrarla y reindexar para aplicarlos).
+
+_client = None
+_collections = {}
+_lock = threading.Lock()
+
+
+# Devuelve el cliente compartido (se crea la primera vez que se pide).
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                # Import diferido: chromadb solo se carga si algún proyecto usa colecciones
+                import chromadb
+
+                _client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _client
+
+
+# Parámetros HNSW efectivos de una colección, como metadatos de Chroma.
+def hnsw_metadata(name: str, hnsw: dict | None = None) -> dict:
+    params = {**CHROMA_HNSW_DEFAULTS, **CHROMA_HNSW_OVERRIDES.get(name, {}), **(hnsw or {})}
+    return {f"hnsw:{key}": value for key, value in params.items()}
+
+
+def _collection_names(client) -> set[str]:
+    # Según la versión de chromadb, list_collections() devuelve nombres u objetos Collection
+    return {getattr(c, "name", c) for c in client.list_collections()}
+
+
+# Devuelve (creándola si no existe) la colección `name`.
+def get_collection(name: str, hnsw: dict | None = None):
+    collection = _collections.get(name)
+    if collection is not None:
+        return collection
+
+    client = get_client()
+    with _lock:
+        collection = _collections.get(name)
+        if collection is not None:
+            return collection
+
+        metadata = hnsw_metadata(name, hnsw)
+        if name in _collection_names(client):
+            collection = client.get_collection(name)
+            current = collection.metadata or {}
+            different = {k: v for k, v in metadata.items() if k in current and current[k] != v}
+            if different:
+                logger.warning(
+                    "La colección '%s' se creó con otros parámetros HNSW (%s); reconstrúyela para aplicar %s",
+                    name, {k: current[k] for k in different}, different,
+                )
+        else:
+            collection = client.get_or_create_collection(name, metadata=metadata)
+
+        _collections[name] = collection
+    return collection
+
+
+# Referencia perezosa a una colección: se resuelve con get_collection() en el primer uso.
+# Permite declarar `collection = LazyCollection(NOMBRE)` a nivel de módulo sin abrir
+# Chroma al importar el router (arranque rápido de los workers).
+class LazyCollection:
+    def __init__(self, name: str, hnsw: dict | None = None):
+        self.name = name
+        self.hnsw = hnsw
+
+    def __getattr__(self, attr):
+        return getattr(get_collection(self.name, self.hnsw), attr)
@@ -0,0 +1,105 @@
+import asyncio
+from config_base import (
+    DEFAULT_EMBEDDING_MODEL,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+)
+from .embeddings import embed_documents
+from .embedding_cache import query_embedding_cache
+
+# ============================================================
+# Micro-batching de embeddings para consultas concurrentes
+# ============================================================
+# Las peticiones RAG (/a3/ask, /a4/query, ...) ya no llaman a encode() una a una
+# dentro del event loop. Cada pregunta se encola y un worker:
+#   1. Espera unos milisegundos (o hasta N preguntas) para formar un lote.
+#   2. Ejecuta UNA sola llamada a encode() en un hilo aparte.
+#   3. Resuelve el future de cada petición con su vector.
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        model_name: str,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS,
+    ):
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    # Crea la cola y el worker en el event loop actual (o los recrea si el loop cambió)
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    # Encola un texto y espera a que el worker devuelva su vector.
+    async def embed(self, text: str) -> list[float]:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    # Bucle del worker: agrupa textos y los codifica en lote.
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # Seguimos recogiendo textos hasta llenar el lote o agotar la ventana de espera
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Los callers que ya cancelaron su petición no necesitan vector
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                # encode() es bloqueante (CPU): lo ejecutamos fuera del event loop
+                vectors = await asyncio.to_thread(embed_documents, texts, self.model_name)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+# Un batcher por modelo de embeddings
+_batchers: dict[str, EmbeddingBatcher] = {}
+
+# Devuelve (o crea) el batcher asociado a un modelo.
+def get_batcher(model_name: str | None = None) -> EmbeddingBatcher:
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+    if name not in _batchers:
+        _batchers[name] = EmbeddingBatcher(name)
+    return _batchers[name]
+
+# Versión async de embed_query: si la pregunta no está en caché,
+# se codifica junto a las demás peticiones concurrentes.
+async def aembed_query(text: str, model_name: str | None = None) -> list[float]:
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+    cached = query_embedding_cache.get(name, text)
+    if cached is not None:
+        return cached.tolist()
+
+    vector = await get_batcher(name).embed(text)
+    query_embedding_cache.put(name, text, vector)
+    return vector
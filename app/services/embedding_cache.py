@@ -0,0 +1,88 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from config_base import QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL
+
+# ============================================================
+# Caché LRU + TTL de embeddings de consultas
+# ============================================================
+# Los usuarios repiten (casi) las mismas preguntas. En vez de volver a llamar
+# a encode() se guarda el vector de cada pregunta:
+#   - clave: (modelo, texto normalizado)
+#   - valor: np.ndarray float32 (mucho más compacto que una lista de floats Python)
+# Compartida por todos los mini-proyectos RAG (A3–A5).
+
+# Normaliza la pregunta para que variaciones triviales (Unicode, espacios) compartan entrada.
+# No se ignoran mayúsculas: en un modelo cased "Apple" y "apple" dan vectores distintos.
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, str], tuple[np.ndarray, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Devuelve el vector cacheado o None si no existe / ha caducado.
+    def get(self, model_name: str, text: str) -> np.ndarray | None:
+        key = (model_name, normalize_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            vector, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # Marcamos la entrada como usada recientemente
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    # Guarda el vector de una pregunta (como float32), expulsando la menos usada si no hay sitio.
+    def put(self, model_name: str, text: str, vector) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (model_name, normalize_text(text))
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (np.asarray(vector, dtype=np.float32), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Caché compartida por todo el proceso
+query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
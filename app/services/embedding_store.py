@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+from config_base import DEFAULT_EMBEDDING_MODEL, EMBEDDING_STORE_ENABLED, EMBEDDING_STORE_PATH
+from .embeddings import embed_documents
+
+# ============================================================
+# Almacén persistente de embeddings de documentos
+# ============================================================
+# Direccionado por contenido: clave = (sha256 del texto, modelo),
+# valor = vector float32 serializado. Se consulta antes de llamar a
+# encode(), de modo que:
+#   - reconstruir una colección borrada no vuelve a embeber nada
+#   - el mismo fichero indexado en dos colecciones (A4 y A4v2 comparten
+#     cnn.txt, llm.txt, ...) solo se embebe una vez
+# Solo guarda chunks de indexado; las consultas usan la caché en memoria
+# de embedding_cache.py.
+
+# Máximo de parámetros por consulta "IN (...)" (límite de SQLite)
+_SQL_BATCH = 500
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Los indexados en background corren en hilos distintos: una conexión compartida protegida con lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                text_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (text_hash, model)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Vectores guardados para esos hashes (solo los que existen).
+    def get_many(self, model_name: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                part = unique[i:i + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [model_name, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name: str, vectors: dict[str, np.ndarray]):
+        rows = []
+        for text_hash, vector in vectors.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((text_hash, model_name, vector.shape[0], vector.tobytes()))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, model, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    # Los indexados de varias colecciones pueden correr a la vez en hilos distintos
+    def record_lookups(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+# Instancia compartida (se abre la primera vez que se usa)
+_store: EmbeddingStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> EmbeddingStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore(EMBEDDING_STORE_PATH)
+    return _store
+
+
+# Igual que embed_documents() pero reutilizando los vectores ya calculados:
+# solo se pasan a encode() los textos que no están en el almacén.
+def embed_documents_cached(texts: list[str], model_name: str | None = None) -> list[list[float]]:
+    if not texts or not EMBEDDING_STORE_ENABLED:
+        return embed_documents(texts, model_name)
+
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+    store = get_embedding_store()
+    hashes = [text_sha256(text) for text in texts]
+    found = store.get_many(name, hashes)
+
+    missing = {}  # hash → texto (sin duplicados)
+    for text_hash, text in zip(hashes, texts):
+        if text_hash not in found:
+            missing.setdefault(text_hash, text)
+    store.record_lookups(len(texts) - len(missing), len(missing))
+
+    if missing:
+        new_vectors = embed_documents(list(missing.values()), name)
+        computed = {text_hash: np.asarray(vector, dtype=np.float32) for text_hash, vector in zip(missing, new_vectors)}
+        store.put_many(name, computed)
+        found.update(computed)
+
+    return [found[text_hash].tolist() for text_hash in hashes]
@@ -0,0 +1,50 @@
+import threading
+from config_base import DEFAULT_EMBEDDING_MODEL
+from .embedding_cache import query_embedding_cache
+
+# ============================================================
+# Servicio de embeddings compartido por todo el proceso
+# ============================================================
+# Cada modelo SentenceTransformer se carga UNA sola vez por proceso
+# (clave = nombre del modelo) y lo reutilizan todos los mini-proyectos.
+# Así evitamos tener varias copias del mismo modelo en memoria.
+
+_models = {}
+_lock = threading.Lock()
+
+# Devuelve el modelo de embeddings cargado (lo carga la primera vez que se pide).
+def get_embedding_model(model_name: str | None = None):
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    # El lock evita que dos hilos (p.ej. indexados en background) carguen el mismo modelo a la vez
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            # Import diferido: sentence-transformers (y torch) solo se cargan si alguien pide embeddings
+            from sentence_transformers import SentenceTransformer
+
+            print(f"[Embeddings] Cargando modelo '{name}'...")
+            model = SentenceTransformer(name)
+            _models[name] = model
+    return model
+
+# Convierte una lista de textos (chunks, documentos) en vectores.
+def embed_documents(texts: list[str], model_name: str | None = None) -> list[list[float]]:
+    if not texts:
+        return []
+    return get_embedding_model(model_name).encode(texts).tolist()
+
+# Convierte una pregunta en un único vector (usando la caché de consultas).
+def embed_query(text: str, model_name: str | None = None) -> list[float]:
+    name = model_name or DEFAULT_EMBEDDING_MODEL
+    cached = query_embedding_cache.get(name, text)
+    if cached is not None:
+        return cached.tolist()
+
+    vector = get_embedding_model(name).encode([text])[0]
+    query_embedding_cache.put(name, text, vector)
+    return vector.tolist()
@@ -0,0 +1,79 @@
+import numpy as np
+from config_base import HYBRID_RETRIEVAL_ENABLED, HYBRID_CANDIDATES, HYBRID_RRF_K
+from .bm25 import ensure_bm25_index
+from .retrieval import run_retrieval
+
+# ============================================================
+# Recuperación híbrida: vectorial (Chroma) + léxica (BM25)
+# ============================================================
+# Cada retriever devuelve sus HYBRID_CANDIDATES mejores chunks y se
+# fusionan con Reciprocal Rank Fusion:
+#
+#   score(chunk) = Σ 1 / (HYBRID_RRF_K + posición en cada lista)
+#
+# RRF solo usa posiciones, así que no hace falta normalizar escalas
+# (distancias vs. puntuaciones BM25). El resultado tiene el mismo
+# formato que collection.query() (listas de listas), de modo que los
+# proyectos solo cambian la llamada. Para los chunks que solo encontró
+# BM25 se calcula su distancia real al vector de la pregunta, para que
+# el "score" de las fuentes siga significando lo mismo.
+
+
+# Fusiona varias listas ordenadas de IDs (Reciprocal Rank Fusion).
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = HYBRID_RRF_K) -> list[str]:
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for position, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + position + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# Distancia entre la pregunta y un embedding según el espacio HNSW de la colección.
+def _distance(query_vec: np.ndarray, vector, space: str) -> float:
+    vector = np.asarray(vector, dtype=np.float32)
+    if space == "cosine":
+        norm = float(np.linalg.norm(query_vec) * np.linalg.norm(vector)) or 1.0
+        return 1.0 - float(np.dot(query_vec, vector)) / norm
+    if space == "ip":
+        return 1.0 - float(np.dot(query_vec, vector))
+    return float(np.sum((query_vec - vector) ** 2))  # l2 (Chroma devuelve la distancia al cuadrado)
+
+
+async def hybrid_query(collection, question: str, query_vec: list[float], n_results: int) -> dict:
+    if not HYBRID_RETRIEVAL_ENABLED:
+        return await run_retrieval(collection.query, query_embeddings=[query_vec], n_results=n_results)
+
+    candidates = max(n_results, HYBRID_CANDIDATES)
+    lexical = await run_retrieval(ensure_bm25_index, collection)
+    dense = await run_retrieval(collection.query, query_embeddings=[query_vec], n_results=candidates)
+
+    dense_ids = dense.get("ids", [[]])[0]
+    found = {
+        chunk_id: (doc, meta, dist)
+        for chunk_id, doc, meta, dist in zip(
+            dense_ids,
+            dense.get("documents", [[]])[0],
+            dense.get("metadatas", [[]])[0],
+            dense.get("distances", [[]])[0],
+        )
+    }
+    sparse_ids = [chunk_id for chunk_id, _ in lexical.search(question, candidates)]
+    fused = reciprocal_rank_fusion([dense_ids, sparse_ids])[:n_results]
+
+    # Chunks encontrados solo por BM25: documento, metadatos y embedding desde Chroma
+    missing = [chunk_id for chunk_id in fused if chunk_id not in found]
+    if missing:
+        extra = await run_retrieval(collection.get, ids=missing, include=["documents", "metadatas", "embeddings"])
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        query = np.asarray(query_vec, dtype=np.float32)
+        for chunk_id, doc, meta, emb in zip(extra["ids"], extra["documents"], extra["metadatas"], extra["embeddings"]):
+            found[chunk_id] = (doc, meta, _distance(query, emb, space))
+
+    # Un ID puede faltar si se borró de Chroma entre la búsqueda BM25 y el get
+    fused = [chunk_id for chunk_id in fused if chunk_id in found]
+    return {
+        "ids": [fused],
+        "documents": [[found[chunk_id][0] for chunk_id in fused]],
+        "metadatas": [[found[chunk_id][1] for chunk_id in fused]],
+        "distances": [[found[chunk_id][2] for chunk_id in fused]],
+    }
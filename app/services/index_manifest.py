@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+# ============================================================
+# Manifiesto de ficheros indexados
+# ============================================================
+# Guarda, por cada fichero de /data ya indexado:
+#   (tamaño, mtime, hash SHA-256 del contenido, IDs de sus chunks)
+# Permite saltarse la carga, el chunking y el hashing de los ficheros que
+# no han cambiado, y saber qué chunks borrar cuando un fichero se edita o
+# se elimina. Se persiste como JSON junto a CHROMA_PATH.
+
+# Hash SHA-256 del contenido de un fichero (leído por bloques).
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileManifest:
+    def __init__(self, manifest_path: str, base_dir: str):
+        self.manifest_path = manifest_path
+        self.base_dir = base_dir
+        self.files: dict[str, dict] = {}
+        self.load()
+
+    # Las claves se guardan relativas a base_dir para que el manifiesto siga siendo válido si se mueve el repo
+    def _key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.base_dir)
+
+    def load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.files = {}
+
+    # Escritura atómica: nunca queda un manifiesto a medio escribir
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def reset(self):
+        self.files = {}
+
+    # Clasifica los ficheros actuales en:
+    #   - changed: nuevos o modificados (hay que cargarlos y trocearlos)
+    #   - removed: estaban en el manifiesto pero ya no existen (rutas relativas)
+    # Si solo cambia el mtime pero el contenido es idéntico, se actualiza el mtime y no se reprocesa.
+    def diff(self, paths: list[str]) -> tuple[list[str], list[str]]:
+        changed = []
+        current = set()
+        for path in paths:
+            key = self._key(path)
+            current.add(key)
+            stat = os.stat(path)
+            entry = self.files.get(key)
+
+            if entry is None or entry["size"] != stat.st_size:
+                changed.append(path)
+                continue
+            if entry["mtime"] == stat.st_mtime:
+                continue
+            if entry["sha256"] == file_sha256(path):
+                entry["mtime"] = stat.st_mtime
+                continue
+            changed.append(path)
+
+        removed = [key for key in self.files if key not in current]
+        return changed, removed
+
+    # Registra (o reemplaza) la entrada de un fichero procesado.
+    def record(self, path: str, chunk_ids: list[str]):
+        stat = os.stat(path)
+        self.files[self._key(path)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": file_sha256(path),
+            "chunk_ids": chunk_ids,
+        }
+
+    # IDs de chunks de un fichero según el manifiesto (path absoluto o clave relativa).
+    def chunk_ids(self, path_or_key: str) -> list[str]:
+        key = path_or_key if path_or_key in self.files else self._key(path_or_key)
+        return self.files.get(key, {}).get("chunk_ids", [])
+
+    def forget(self, key: str):
+        self.files.pop(key, None)
+
+    # Todos los IDs de chunks referenciados por algún fichero del manifiesto.
+    def referenced_ids(self) -> set[str]:
+        return {chunk_id for entry in self.files.values() for chunk_id in entry["chunk_ids"]}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from config_base import INDEX_NOT_READY_WAIT
+
+# ============================================================
+# Estado de los índices de cada mini-proyecto
+# ============================================================
+# Máquina de estados por colección:
+#
+#   pending → building → ready
+#                      ↘ failed
+#
+# El indexado (que corre en un hilo) informa del progreso (chunks
+# procesados / total y, si se conoce, ficheros) y de aquí se calcula
+# el ETA. Los endpoints de consulta usan la dependencia
+# require_index_ready(): mientras el índice no está listo esperan
+# hasta INDEX_NOT_READY_WAIT segundos y, si sigue sin estarlo,
+# responden 503 (el balanceador solo enruta a workers "calientes").
+
+PENDING, BUILDING, READY, FAILED = "pending", "building", "ready", "failed"
+
+
+class IndexState:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = PENDING
+        self.chunks_done = 0
+        self.chunks_total: int | None = None
+        self.files_done = 0
+        self.files_total: int | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    # ---------- Transiciones (se llaman desde el hilo del indexado) ----------
+
+    def start(self, chunks_total: int | None = None, files_total: int | None = None):
+        with self._lock:
+            self.state = BUILDING
+            self.chunks_done, self.chunks_total = 0, chunks_total
+            self.files_done, self.files_total = 0, files_total
+            self.started_at, self.finished_at, self.error = time.time(), None, None
+
+    # Compatible con el callback on_progress(processed, added) de index_chunks()
+    def progress(self, chunks_done: int, added: int | None = None):
+        with self._lock:
+            self.chunks_done = chunks_done
+
+    def file_done(self):
+        with self._lock:
+            self.files_done += 1
+
+    def finish(self):
+        self._complete(READY)
+
+    def fail(self, error: Exception):
+        self._complete(FAILED, str(error))
+
+    def _complete(self, state: str, error: str | None = None):
+        with self._lock:
+            self.state = state
+            self.error = error
+            self.finished_at = time.time()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    # Marca el índice como "building" mientras dura el bloque; "ready" al terminar o "failed" si hay excepción.
+    @contextmanager
+    def building(self, chunks_total: int | None = None, files_total: int | None = None):
+        self.start(chunks_total, files_total)
+        try:
+            yield self
+        except Exception as e:
+            self.fail(e)
+            raise
+        self.finish()
+
+    # ---------- Consulta ----------
+
+    @property
+    def done(self) -> bool:
+        return self.state in (READY, FAILED)
+
+    # Total de chunks: el real si se conoce; si no, estimado por la proporción de ficheros procesados
+    def _estimated_total(self) -> int | None:
+        if self.chunks_total is not None:
+            return self.chunks_total
+        if self.files_total and self.files_done:
+            return round(self.chunks_done * self.files_total / self.files_done)
+        return None
+
+    # Copia coherente del progreso (el indexado lo actualiza desde otro hilo).
+    def snapshot(self) -> dict:
+        with self._lock:
+            state, started_at, error = self.state, self.started_at, self.error
+            chunks_done, files_done, files_total = self.chunks_done, self.files_done, self.files_total
+            total = self._estimated_total()
+        eta = None
+        if state == BUILDING and total and chunks_done:
+            elapsed = time.time() - started_at
+            eta = round(max(total - chunks_done, 0) * elapsed / chunks_done, 1)
+        return {
+            "state": state,
+            "chunks_done": chunks_done,
+            "chunks_total": total,
+            "files_done": files_done if files_total is not None else None,
+            "files_total": files_total,
+            "eta_seconds": eta,
+            "error": error,
+        }
+
+    # Espera (sin bloquear el event loop) a que el indexado termine. Devuelve True si está listo.
+    async def wait_ready(self, timeout: float) -> bool:
+        if not self.done and timeout > 0:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if not self.done:
+                    self._waiters.append((loop, future))
+                else:
+                    future.set_result(None)
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._waiters = [w for w in self._waiters if w[1] is not future]
+        return self.state == READY
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Registro global: nombre de colección → estado
+_states: dict[str, IndexState] = {}
+
+
+def get_index_state(name: str) -> IndexState:
+    if name not in _states:
+        _states[name] = IndexState(name)
+    return _states[name]
+
+
+def index_states() -> dict:
+    return {name: state.snapshot() for name, state in _states.items()}
+
+
+def indexes_ready() -> bool:
+    return all(state.state == READY for state in _states.values())
+
+
+# Dependencia FastAPI para los endpoints que consultan el índice `name`.
+# wait: segundos máximos de espera (por defecto INDEX_NOT_READY_WAIT; 0 = fallar al instante).
+def require_index_ready(name: str, wait: float | None = None):
+    async def _dependency():
+        state = get_index_state(name)
+        if await state.wait_ready(INDEX_NOT_READY_WAIT if wait is None else wait):
+            return
+        raise HTTPException(
+            status_code=503,
+            detail={"message": f"El índice '{name}' no está listo", **state.snapshot()},
+            headers={"Retry-After": "5"},
+        )
+    return _dependency
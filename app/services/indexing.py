@@ -0,0 +1,137 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable
+from config_base import CHROMA_ID_LOOKUP_BATCH, INDEX_BATCH_SIZE
+from .embedding_store import embed_documents_cached
+
+# ============================================================
+# Utilidades de indexado compartidas por los mini-proyectos RAG
+# ============================================================
+
+# Devuelve el subconjunto de `ids` que ya está almacenado en la colección.
+# En lugar de un collection.get() por chunk (N round-trips), consulta en lotes grandes;
+# y si hay más candidatos que documentos en la colección, es más barato listar la colección entera.
+def get_existing_ids(collection, ids: list[str], batch_size: int = CHROMA_ID_LOOKUP_BATCH) -> set[str]:
+    candidates = list(dict.fromkeys(ids))  # sin duplicados, manteniendo el orden
+    if not candidates:
+        return set()
+
+    total = collection.count()
+    if total == 0:
+        return set()
+
+    existing = set()
+    if total <= len(candidates):
+        # Recorremos todos los IDs de la colección paginando (sin documentos ni embeddings)
+        for offset in range(0, total, batch_size):
+            page = collection.get(include=[], limit=batch_size, offset=offset)
+            existing.update(page["ids"])
+        return existing & set(candidates)
+
+    for i in range(0, len(candidates), batch_size):
+        page = collection.get(ids=candidates[i:i + batch_size], include=[])
+        existing.update(page["ids"])
+    return existing
+
+
+# ============================================================
+# Pipeline de indexado por lotes
+# ============================================================
+# Los chunks llegan de un iterable (normalmente un generador que lee y trocea
+# los documentos de forma perezosa) y se procesan en lotes de tamaño fijo:
+#   dedup (IDs ya indexados) → embeddings (vía el almacén persistente) → upsert
+# Así nunca están en memoria todos los textos ni toda la matriz de embeddings.
+# Cada chunk es un dict {"id", "text", "metadata"}.
+
+def index_chunks(
+    collection,
+    chunks: Iterable[dict],
+    model_name: str | None = None,
+    batch_size: int = INDEX_BATCH_SIZE,
+    label: str = "",
+    on_progress: Callable[[int, int], None] | None = None,
+    lexical_index=None,
+) -> int:
+    start = time.perf_counter()
+    seen = set()  # IDs ya vistos en esta ejecución (un chunk puede repetirse entre documentos)
+    processed = 0
+    added = 0
+    batch = []
+
+    def _flush():
+        nonlocal added
+        added += _index_batch(collection, batch, model_name, lexical_index)
+        batch.clear()
+
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"[Index {label}] {processed} chunks procesados, {added} nuevos ({rate:.1f} chunks/s)")
+        if on_progress:
+            on_progress(processed, added)
+
+    for item in chunks:
+        if item["id"] in seen:
+            continue
+        seen.add(item["id"])
+        batch.append(item)
+        processed += 1
+        if len(batch) >= batch_size:
+            _flush()
+
+    if batch:
+        _flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"[Index {label}] Terminado: {added} chunks nuevos de {processed} en {elapsed:.1f}s")
+    return added
+
+# Procesa un lote: descarta los ya indexados, calcula embeddings y hace upsert.
+# Si se pasa lexical_index (BM25Index), los chunks nuevos también se añaden al índice léxico.
+def _index_batch(collection, batch: list[dict], model_name: str | None, lexical_index=None) -> int:
+    existing = get_existing_ids(collection, [item["id"] for item in batch])
+    new_items = [item for item in batch if item["id"] not in existing]
+    if not new_items:
+        return 0
+
+    ids = [item["id"] for item in new_items]
+    texts = [item["text"] for item in new_items]
+    metadatas = [item.get("metadata") for item in new_items]
+    collection.upsert(
+        ids=ids,
+        documents=texts,
+        embeddings=embed_documents_cached(texts, model_name),
+        metadatas=metadatas if all(metadatas) else None, # Chroma no admite metadatos vacíos
+    )
+    if lexical_index is not None:
+        lexical_index.add(ids, texts)
+    return len(new_items)
+
+
+# ============================================================
+# Carga y chunking en paralelo (varios procesos)
+# ============================================================
+
+# Aplica fn a cada elemento en un pool de procesos y devuelve los resultados EN ORDEN.
+# Solo se mantienen `max_pending` tareas en vuelo, así los workers van trabajando por
+# delante del consumidor (p.ej. el embebido) sin acumular todo el corpus en memoria.
+# fn debe ser una función de módulo (serializable con pickle).
+def parallel_map(fn: Callable, items: Iterable, workers: int, max_pending: int | None = None):
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+
+    max_pending = max_pending or workers * 2
+    items = iter(items)
+
+    # "spawn": no heredamos del proceso padre hilos ni el modelo de embeddings ya cargado
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque(pool.submit(fn, item) for item in islice(items, max_pending))
+        while pending:
+            result = pending.popleft().result()
+            for item in islice(items, 1):
+                pending.append(pool.submit(fn, item))
+            yield result
@@ -1,23 +1,196 @@
-from openai import AsyncOpenAI
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
 from langchain_openai import ChatOpenAI
 from .utils import get_env
-from config_base import DEFAULT_LLM_MODEL, FALLBACK_LLM_MODEL
+from config_base import (
+    DEFAULT_LLM_MODEL,
+    FALLBACK_LLM_MODEL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONCURRENCY_PER_MODEL,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_FALLBACK_ON_TIMEOUT,
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+)
 
 OPENROUTER_API_KEY = get_env("OPENROUTER_API_KEY")
 OPENROUTER_BASE_URL = get_env("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
-# Cliente OpenRouter compatible con AsyncOpenAI
+# Pool HTTP compartido (conexiones keep-alive reutilizadas entre peticiones)
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    ),
+    timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+)
+
+# Cliente OpenRouter compatible con AsyncOpenAI.
+# Los reintentos los gestionamos nosotros (backoff + fallback), por eso max_retries=0.
 client = AsyncOpenAI(
     api_key=OPENROUTER_API_KEY,
     base_url=OPENROUTER_BASE_URL,
+    http_client=http_client,
+    max_retries=0,
 )
 
+# ============================================================
+# Concurrencia, latencias y reintentos
+# ============================================================
+
+# Un semáforo por modelo para limitar las llamadas simultáneas
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+# Últimas latencias (segundos) de cada modelo, para calcular el umbral de hedging
+_latencies: dict[str, deque] = {}
+
+# Contadores sin lock: solo se modifican y se leen (GET /stats) desde el event loop del worker,
+# que es un único hilo. Si se llamara a llm() desde varios loops/hilos serían aproximados.
+_stats = {"calls": 0, "retries": 0, "fallbacks": 0, "hedges": 0, "hedges_won": 0}
+
+# Modelos que han respondido realmente (el fallback o el hedging pueden sustituir al pedido).
+# Lo rellenan llm() / llm_stream() si alguien lo está registrando con track_llm_models().
+_models_used: ContextVar[list | None] = ContextVar("llm_models_used", default=None)
+
+def _report_model(model: str):
+    models = _models_used.get()
+    if models is not None:
+        models.append(model)
+
+# Registra qué modelos responden a las llamadas a llm() / llm_stream() hechas dentro del bloque.
+# Lo usa la caché de respuestas para no guardar respuestas del fallback bajo la clave del modelo principal.
+@contextmanager
+def track_llm_models(models: list | None = None):
+    models = [] if models is None else models
+    token = _models_used.set(models)
+    try:
+        yield models
+    finally:
+        _models_used.reset(token)
+
+def _semaphore(model: str) -> asyncio.Semaphore:
+    if model not in _semaphores:
+        _semaphores[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY_PER_MODEL)
+    return _semaphores[model]
+
+def _record_latency(model: str, seconds: float):
+    _latencies.setdefault(model, deque(maxlen=200)).append(seconds)
+
+# Percentil de latencia del modelo, o None si aún no hay muestras suficientes.
+def _latency_percentile(model: str, percentile: float) -> float | None:
+    samples = _latencies.get(model)
+    if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+    return ordered[index]
+
+# Solo se reintentan errores transitorios: 429, 5xx, timeouts y fallos de conexión.
+# Con retry_timeouts=False los timeouts no se reintentan (el llamante tiene un fallback al que pasar).
+def _is_retryable(error: Exception, retry_timeouts: bool = True) -> bool:
+    if isinstance(error, APITimeoutError):
+        return retry_timeouts
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+# Espera antes del siguiente intento: respeta Retry-After si viene, si no backoff exponencial con jitter.
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(LLM_BACKOFF_BASE * (2 ** attempt), LLM_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+# Los timeouts del modelo principal solo se reintentan si no se va a pasar al fallback.
+def _retry_timeouts(model: str) -> bool:
+    return not LLM_FALLBACK_ON_TIMEOUT or model == FALLBACK_LLM_MODEL
+
+# Una llamada a un modelo concreto con semáforo, timeout y reintentos.
+async def _complete(model: str, params: dict, timeout: float | None) -> str:
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with _semaphore(model):
+                start = time.perf_counter()
+                _stats["calls"] += 1
+                response = await client.chat.completions.create(
+                    model=model, timeout=timeout or LLM_TIMEOUT, **params
+                )
+            _record_latency(model, time.perf_counter() - start)
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e, _retry_timeouts(model)):
+                raise
+            _stats["retries"] += 1
+            await asyncio.sleep(_backoff_delay(attempt, e))
+
+# Hedging: lanza el principal y, si tarda más que su percentil de latencia, también el fallback.
+# Se devuelve la primera respuesta correcta (y el modelo que la dio) y se cancela la otra.
+async def _hedged(primary: str, fallback: str, params: dict, timeout: float | None) -> tuple[str, str]:
+    threshold = _latency_percentile(primary, LLM_HEDGE_PERCENTILE)
+    primary_task = asyncio.create_task(_complete(primary, params, timeout))
+    tasks = {primary_task}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=threshold)
+        if primary_task in done and primary_task.exception() is None:
+            return primary_task.result(), primary
+
+        # El principal ha fallado o va lento → lanzamos el fallback en paralelo
+        if primary_task in done:
+            tasks.discard(primary_task)
+            _stats["fallbacks"] += 1
+        else:
+            _stats["hedges"] += 1
+        fallback_task = asyncio.create_task(_complete(fallback, params, timeout))
+        tasks.add(fallback_task)
+
+        error = primary_task.exception() if primary_task.done() else None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is fallback_task and not primary_task.done():
+                        _stats["hedges_won"] += 1
+                    return task.result(), primary if task is primary_task else fallback
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# Métricas del cliente LLM (para GET /stats).
+def llm_stats() -> dict:
+    return {
+        **_stats,
+        "p50_latency_s": {m: _latency_percentile(m, 50) for m in _latencies},
+        "hedge_threshold_s": {m: _latency_percentile(m, LLM_HEDGE_PERCENTILE) for m in _latencies},
+    }
+
 # ============================================================
 # 1) Cliente simple (para proyectos casuales o endpoints básicos)
 # ============================================================
 
 # Cliente minimalista para prompts directos sin LangChain. Devuelve solo texto. Ideal para endpoints simples.
-async def llm(prompt: str, model: str | None = None) -> str:
+async def llm(prompt: str, model: str | None = None, timeout: float | None = None) -> str:
     model_to_use = model or DEFAULT_LLM_MODEL
     params = {
         "messages": [{"role": "user", "content": prompt}],
@@ -25,30 +198,123 @@ async def llm(prompt: str, model: str | None = None) -> str:
         "temperature": 0.7,
         "top_p": 0.9,
     }
+
+    if LLM_HEDGING_ENABLED and model_to_use != FALLBACK_LLM_MODEL:
+        answer, answered_by = await _hedged(model_to_use, FALLBACK_LLM_MODEL, params, timeout)
+        _report_model(answered_by)
+        return answer
+
     try:
-        response = await client.chat.completions.create(model=model_to_use, **params)
+        answer = await _complete(model_to_use, params, timeout)
+        _report_model(model_to_use)
+        return answer
 
     except Exception:
         # Reintento limpio usando fallback
-        response = await client.chat.completions.create(model=FALLBACK_LLM_MODEL, **params)
+        _stats["fallbacks"] += 1
+        answer = await _complete(FALLBACK_LLM_MODEL, params, timeout)
+        _report_model(FALLBACK_LLM_MODEL)
+        return answer
 
-    return response.choices[0].message.content
+# Versión streaming de llm(): genera el texto token a token.
+# Si el modelo principal falla antes de emitir ningún token, se usa el fallback.
+async def llm_stream(prompt: str, model: str | None = None, timeout: float | None = None):
+    model_to_use = model or DEFAULT_LLM_MODEL
+    params = {
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 400,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stream": True,
+    }
+
+    # aclosing: si el consumidor deja de leer (cliente SSE desconectado), el stream interno
+    # se cierra en ese momento y libera su hueco del semáforo y la conexión HTTP
+    emitted = False
+    try:
+        async with aclosing(_stream_tokens(model_to_use, params, timeout)) as tokens:
+            async for token in tokens:
+                if not emitted:
+                    _report_model(model_to_use)
+                emitted = True
+                yield token
+    except Exception:
+        # Si ya se enviaron tokens al cliente no podemos empezar de nuevo con otro modelo
+        if emitted:
+            raise
+        _stats["fallbacks"] += 1
+        _report_model(FALLBACK_LLM_MODEL)
+        async with aclosing(_stream_tokens(FALLBACK_LLM_MODEL, params, timeout)) as tokens:
+            async for token in tokens:
+                yield token
+
+# Abre el stream (con reintentos solo en la conexión inicial) y emite los tokens no vacíos.
+# El hueco del semáforo se toma en cada intento de conexión (no durante el backoff) y se
+# mantiene mientras el stream está abierto; al cerrar el generador se cierra el stream
+# (conexión devuelta al pool) y se libera el hueco.
+async def _stream_tokens(model: str, params: dict, timeout: float | None):
+    semaphore = _semaphore(model)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await semaphore.acquire()
+        try:
+            _stats["calls"] += 1
+            stream = await client.chat.completions.create(
+                model=model, timeout=timeout or LLM_TIMEOUT, **params
+            )
+            break
+        except BaseException as e:
+            # BaseException: también si cancelan la tarea mientras conecta (cliente SSE desconectado)
+            semaphore.release()
+            if not isinstance(e, Exception) or attempt >= LLM_MAX_RETRIES or not _is_retryable(e, _retry_timeouts(model)):
+                raise
+            _stats["retries"] += 1
+            await asyncio.sleep(_backoff_delay(attempt, e))
+
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+    finally:
+        await stream.close()
+        semaphore.release()
 
 # ============================================================
 # 2) Cliente especial para Chains LangChain
 # ============================================================
 
+# ChatOpenAI que comparte con llm() / llm_stream() el semáforo por modelo (LLM_MAX_CONCURRENCY_PER_MODEL).
+# Solo se limitan las llamadas async (.ainvoke / .astream): las síncronas no pasan por el event loop.
+class _LimitedChatOpenAI(ChatOpenAI):
+    async def _agenerate(self, *args, **kwargs):
+        async with _semaphore(self.model_name):
+            return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        async with _semaphore(self.model_name):
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+
 # Devuelve un objeto ChatOpenAI configurado para OpenRouter. Compatible con LLMChain, RouterChain, MultiPromptChain, agentes, etc.
-def llm_chain(model: str | None = None, temperature: float = 0.0,) -> ChatOpenAI:
+# Comparte el pool HTTP async y el límite de concurrencia por modelo del cliente simple.
+# Los reintentos con backoff los hace el SDK de OpenAI; NO hay fallback ni hedging por llamada.
+# Con streaming=True el modelo emite tokens al usar .astream() sobre la chain.
+def llm_chain(model: str | None = None, temperature: float = 0.0, streaming: bool = False) -> ChatOpenAI:
     model_to_use = model or DEFAULT_LLM_MODEL
 
     llm_params = {
         "api_key": OPENROUTER_API_KEY,
         "base_url": OPENROUTER_BASE_URL,
         "temperature": temperature,
+        "timeout": LLM_TIMEOUT,
+        "max_retries": LLM_MAX_RETRIES,
+        "http_async_client": http_client,
+        "streaming": streaming,
     }
 
     try:
-        return ChatOpenAI(model=model_to_use, **llm_params)
+        return _LimitedChatOpenAI(model=model_to_use, **llm_params)
     except Exception:
-        return ChatOpenAI(model=FALLBACK_LLM_MODEL, **llm_params)
\ No newline at end of file
+        return _LimitedChatOpenAI(model=FALLBACK_LLM_MODEL, **llm_params)
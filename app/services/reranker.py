@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from config_base import DEFAULT_RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_LATENCY_BUDGET_MS
+
+# ============================================================
+# Reranking con cross-encoder
+# ============================================================
+# La búsqueda (híbrida) recupera muchos candidatos baratos; el
+# cross-encoder puntúa cada par (pregunta, chunk) con más precisión y
+# nos quedamos con los mejores. Un top-n mejor permite enviar menos
+# chunks al LLM (prompts más pequeños = menos tokens y menos latencia).
+#
+# Los pares se puntúan por lotes (RERANK_BATCH_SIZE por pasada del
+# modelo) en el orden de la primera etapa. Si se agota el presupuesto
+# de latencia se deja de puntuar: los candidatos sin puntuar quedan
+# detrás de los puntuados, en su orden original.
+
+_models = {}
+_lock = threading.Lock()
+_stats = {"calls": 0, "pairs_scored": 0, "budget_cutoffs": 0, "total_ms": 0.0}
+
+
+# Devuelve el cross-encoder cargado (lo carga la primera vez que se pide).
+def get_cross_encoder(model_name: str | None = None):
+    name = model_name or DEFAULT_RERANK_MODEL
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            # Import diferido: sentence-transformers (y torch) solo se cargan si se usa el reranking
+            from sentence_transformers import CrossEncoder
+
+            print(f"[Reranker] Cargando modelo '{name}'...")
+            model = CrossEncoder(name)
+            _models[name] = model
+    return model
+
+
+# Devuelve los índices de `documents` reordenados por relevancia (los top_n primeros).
+def rerank(
+    question: str,
+    documents: list[str],
+    top_n: int,
+    budget_ms: float | None = None,
+    model_name: str | None = None,
+    batch_size: int = RERANK_BATCH_SIZE,
+) -> list[int]:
+    budget = (RERANK_LATENCY_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+    model = get_cross_encoder(model_name)
+    start = time.perf_counter()
+
+    scores: dict[int, float] = {}
+    for offset in range(0, len(documents), batch_size):
+        # Siempre se puntúa al menos un lote; después, solo mientras quede presupuesto
+        if scores and time.perf_counter() - start >= budget:
+            _stats["budget_cutoffs"] += 1
+            break
+        batch = documents[offset:offset + batch_size]
+        batch_scores = model.predict([(question, doc) for doc in batch], batch_size=batch_size)
+        for i, score in enumerate(batch_scores):
+            scores[offset + i] = float(score)
+
+    _stats["calls"] += 1
+    _stats["pairs_scored"] += len(scores)
+    _stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    ranked += [i for i in range(len(documents)) if i not in scores]
+    return ranked[:top_n]
+
+
+# Versión async: el modelo corre en un hilo aparte para no bloquear el event loop.
+async def arerank(question: str, documents: list[str], top_n: int, **kwargs) -> list[int]:
+    if len(documents) <= 1:
+        return list(range(len(documents)))[:top_n]
+    return await asyncio.to_thread(rerank, question, documents, top_n, **kwargs)
+
+
+def reranker_stats() -> dict:
+    calls = _stats["calls"]
+    return {
+        "calls": calls,
+        "pairs_scored": _stats["pairs_scored"],
+        "budget_cutoffs": _stats["budget_cutoffs"],
+        "avg_ms": round(_stats["total_ms"] / calls, 1) if calls else 0.0,
+    }
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config_base import RETRIEVAL_MAX_CONCURRENCY
+
+# ============================================================
+# Capa de recuperación async (executor acotado)
+# ============================================================
+# Las llamadas a ChromaDB (collection.query, get, add, delete) son bloqueantes.
+# Si se ejecutan directamente dentro de un endpoint async, una consulta lenta
+# congela todas las peticiones del worker. Aquí se ejecutan en un pool de hilos
+# con concurrencia máxima configurable, y se mide:
+#   - queue_depth: tareas esperando un hilo libre
+#   - wait time: tiempo entre que se pide la tarea y que empieza a ejecutarse
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, name: str):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._started = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    # Ejecuta fn(*args, **kwargs) en el pool y espera su resultado sin bloquear el event loop.
+    async def run(self, fn, *args, **kwargs):
+        submitted_at = time.perf_counter()
+
+        def _task():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._started += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(_task)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Si la petición se cancela antes de empezar, la tarea nunca llegará a descontarse
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    # Métricas para dimensionar el pool.
+    def stats(self) -> dict:
+        with self._lock:
+            avg_wait = self._total_wait / self._started if self._started else 0.0
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+
+# Pool compartido por todos los mini-proyectos
+retrieval_executor = BoundedExecutor(RETRIEVAL_MAX_CONCURRENCY, "retrieval")
+
+# Atajo: ejecuta una operación bloqueante de recuperación (p.ej. collection.query) en el pool.
+async def run_retrieval(fn, *args, **kwargs):
+    return await retrieval_executor.run(fn, *args, **kwargs)
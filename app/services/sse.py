@@ -0,0 +1,44 @@
+import json
+import logging
+from fastapi.responses import StreamingResponse
+
+# ============================================================
+# Utilidades para Server-Sent Events (text/event-stream)
+# ============================================================
+# Los endpoints "/stream" envían eventos con este formato:
+#
+#   event: <tipo>
+#   data: <json>
+#
+# Tipos usados en el repo:
+#   - sources → fuentes RAG (se envían antes que los tokens)
+#   - meta    → información previa a la respuesta (intención, chain usada, ...)
+#   - token   → fragmento de texto generado ({"text": "..."})
+#   - done    → fin de la respuesta (puede incluir la respuesta final parseada)
+#   - error   → error durante la generación
+
+logger = logging.getLogger(__name__)
+
+# Formatea un evento SSE (data siempre en JSON).
+def sse_event(event: str, data) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+# Convierte un generador async de eventos ya formateados en una respuesta SSE.
+# Si el generador falla, se envía un evento "error" en lugar de cortar la conexión sin más.
+# background: tarea opcional (starlette BackgroundTask) que se ejecuta al cerrar el stream.
+def sse_response(events, background=None) -> StreamingResponse:
+    async def _guarded():
+        try:
+            async for event in events:
+                yield event
+        except Exception as e:
+            logger.exception("Error durante el streaming SSE")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        _guarded(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# Tareas de arranque de los mini-proyectos
+# ============================================================
+# Los routers ya no construyen índices ni lanzan hilos al importarse:
+# cada proyecto puede exponer una función `startup()` (síncrona y
+# bloqueante, p.ej. construir su índice) que el lifespan de FastAPI
+# ejecuta en un hilo aparte. Así el worker arranca y responde a
+# /health al instante, y /ready indica cuándo ha terminado todo.
+#
+# Los hooks corren en un pool de hilos PROPIO (startup_pool), no en el
+# executor por defecto del event loop: ese lo usan las peticiones
+# (embeddings de consultas, reranking, memoria de A6) vía
+# asyncio.to_thread, y con pocas CPUs unos indexados largos lo
+# llenarían y dejarían las consultas colgadas hasta terminar.
+#
+# Al apagar, el lifespan espera las funciones `shutdown()` (async) de
+# los proyectos, p.ej. para vaciar colas de trabajo en background.
+
+# nombre del proyecto → {"state": pending|running|ready|failed, "seconds", "error"}
+_status: dict[str, dict] = {}
+_tasks: list[asyncio.Task] = []
+startup_pool: ThreadPoolExecutor | None = None
+
+
+async def _run(name: str, hook: Callable[[], None]):
+    entry = _status[name]
+    entry["state"] = "running"
+    start = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(startup_pool, hook)
+        entry["state"] = "ready"
+    except Exception as e:
+        logger.exception("Error en el arranque del proyecto %s", name)
+        entry["state"] = "failed"
+        entry["error"] = str(e)
+    finally:
+        entry["seconds"] = round(time.perf_counter() - start, 2)
+
+
+# Lanza en background las tareas de arranque (llamar desde el lifespan de FastAPI).
+def start_startup_tasks(hooks: dict[str, Callable[[], None]]):
+    global startup_pool
+    if hooks and startup_pool is None:
+        # Un hilo por hook: todos arrancan a la vez, como antes, pero sin ocupar el executor por defecto
+        startup_pool = ThreadPoolExecutor(max_workers=len(hooks), thread_name_prefix="startup")
+    for name, hook in hooks.items():
+        _status[name] = {"state": "pending", "seconds": None, "error": None}
+        _tasks.append(asyncio.create_task(_run(name, hook)))
+
+
+# Cancela las tareas pendientes al apagar (los hilos ya lanzados terminan por su cuenta).
+async def stop_startup_tasks():
+    global startup_pool
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    if startup_pool is not None:
+        startup_pool.shutdown(wait=False)
+        startup_pool = None
+
+
+# Ejecuta las funciones shutdown() de los proyectos (un fallo no impide las demás).
+async def run_shutdown_hooks(hooks: dict[str, Callable[[], Awaitable[None]]]):
+    for name, hook in hooks.items():
+        try:
+            await hook()
+        except Exception:
+            logger.exception("Error al apagar el proyecto %s", name)
+
+
+def startup_status() -> dict:
+    return {name: dict(entry) for name, entry in _status.items()}
+
+
+# True cuando todas las tareas de arranque han terminado correctamente.
+def startup_ready() -> bool:
+    return all(entry["state"] == "ready" for entry in _status.values())
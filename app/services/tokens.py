@@ -0,0 +1,28 @@
+import math
+
+# ============================================================
+# Estimación de tokens (presupuestos de prompt)
+# ============================================================
+# Aproximación sin tokenizer: ~4 caracteres por token en textos
+# latinos (inglés / español) con los tokenizers BPE habituales.
+# Se redondea hacia arriba y nunca baja del nº de palabras, para no
+# quedarse corto con textos de palabras muy cortas o números.
+# Suficiente para repartir un presupuesto; no para facturar.
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / CHARS_PER_TOKEN), len(text.split()))
+
+
+# Recorta el texto para que no supere `max_tokens` (estimados), conservando el principio.
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max_tokens * CHARS_PER_TOKEN]
+    while cut and estimate_tokens(cut) > max_tokens:
+        cut = cut[: -max(len(cut) // 10, 1)]
+    return cut.rstrip()
@@ -20,6 +20,14 @@ PROJECTS_PATH = os.path.join(ROOT_DIR, "projects")
 APP_PATH = os.path.join(ROOT_DIR, "app")
 
 
+# === Mini-proyectos habilitados ===
+
+# Solo se importan los routers (y sus recursos) de estos proyectos.
+# Se puede sobrescribir con la variable de entorno ENABLED_PROJECTS="A1,A3v2,A5"
+ALL_PROJECTS = ["A1", "A2", "A3", "A3v2", "A4", "A4v2", "A5", "A6"]
+ENABLED_PROJECTS = [p.strip() for p in os.getenv("ENABLED_PROJECTS", ",".join(ALL_PROJECTS)).split(",") if p.strip()]
+
+
 # === Configuración técnica compartida ===
 
 # Modelo de embeddings por defecto (SentenceTransformers)
@@ -28,3 +36,121 @@ DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 # Modelo LLM default y modelo LLM fallback (para OpenRouter / OpenAI compatible)
 DEFAULT_LLM_MODEL = "openai/gpt-oss-20b:free"
 FALLBACK_LLM_MODEL = "nvidia/nemotron-nano-12b-v2-vl:free"
+
+
+# === Embeddings de consultas (micro-batching) ===
+
+# Máximo de preguntas que se agrupan en una sola llamada a encode()
+EMBEDDING_BATCH_MAX_SIZE = 32
+
+# Tiempo máximo (ms) que se espera a que lleguen más preguntas antes de lanzar el lote
+EMBEDDING_BATCH_MAX_WAIT_MS = 5
+
+
+# === Recuperación (consultas a ChromaDB fuera del event loop) ===
+
+# Número máximo de consultas Chroma ejecutándose a la vez por worker
+RETRIEVAL_MAX_CONCURRENCY = 8
+
+
+# === Caché de embeddings de consultas ===
+
+# Número máximo de preguntas cuyo vector se mantiene en memoria (LRU)
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+# Tiempo de vida (segundos) de cada entrada; None = sin caducidad
+QUERY_EMBEDDING_CACHE_TTL = 3600
+
+
+# === Caché de respuestas RAG ===
+
+# Número máximo de respuestas cacheadas (LRU)
+ANSWER_CACHE_SIZE = 1024
+
+# Tiempo de vida (segundos) de cada respuesta; None = sin caducidad
+ANSWER_CACHE_TTL = 24 * 3600
+
+# Similitud coseno mínima para reutilizar la respuesta de una pregunta parecida
+# (mismos chunks recuperados). None = solo coincidencia exacta de la pregunta normalizada.
+ANSWER_CACHE_SIMILARITY_THRESHOLD = None
+
+
+# === Cliente LLM (pool HTTP, concurrencia, reintentos y hedging) ===
+
+# Pool de conexiones HTTP keep-alive hacia OpenRouter
+LLM_MAX_CONNECTIONS = 100
+LLM_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_KEEPALIVE_EXPIRY = 30  # segundos
+
+# Llamadas simultáneas máximas por modelo (por worker)
+LLM_MAX_CONCURRENCY_PER_MODEL = 16
+
+# Timeout (segundos) de cada llamada al LLM
+LLM_TIMEOUT = 60
+
+# Reintentos con backoff exponencial ante 429 / 5xx / errores de red
+LLM_MAX_RETRIES = 2
+LLM_BACKOFF_BASE = 0.5  # segundos
+LLM_BACKOFF_MAX = 8     # segundos
+
+# Si hay fallback, un timeout del modelo principal no se reintenta: se pasa directamente al fallback.
+# Peor si el principal solo tuvo un pico puntual, pero el peor caso queda en ~2 × LLM_TIMEOUT
+# en vez de 3 × LLM_TIMEOUT + backoff antes de empezar siquiera con el fallback.
+LLM_FALLBACK_ON_TIMEOUT = True
+
+# Hedging: si el modelo principal tarda más que su percentil de latencia,
+# se lanza también el fallback y se usa la primera respuesta que llegue
+LLM_HEDGING_ENABLED = False
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20  # muestras de latencia necesarias antes de empezar a hacer hedging
+
+
+# === Indexado ===
+
+# Parámetros HNSW de las colecciones Chroma (ver app/services/chroma_registry.py).
+#   space            → "l2" | "cosine" | "ip"
+#   construction_ef  → calidad del grafo al insertar (más alto = mejor recall, indexado más lento)
+#   search_ef        → candidatos explorados por consulta (más alto = mejor recall, consultas más lentas)
+#   M                → vecinos por nodo del grafo (más alto = más memoria y mejor recall)
+# Solo se aplican al CREAR la colección: para cambiarlos hay que reconstruirla.
+CHROMA_HNSW_DEFAULTS = {"space": "l2", "construction_ef": 100, "search_ef": 10, "M": 16}
+
+# Ajustes por colección (nombre → parámetros que sustituyen a los de por defecto).
+# Ejemplo: {"a4_docs_v2": {"search_ef": 64}}
+CHROMA_HNSW_OVERRIDES: dict[str, dict] = {}
+
+# Tamaño de lote al comprobar qué IDs de chunks ya existen en una colección
+CHROMA_ID_LOOKUP_BATCH = 2000
+
+# Chunks que se embeben y se insertan juntos (la memoria del indexado no crece con el corpus)
+INDEX_BATCH_SIZE = 256
+
+# Segundos que una consulta espera a que su índice termine de construirse antes de responder 503
+# (0 = responder 503 al instante mientras se indexa)
+INDEX_NOT_READY_WAIT = 10
+
+# === Recuperación híbrida (vectorial + BM25) ===
+
+# Fusiona los resultados de Chroma con un índice léxico BM25 en memoria (A4, A4v2, A5)
+HYBRID_RETRIEVAL_ENABLED = True
+HYBRID_CANDIDATES = 20   # Candidatos que aporta cada retriever antes de fusionar
+HYBRID_RRF_K = 60        # Constante de Reciprocal Rank Fusion (más alta = posiciones más "planas")
+
+# Parámetros BM25
+BM25_K1 = 1.5   # Saturación de la frecuencia de término
+BM25_B = 0.75   # Normalización por longitud del chunk
+
+
+# === Reranking (cross-encoder) ===
+
+# Modelo cross-encoder local para reordenar candidatos (pregunta, chunk).
+# Para corpus en español, "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1" (multilingüe) es más preciso pero más lento.
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BATCH_SIZE = 16        # Pares puntuados por pasada del modelo
+RERANK_LATENCY_BUDGET_MS = 150  # Si se agota, se deja de puntuar y se usan los candidatos ya puntuados
+
+
+# Almacén persistente de embeddings de chunks (SQLite, clave = sha256 del texto + modelo).
+# Evita re-embeber texto idéntico al reconstruir una colección o al indexarlo en otra.
+EMBEDDING_STORE_ENABLED = True
+EMBEDDING_STORE_PATH = os.path.join(CHROMA_PATH, "embedding_store.sqlite3")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.services.llm_client import llm
+from app.services.llm_client import llm, llm_stream
+from app.services.sse import sse_event, sse_response
 from .prompts import chat_template
 from .schemas import ChatRequest, ChatResponse
 import json
@@ -37,3 +38,32 @@ async def structured_chat(req: ChatRequest):
         }
 
     return data
+
+
+@router.post(
+    "/chat/stream",
+    summary="Chat con respuesta estructurada en JSON (streaming SSE)",
+    description="""
+    Igual que `/a1/chat`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `token`: fragmentos del JSON a medida que el modelo los genera.
+    - `done`: JSON final validado (o el error de validación).
+    """,
+    response_description="Stream text/event-stream con tokens y JSON final",
+)
+async def structured_chat_stream(req: ChatRequest):
+    prompt = chat_template.format(user_message=req.message)
+
+    async def events():
+        tokens = []
+        async for token in llm_stream(prompt):
+            tokens.append(token)
+            yield sse_event("token", {"text": token})
+
+        raw = "".join(tokens)
+        try:
+            data = ChatResponse(**json.loads(raw)).model_dump()
+        except Exception as e:
+            data = {"error": "El modelo devolvió un JSON inválido o fuera de esquema", "details": str(e), "raw_response": raw}
+        yield sse_event("done", data)
+
+    return sse_response(events())
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.services.llm_client import llm
+from app.services.llm_client import llm, llm_stream
+from app.services.sse import sse_event, sse_response
 from .prompts import intent_prompt, today
 from .schemas import IntentRequest, IntentResponse
 import json
@@ -41,3 +42,32 @@ async def parse_intent(req: IntentRequest):
         }
 
     return parsed
+
+
+@router.post(
+    "/parse-intent/stream",
+    summary="Analiza la intención del usuario (streaming SSE)",
+    description="""
+    Igual que `/a2/parse-intent`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `token`: fragmentos del JSON a medida que el modelo los genera.
+    - `done`: JSON final validado con Pydantic (o el error de validación).
+    """,
+    response_description="Stream text/event-stream con tokens y JSON final",
+)
+async def parse_intent_stream(req: IntentRequest):
+    prompt = intent_prompt.format(user_message=req.message, today=today)
+
+    async def events():
+        tokens = []
+        async for token in llm_stream(prompt):
+            tokens.append(token)
+            yield sse_event("token", {"text": token})
+
+        raw = "".join(tokens)
+        try:
+            data = IntentResponse(**json.loads(raw)).model_dump()
+        except Exception as e:
+            data = {"error": "El modelo devolvió un JSON inválido o fuera de esquema", "details": str(e), "raw_response": raw}
+        yield sse_event("done", data)
+
+    return sse_response(events())
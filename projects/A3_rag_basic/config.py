@@ -1,5 +1,13 @@
+import os
 from config_base import CHROMA_PATH, DEFAULT_EMBEDDING_MODEL
 
 COLLECTION_NAME = "a3_docs"
 EMBEDDING_MODEL = DEFAULT_EMBEDDING_MODEL
-CHROMA_PATH = CHROMA_PATH
\ No newline at end of file
+CHROMA_PATH = CHROMA_PATH
+
+# Chunking de los documentos (caracteres)
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Manifiesto de ficheros indexados (tamaño, mtime, hash, IDs de chunks)
+MANIFEST_PATH = os.path.join(CHROMA_PATH, f"{COLLECTION_NAME}_manifest.json")
@@ -1,11 +1,31 @@
 import os
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .config import CHUNK_SIZE, CHUNK_OVERLAP
+from .utils import hash_text
 
-# Función para cargar documentos de un directorio
-def load_documents(data_path: str):
-    docs = []
-    for file in os.listdir(data_path):
-        full_path = os.path.join(data_path, file)
-        if file.endswith(".txt"):
-            with open(full_path, "r", encoding="utf-8") as f:
-                docs.append(f.read())
-    return docs
+# Rutas de los documentos TXT y MD de un directorio (en orden)
+def list_documents(data_path: str) -> list[str]:
+    return [
+        os.path.join(data_path, file)
+        for file in sorted(os.listdir(data_path))
+        if file.endswith((".txt", ".md"))
+    ]
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+# Carga y trocea un fichero → lista de chunks {"id", "text", "metadata"}.
+# El ID es el hash del texto: el mismo contenido siempre tiene el mismo ID (upserts idempotentes).
+def chunk_file(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    chunks = []
+    for chunk_text in splitter.split_text(content):
+        chunk_text = chunk_text.strip()
+        if chunk_text:
+            chunks.append({
+                "id": hash_text(chunk_text),
+                "text": chunk_text,
+                "metadata": {"source": os.path.basename(path)},
+            })
+    return chunks
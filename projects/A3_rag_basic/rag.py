@@ -1,15 +1,61 @@
-from sentence_transformers import SentenceTransformer
-from .config import EMBEDDING_MODEL
+from app.services.embedding_batcher import aembed_query
+from app.services.retrieval import run_retrieval
+from app.services.answer_cache import bump_index_version
+from app.services.index_state import get_index_state
+from app.services.index_manifest import FileManifest
+from app.services.indexing import index_chunks
+from .config import COLLECTION_NAME, EMBEDDING_MODEL, MANIFEST_PATH
 from .chroma_client import collection
+from .loader import list_documents, chunk_file
 
-model = SentenceTransformer(EMBEDDING_MODEL) # Modelo ligero para embeddings
+index_state = get_index_state(COLLECTION_NAME) # Estado del índice para /a3/status y /ready
 
-def build_index(documents):
-    vectors = model.encode(documents).tolist() # Convierte los documentos a vectores
-    ids = [f"doc_{i}" for i in range(len(documents))] # Genera IDs únicas para cada documento
-    collection.add(documents=documents, embeddings=vectors, ids=ids) # Añade los documentos y sus vectores a la colección
+# Genera los chunks de los ficheros indicados y registra sus IDs en el manifiesto
+def _iter_chunks(paths: list[str], manifest: FileManifest):
+    for path in paths:
+        file_chunks = chunk_file(path)
+        yield from file_chunks
+        manifest.record(path, [item["id"] for item in file_chunks])
+        index_state.file_done()
 
-def retrieve(question: str):
-    query_vec = model.encode([question]).tolist()[0] # Convierte la pregunta a vector
-    results = collection.query(query_embeddings=[query_vec], n_results=3) # Recupera los 3 documentos más similares
-    return results["documents"][0] # Devuelve los documentos recuperados
+# Todos los IDs almacenados en la colección (A3 es pequeña: se listan sin documentos ni embeddings)
+def _collection_ids() -> set[str]:
+    return set(collection.get(include=[])["ids"])
+
+# Indexa los documentos de data_path de forma idempotente:
+# - si ningún fichero ha cambiado (según el manifiesto) no se hace nada
+# - los chunks se insertan con upsert usando su hash como ID (nunca se duplican)
+# - se borran los chunks que ya no pertenecen a ningún fichero (incluidos los antiguos "doc_{i}")
+def build_index(data_path: str):
+    manifest = FileManifest(MANIFEST_PATH, data_path)
+    if collection.count() < len(manifest.referenced_ids()):
+        manifest.reset() # Colección borrada o incompleta → revisamos todos los ficheros
+
+    changed_files, removed_files = manifest.diff(list_documents(data_path))
+    if not changed_files and not removed_files:
+        manifest.save()
+        index_state.finish()
+        print(f"[Index {COLLECTION_NAME}] Sin cambios en los documentos.")
+        return
+
+    with index_state.building(files_total=len(changed_files)):
+        for key in removed_files:
+            manifest.forget(key)
+
+        added = index_chunks(
+            collection, _iter_chunks(changed_files, manifest), EMBEDDING_MODEL,
+            label=COLLECTION_NAME, on_progress=index_state.progress,
+        )
+
+        stale_ids = list(_collection_ids() - manifest.referenced_ids())
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+
+        if added or stale_ids:
+            bump_index_version(COLLECTION_NAME) # Invalida respuestas cacheadas con el índice anterior
+        manifest.save()
+
+async def retrieve(question: str):
+    query_vec = await aembed_query(question, EMBEDDING_MODEL) # Convierte la pregunta a vector
+    results = await run_retrieval(collection.query, query_embeddings=[query_vec], n_results=3) # Recupera los 3 fragmentos más similares
+    return results["documents"][0], results["ids"][0] # Devuelve los fragmentos recuperados y sus IDs
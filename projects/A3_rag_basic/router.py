@@ -1,8 +1,11 @@
 import os
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from app.services.llm_client import llm
-from .loader import load_documents
+from app.services.llm_client import llm, llm_stream
+from app.services.answer_cache import cached_llm_answer, cached_llm_stream
+from app.services.sse import sse_event, sse_response
+from app.services.index_state import get_index_state, require_index_ready
+from .config import COLLECTION_NAME, EMBEDDING_MODEL
 from .rag import build_index, retrieve
 from .prompts import rag_prompt
 from .schemas import QueryRequest, QueryResponse
@@ -11,12 +14,23 @@ router = APIRouter(prefix="/a3", tags=["A3 - RAG Básico"])
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data")
 
-# Construye el índice on startup:
-documents = load_documents(DATA_PATH)
-build_index(documents)
+# Construye el índice al arrancar el servidor (lo ejecuta el lifespan de app/main.py en background).
+# Es idempotente: si los documentos no han cambiado no se embebe nada.
+def startup():
+    build_index(DATA_PATH)
+
+@router.get(
+    "/status",
+    summary="Estado del índice del proyecto",
+    description="Estado del indexado (`pending`, `building`, `ready`, `failed`), chunks procesados / total y ETA estimado.",
+)
+def index_status():
+    return get_index_state(COLLECTION_NAME).snapshot()
+
 
 @router.post(
     "/ask",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
     summary="Realiza una pregunta utilizando RAG básico",
     description="""
     Realiza una pregunta utilizando un enfoque de Recuperación Augmentada por Generación (RAG) básico.
@@ -27,8 +41,40 @@ build_index(documents)
     response_model=QueryResponse,
 )
 async def ask_rag(req: QueryRequest):
-    relevant_docs = retrieve(req.question) # Recupera documentos relevantes
+    relevant_docs, chunk_ids = await retrieve(req.question) # Recupera documentos relevantes
     context = "\n\n".join(relevant_docs) # Prepara el contexto para el prompt
     prompt = rag_prompt.format(context=context, question=req.question) # Formatea el prompt
-    answer = await llm(prompt) # Llama al modelo de lenguaje
+    answer = await cached_llm_answer( # Llama al modelo de lenguaje (o reutiliza la respuesta cacheada)
+        "/a3/ask", COLLECTION_NAME, chunk_ids, rag_prompt, req.question,
+        lambda: llm(prompt), EMBEDDING_MODEL,
+    )
     return {"response": answer.strip(), "sources": relevant_docs}
+
+
+@router.post(
+    "/ask/stream",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
+    summary="Pregunta con RAG básico (streaming SSE)",
+    description="""
+    Igual que `/a3/ask`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `sources`: documentos recuperados (se envían primero).
+    - `token`: fragmentos de la respuesta a medida que el LLM los genera.
+    - `done`: fin del stream.
+    """,
+    response_description="Stream text/event-stream con fuentes y tokens",
+)
+async def ask_rag_stream(req: QueryRequest):
+    relevant_docs, chunk_ids = await retrieve(req.question)
+    context = "\n\n".join(relevant_docs)
+    prompt = rag_prompt.format(context=context, question=req.question)
+
+    async def events():
+        yield sse_event("sources", {"sources": relevant_docs})
+        async for token in cached_llm_stream(
+            "/a3/ask", COLLECTION_NAME, chunk_ids, rag_prompt, req.question,
+            lambda: llm_stream(prompt), EMBEDDING_MODEL,
+        ):
+            yield sse_event("token", {"text": token})
+        yield sse_event("done", {})
+
+    return sse_response(events())
@@ -0,0 +1,5 @@
+import hashlib
+
+# Genera un hash único para un texto (para identificar chunks).
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
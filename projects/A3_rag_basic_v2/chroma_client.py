@@ -1,5 +1,5 @@
-import chromadb
-from .config import COLLECTION_NAME, CHROMA_PATH
+from app.services.chroma_registry import LazyCollection
+from .config import COLLECTION_NAME
 
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_or_create_collection(COLLECTION_NAME)
+# La colección se abre en el primer uso (no al importar el router)
+collection = LazyCollection(COLLECTION_NAME)
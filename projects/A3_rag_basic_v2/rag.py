@@ -1,40 +1,49 @@
 import os
-from sentence_transformers import SentenceTransformer
-from .config import EMBEDDING_MODEL
+from app.services.embedding_batcher import aembed_query
+from app.services.retrieval import run_retrieval
+from app.services.answer_cache import bump_index_version
+from app.services.indexing import index_chunks
+from app.services.index_state import get_index_state
+from .config import COLLECTION_NAME, EMBEDDING_MODEL
 from .chroma_client import collection
 from .utils import hash_text
 
-# Cargar modelo de embeddings (solo una vez)
-model = SentenceTransformer(EMBEDDING_MODEL)
+# Estado del índice (pending / building / ready / failed) para /a3v2/status y /ready
+index_state = get_index_state(COLLECTION_NAME)
 
-# Construye el índice desde una carpeta de documentos
-def build_index_from_folder(folder_path: str):
-    docs = []
-    ids = []
-    for fname in os.listdir(folder_path):
-        if not fname.endswith((".txt", ".md")):
-            continue
+# Genera los chunks {"id", "text", "metadata"} leyendo los ficheros de uno en uno
+def _iter_folder_chunks(folder_path: str):
+    for fname in _list_folder_files(folder_path):
         with open(os.path.join(folder_path, fname), "r", encoding="utf-8") as f:
             content = f.read()
 
         # Fragmentar en chunks de 400 caracteres
-        chunks = [content[i:i+400] for i in range(0, len(content), 400)]
-        for chunk in chunks:
-            doc_id = hash_text(chunk)
-            if doc_id not in collection.get(ids=[doc_id])["ids"]:
-                docs.append(chunk)
-                ids.append(doc_id)
+        for i in range(0, len(content), 400):
+            chunk = content[i:i+400]
+            yield {"id": hash_text(chunk), "text": chunk, "metadata": {"source": fname}}
+        index_state.file_done()
+
+# Ficheros de texto de la carpeta, en orden
+def _list_folder_files(folder_path: str) -> list[str]:
+    return [fname for fname in sorted(os.listdir(folder_path)) if fname.endswith((".txt", ".md"))]
+
+# Construye el índice desde una carpeta de documentos (por lotes, solo chunks nuevos)
+def build_index_from_folder(folder_path: str):
+    with index_state.building(files_total=len(_list_folder_files(folder_path))):
+        added = index_chunks(
+            collection, _iter_folder_chunks(folder_path), EMBEDDING_MODEL,
+            label=COLLECTION_NAME, on_progress=index_state.progress,
+        )
 
-    if docs:
-        vectors = model.encode(docs).tolist()
-        collection.add(documents=docs, embeddings=vectors, ids=ids)
-        print(f"{len(docs)} fragmentos indexados correctamente.")
-    else:
-        print("No hay nuevos documentos para indexar.")
+        if added:
+            print(f"{added} fragmentos indexados correctamente.")
+            bump_index_version(COLLECTION_NAME)
+        else:
+            print("No hay nuevos documentos para indexar.")
 
 # Recupera los documentos más relevantes al prompt del usuario
-def retrieve(question: str, top_k: int = 3):
-    query_vec = model.encode([question]).tolist()[0]
-    results = collection.query(query_embeddings=[query_vec], n_results=top_k)
+async def retrieve(question: str, top_k: int = 3):
+    query_vec = await aembed_query(question, EMBEDDING_MODEL)
+    results = await run_retrieval(collection.query, query_embeddings=[query_vec], n_results=top_k)
     documents = results.get("documents", [[]])[0]
     return documents
\ No newline at end of file
@@ -1,7 +1,9 @@
 import os
-import threading
-from fastapi import APIRouter
-from app.services.llm_client import llm
+from fastapi import APIRouter, Depends
+from app.services.llm_client import llm, llm_stream
+from app.services.sse import sse_event, sse_response
+from app.services.index_state import get_index_state, require_index_ready
+from .config import COLLECTION_NAME
 from .rag import build_index_from_folder, retrieve
 from .prompts import rag_prompt
 from .utils import safe_json_parse
@@ -11,18 +13,23 @@ router = APIRouter(prefix="/a3v2", tags=["A3 - RAG Básico v2"])
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data")
 
-# Indexado automático en segundo plano al cargar el módulo 
-def _auto_build_index():
-    try:
-        build_index_from_folder(DATA_PATH)
-    except Exception as e:
-        print(f"[RAG] Error durante el indexado automático: {e}")
+# Indexado automático al arrancar el servidor
+# (lo ejecuta el lifespan de app/main.py en un hilo, sin bloquear FastAPI)
+def startup():
+    build_index_from_folder(DATA_PATH)
+
+@router.get(
+    "/status",
+    summary="Estado del índice del proyecto",
+    description="Estado del indexado (`pending`, `building`, `ready`, `failed`), chunks procesados / total y ETA estimado.",
+)
+def index_status():
+    return get_index_state(COLLECTION_NAME).snapshot()
 
-# Lanzamos el indexado en un hilo para no bloquear FastAPI al arrancar
-threading.Thread(target=_auto_build_index, daemon=True).start()
 
 @router.post(
     "/query",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
     summary="Realiza una consulta utilizando RAG básico mejorado",
     description="""
     Realiza una consulta utilizando un enfoque de Recuperación Augmentada por Generación (RAG) básico.
@@ -38,7 +45,7 @@ threading.Thread(target=_auto_build_index, daemon=True).start()
 )
 async def query_rag(req: QueryRequest):
     # Recuperamos documentos relevantes del índice vectorial
-    context_docs = retrieve(req.question, top_k=3)
+    context_docs = await retrieve(req.question, top_k=3)
     context = "\n".join(context_docs)
 
     # Creamos el prompt que incluye el contexto + pregunta
@@ -58,4 +65,39 @@ async def query_rag(req: QueryRequest):
     parsed["sources"] = context_docs
 
     # Retornamos una respuesta validada según el esquema Pydantic
-    return QueryResponse(**parsed)
\ No newline at end of file
+    return QueryResponse(**parsed)
+
+
+@router.post(
+    "/query/stream",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
+    summary="Consulta RAG básico mejorado (streaming SSE)",
+    description="""
+    Igual que `/a3v2/query`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `sources`: fragmentos recuperados (se envían primero).
+    - `token`: fragmentos de la salida del LLM a medida que se generan.
+    - `done`: respuesta final parseada con el esquema `QueryResponse`.
+    """,
+    response_description="Stream text/event-stream con fuentes, tokens y respuesta final",
+)
+async def query_rag_stream(req: QueryRequest):
+    context_docs = await retrieve(req.question, top_k=3)
+    context = "\n".join(context_docs)
+    prompt = rag_prompt.format(context=context, question=req.question)
+
+    async def events():
+        yield sse_event("sources", {"sources": context_docs})
+
+        tokens = []
+        async for token in llm_stream(prompt):
+            tokens.append(token)
+            yield sse_event("token", {"text": token})
+
+        # Al terminar, parseamos la salida completa igual que el endpoint no streaming
+        parsed = safe_json_parse("".join(tokens))
+        if hasattr(parsed, "model_dump"):
+            parsed = parsed.model_dump()
+        parsed["sources"] = context_docs
+        yield sse_event("done", QueryResponse(**parsed).model_dump())
+
+    return sse_response(events())
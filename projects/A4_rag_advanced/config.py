@@ -1,5 +1,9 @@
+import os
 from config_base import CHROMA_PATH, DEFAULT_EMBEDDING_MODEL
 
 COLLECTION_NAME = "a4_docs"
 EMBEDDING_MODEL = DEFAULT_EMBEDDING_MODEL
-CHROMA_PATH = CHROMA_PATH
\ No newline at end of file
+CHROMA_PATH = CHROMA_PATH
+
+# Manifiesto de ficheros indexados (tamaño, mtime, hash, IDs de chunks)
+MANIFEST_PATH = os.path.join(CHROMA_PATH, f"{COLLECTION_NAME}_manifest.json")
@@ -1,17 +1,25 @@
 import os
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .utils import hash_text
 
 # Ruta al directorio de datos
 DATA_PATH = os.path.join(os.path.dirname(__file__), "data")
 
-# Carga todos los documentos TXT y MD desde /data/
-def load_documents():
+# Rutas de todos los documentos TXT y MD en /data/
+def list_data_files() -> list[str]:
+    return [
+        os.path.join(DATA_PATH, file)
+        for file in sorted(os.listdir(DATA_PATH))
+        if file.endswith((".txt", ".md"))
+    ]
+
+# Carga los documentos indicados (por defecto todos los TXT y MD desde /data/)
+def load_documents(paths: list[str] | None = None):
     docs = []
-    for file in os.listdir(DATA_PATH):
-        if file.endswith((".txt", ".md")):
-            loader = TextLoader(os.path.join(DATA_PATH, file), encoding="utf-8") # Crear cargador de texto
-            docs.extend(loader.load()) # Cargar y agregar documentos
+    for path in (list_data_files() if paths is None else paths):
+        loader = TextLoader(path, encoding="utf-8") # Crear cargador de texto
+        docs.extend(loader.load()) # Cargar y agregar documentos
     return docs
 
 # Divide documentos en chunks con solapamiento
@@ -22,3 +30,19 @@ def split_documents(documents, chunk_size=600, chunk_overlap=100):
         separators=["\n\n", "\n", ".", "!", "?", " "]
     )
     return splitter.split_documents(documents)
+
+# Carga y trocea un fichero → lista de chunks {"id", "text", "metadata"}.
+# Es la ÚNICA definición de cómo se generan los chunks y sus IDs (hash_text): la usan tanto
+# el indexado online como el builder multiproceso (por eso es una función de módulo, serializable).
+def chunk_file(path: str) -> list[dict]:
+    chunks = []
+    for chunk in split_documents(load_documents([path])):
+        chunk_text = chunk.page_content.strip() # Limpiar espacios en blanco alrededor y verificar texto vacío
+        if not chunk_text:
+            continue
+        chunks.append({
+            "id": hash_text(chunk_text),
+            "text": chunk_text,
+            "metadata": {"source": chunk.metadata.get("source", "desconocido")}
+        })
+    return chunks
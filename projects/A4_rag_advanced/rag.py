@@ -1,88 +1,120 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-from app.services.llm_client import llm
-from .config import COLLECTION_NAME, EMBEDDING_MODEL
+from config_base import INDEX_BATCH_SIZE
+from app.services.llm_client import llm, llm_stream
+from app.services.embedding_batcher import aembed_query
+from app.services.answer_cache import bump_index_version, cached_llm_answer, cached_llm_stream
+from app.services.indexing import index_chunks, parallel_map
+from app.services.index_manifest import FileManifest
+from app.services.index_state import get_index_state
+from app.services.bm25 import ensure_bm25_index
+from app.services.hybrid import hybrid_query
+from .config import COLLECTION_NAME, EMBEDDING_MODEL, MANIFEST_PATH
 from .chroma_client import collection
-from .loader import load_documents, split_documents
+from .loader import DATA_PATH, list_data_files, chunk_file
 from .prompts import rag_prompt
-from .utils import hash_text, is_chunk_indexed, format_sources
+from .utils import format_sources
 
-# Modelo de embeddings del proyecto
-model = SentenceTransformer(EMBEDDING_MODEL)
+# Estado del índice (pending / building / ready / failed) para /a4/status y /ready
+index_state = get_index_state(COLLECTION_NAME)
 
 # ==========================================================
-# Construcción del índice (siempre se reconstruye si hay nuevos documentos)
+# Construcción del índice (incremental por fichero)
 # ==========================================================
 
+# Genera (de forma perezosa, fichero a fichero) los chunks {"id", "text", "metadata"}
+# y registra en el manifiesto los IDs de cada fichero una vez troceado.
+# Con workers > 1 la carga y el chunking se reparten en un pool de procesos.
+def _iter_file_chunks(paths: list[str], manifest: FileManifest, workers: int = 1):
+    for path, file_chunks in zip(paths, parallel_map(chunk_file, paths, workers)):
+        yield from file_chunks
+        manifest.record(path, [item["id"] for item in file_chunks])
+        index_state.file_done()
+
 # Crea embeddings y guarda documentos nuevos en la colección persistente.
-def build_vectorstore():
+# Solo se cargan y trocean los ficheros nuevos o modificados según el manifiesto;
+# los chunks de ficheros editados o eliminados se borran de la colección.
+# workers > 1 → carga y chunking en paralelo (modo offline / CLI, ver build_index.py).
+def build_vectorstore(workers: int = 1, batch_size: int = INDEX_BATCH_SIZE):
     print(f"Construyendo colección persistente '{COLLECTION_NAME}'...")
 
-    # Cargar y dividir documentos
-    raw_chunks = split_documents(load_documents())
-    if not raw_chunks:
-        print("No se encontraron documentos para procesar.")
+    try:
+        # Índice léxico (BM25) con los chunks ya indexados; se actualiza junto con la colección
+        lexical = ensure_bm25_index(collection)
+        manifest = FileManifest(MANIFEST_PATH, DATA_PATH)
+
+        # Si la colección tiene menos chunks de los que el manifiesto dice haber indexado
+        # (p.ej. se borró chroma_db), el manifiesto no es fiable → revisamos todo
+        if collection.count() < len(manifest.referenced_ids()):
+            print("Manifiesto desincronizado con la colección, se revisarán todos los ficheros.")
+            manifest.reset()
+
+        changed_files, removed_files = manifest.diff(list_data_files())
+    except Exception as e:
+        index_state.fail(e)
+        raise
+
+    if not changed_files and not removed_files:
+        manifest.save()  # Puede haber actualizado mtimes de ficheros con contenido idéntico
+        index_state.finish()
+        print("No se encontraron ficheros nuevos o modificados (colección ya actualizada).")
         return collection
 
-    # Lista de nuevos chunks a indexar
-    new_chunks = []
-
-    # Recorrer raw_chunks que es un list[Document] con documentos fragmentados y verificar duplicados, 
-    # cada elemento Document de la lista contiene las propiedades page_content y metadata
-    for chunk in raw_chunks:
-        chunk_text = chunk.page_content.strip() # Limpiar espacios en blanco alrededor y verificar texto vacío
-        if not chunk_text:
-            continue
-
-        chunk_id = hash_text(chunk_text)
-        if not is_chunk_indexed(chunk_id):
-            new_chunks.append({
-                "id": chunk_id,
-                "text": chunk_text,
-                "metadata": {"source": chunk.metadata.get("source", "desconocido")}
-            })
-
-    # Si hay nuevos chunks, calcular embeddings y añadirlos
-    if new_chunks:
-        print(f"Generando {len(new_chunks)} nuevos embeddings...")
-        
-        chunks_text = [item["text"] for item in new_chunks]
-        ids = [item["id"] for item in new_chunks]
-        metadatas = [item["metadata"] for item in new_chunks]
-        vectors = model.encode(chunks_text).tolist()
-        
-        collection.add(
-            ids=ids,
-            documents=chunks_text,
-            embeddings=vectors,
-            metadatas=metadatas
-        )
-        print(f"{len(new_chunks)} fragmentos añadidos a '{COLLECTION_NAME}'.")
-    else:
-        print("No se encontraron nuevos fragmentos para indexar (colección ya actualizada).")
-
+    with index_state.building(files_total=len(changed_files)):
+        _update_vectorstore(manifest, lexical, changed_files, removed_files, workers, batch_size)
     return collection
 
+# Indexa los ficheros nuevos o modificados y borra los chunks de los editados o eliminados.
+def _update_vectorstore(manifest: FileManifest, lexical, changed_files: list[str], removed_files: list[str], workers: int, batch_size: int):
+    # IDs que tenían los ficheros modificados/eliminados antes de esta ejecución
+    previous_ids = set()
+    for path in changed_files:
+        previous_ids.update(manifest.chunk_ids(path))
+    for key in removed_files:
+        previous_ids.update(manifest.chunk_ids(key))
+        manifest.forget(key)
+
+    # Cargar, dividir, embeber e insertar por lotes SOLO los ficheros nuevos o modificados
+    added = index_chunks(
+        collection,
+        _iter_file_chunks(changed_files, manifest, workers),
+        EMBEDDING_MODEL,
+        batch_size=batch_size,
+        label=COLLECTION_NAME,
+        on_progress=index_state.progress,
+        lexical_index=lexical,
+    )
+
+    # Borrar chunks que ya no pertenecen a ningún fichero (editados o eliminados)
+    stale_ids = list(previous_ids - manifest.referenced_ids())
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        lexical.remove(stale_ids)
+        print(f"{len(stale_ids)} fragmentos obsoletos eliminados de '{COLLECTION_NAME}'.")
+
+    # Cambios en el índice → las respuestas cacheadas pueden haber quedado obsoletas
+    if added or stale_ids:
+        bump_index_version(COLLECTION_NAME)
+
+    # El manifiesto se guarda al final: si algo falla antes, la próxima ejecución reprocesa esos ficheros
+    manifest.save()
+
 
 # ==========================================================
 # Recuperación de contexto
 # ==========================================================
 
 # Recupera contexto relevante desde la colección Chroma.
-def retrieve_context(question: str, n_results: int = 3):
+async def retrieve_context(question: str, n_results: int = 3):
     # Convertir pregunta → embedding
-    query_vec = model.encode([question]).tolist()[0]
+    query_vec = await aembed_query(question, EMBEDDING_MODEL)
 
-    # Consultar la colección en ChromaDB
-    results = collection.query(
-        query_embeddings=[query_vec],
-        n_results=n_results
-    )
+    # Búsqueda híbrida: ChromaDB (vectorial) + BM25 (léxica), fusionadas con RRF
+    results = await hybrid_query(collection, question, query_vec, n_results)
 
     # Extraer documentos y metadatos (si no existen, usar listas vacías), distancias para posibles futuros usos
     retrieved_docs = results.get("documents", [[]])[0]
     metadatas = results.get("metadatas", [[]])[0]
     distances = results.get("distances", [[]])[0]
+    chunk_ids = results.get("ids", [[]])[0]
 
     # Construir el contexto concatenado para el LLM
     context = "\n\n".join(retrieved_docs)
@@ -90,7 +122,7 @@ def retrieve_context(question: str, n_results: int = 3):
     # Formatear las fuentes para la respuesta
     sources = format_sources(metadatas, distances)
 
-    return context, sources
+    return context, sources, chunk_ids
 
 
 # ==========================================================
@@ -110,6 +142,21 @@ async def _answer_with_llm(context: str, question: str) -> str:
 
 # Ejecuta el pipeline RAG completo: búsqueda + generación.
 async def answer_query(question: str):
-    context, sources = retrieve_context(question)
-    answer = await _answer_with_llm(context, question)
+    context, sources, chunk_ids = await retrieve_context(question)
+    answer = await cached_llm_answer(
+        "/a4/query", COLLECTION_NAME, chunk_ids, rag_prompt, question,
+        lambda: _answer_with_llm(context, question), EMBEDDING_MODEL,
+    )
     return {"answer": answer, "sources": sources}
+
+
+# Versión streaming del pipeline: devuelve las fuentes (para enviarlas primero)
+# y un generador async con los tokens de la respuesta.
+async def stream_answer_query(question: str):
+    context, sources, chunk_ids = await retrieve_context(question)
+    prompt = rag_prompt.format(context=context, question=question)
+    tokens = cached_llm_stream(
+        "/a4/query", COLLECTION_NAME, chunk_ids, rag_prompt, question,
+        lambda: llm_stream(prompt), EMBEDDING_MODEL,
+    )
+    return sources, tokens
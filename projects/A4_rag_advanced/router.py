@@ -1,24 +1,31 @@
-import threading
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from .config import COLLECTION_NAME
 from .schemas import QueryRequest, QueryResponse, SourceDocument
-from .rag import build_vectorstore, answer_query
+from app.services.sse import sse_event, sse_response
+from app.services.index_state import get_index_state, require_index_ready
+from .rag import build_vectorstore, answer_query, stream_answer_query
 
 router = APIRouter(prefix="/a4", tags=["A4 - RAG Avanzado"])
 
-# Lanzamos indexado en segundo plano al importar el router
-def _auto_build_index():
-    try:
-        print("Construyendo índice RAG avanzado en background...")
-        build_vectorstore()
-        print("Índice RAG avanzado listo.")
-    except Exception as e:
-        print(f"[RAG] Error durante el indexado automático: {e}")
+# Indexado al arrancar el servidor (lo ejecuta el lifespan de app/main.py en background)
+def startup():
+    print("Construyendo índice RAG avanzado en background...")
+    build_vectorstore()
+    print("Índice RAG avanzado listo.")
 
-threading.Thread(target=_auto_build_index, daemon=True).start()
+
+@router.get(
+    "/status",
+    summary="Estado del índice del proyecto",
+    description="Estado del indexado (`pending`, `building`, `ready`, `failed`), chunks procesados / total y ETA estimado.",
+)
+def index_status():
+    return get_index_state(COLLECTION_NAME).snapshot()
 
 
 @router.post(
     "/query",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
     summary="RAG Avanzado con LangChain y fuentes puntuadas",
     description="""
     Implementar un pipeline **RAG completo** usando **LangChain**, con:
@@ -39,3 +46,28 @@ async def query_rag(req: QueryRequest):
         answer=result["answer"],
         sources=formatted_sources,
     )
+
+
+@router.post(
+    "/query/stream",
+    dependencies=[Depends(require_index_ready(COLLECTION_NAME))],
+    summary="RAG Avanzado (streaming SSE)",
+    description="""
+    Igual que `/a4/query`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `sources`: fuentes puntuadas (se envían primero).
+    - `token`: fragmentos de la respuesta a medida que el LLM los genera.
+    - `done`: fin del stream.
+    """,
+    response_description="Stream text/event-stream con fuentes y tokens",
+)
+async def query_rag_stream(req: QueryRequest):
+    sources, tokens = await stream_answer_query(req.question)
+    formatted_sources = [SourceDocument(**src).model_dump() for src in sources]
+
+    async def events():
+        yield sse_event("sources", {"sources": formatted_sources})
+        async for token in tokens:
+            yield sse_event("token", {"text": token})
+        yield sse_event("done", {})
+
+    return sse_response(events())
@@ -0,0 +1,94 @@
+import argparse
+import glob
+import json
+import os
+import time
+from ..config import CRAWL_CACHE_PATH
+from ..extractors import EXTRACTORS, available_extractors, extract_text
+
+# ==========================================================
+# Benchmark de extractores HTML → texto
+# ----------------------------------------------------------
+# Compara, sobre HTML guardado, cada backend instalado con y sin
+# extracción de contenido principal:
+#   - throughput (páginas/s y MB/s de HTML)
+#   - tamaño de la salida (caracteres y líneas)
+#   - solapamiento con la salida de referencia (bs4 sin contenido
+#     principal = comportamiento original del scraper)
+#
+# Fixtures: benchmarks/fixtures/*.html y, con --from-cache, las
+# páginas descargadas por el crawler (CRAWL_CACHE_PATH).
+#
+# Uso (desde la raíz del repo):
+#   python -m projects.A4_rag_advanced_v2.benchmarks.bench_extractors --repeat 50
+# ==========================================================
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixtures(from_cache: bool) -> dict[str, str]:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_PATH, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+
+    if from_cache:
+        for path in sorted(glob.glob(os.path.join(CRAWL_CACHE_PATH, "*.json"))):
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            pages[entry["url"]] = entry["body"]
+    return pages
+
+
+# Proporción de líneas de la referencia que siguen presentes en la salida
+def _recall(output: str, reference: str) -> float:
+    ref_lines = set(reference.splitlines())
+    if not ref_lines:
+        return 1.0
+    return len(ref_lines & set(output.splitlines())) / len(ref_lines)
+
+
+def run(pages: dict[str, str], repeat: int):
+    total_mb = sum(len(html.encode("utf-8")) for html in pages.values()) / 1e6
+    backends = available_extractors()
+    reference = {name: extract_text(html, "bs4", main_content=False) for name, html in pages.items()} if "bs4" in backends else None
+
+    print(f"{len(pages)} páginas, {total_mb:.2f} MB de HTML, {repeat} repeticiones\n")
+    print(f"{'backend':<12} {'main':<6} {'pág/s':>9} {'MB/s':>8} {'chars':>9} {'líneas':>7} {'recall':>7}")
+
+    for backend in EXTRACTORS:
+        if backend not in backends:
+            print(f"{backend:<12} (no instalado)")
+            continue
+        for main_content in (False, True):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs = {name: extract_text(html, backend, main_content) for name, html in pages.items()}
+            elapsed = time.perf_counter() - start
+
+            chars = sum(len(text) for text in outputs.values())
+            lines = sum(text.count("\n") + 1 for text in outputs.values() if text)
+            recall = (
+                sum(_recall(outputs[name], reference[name]) for name in pages) / len(pages)
+                if reference else float("nan")
+            )
+            print(
+                f"{backend:<12} {str(main_content):<6} {len(pages) * repeat / elapsed:>9.1f} "
+                f"{total_mb * repeat / elapsed:>8.2f} {chars:>9} {lines:>7} {recall:>7.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los extractores HTML de A4_rag_advanced_v2")
+    parser.add_argument("--repeat", type=int, default=20, help="Veces que se procesa cada página")
+    parser.add_argument("--from-cache", action="store_true", help="Incluir las páginas de la caché del crawler")
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.from_cache)
+    if not pages:
+        raise SystemExit("No hay fixtures HTML que procesar")
+    run(pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
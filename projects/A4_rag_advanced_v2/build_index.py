@@ -0,0 +1,30 @@
+import argparse
+import os
+from config_base import INDEX_BATCH_SIZE
+from .config import URLS_TO_SCRAPE
+from .rag import build_vectorstore
+
+# ==========================================================
+# Indexado offline (CLI)
+# ----------------------------------------------------------
+# Construye el índice fuera del servidor, repartiendo la carga y el
+# chunking de ficheros entre varios procesos mientras el proceso
+# principal embebe e inserta los lotes. Los IDs de chunk son los
+# mismos que genera el indexado online (misma función chunk_file).
+#
+# Uso (desde la raíz del repo):
+#   python -m projects.A4_rag_advanced_v2.build_index --workers 8
+# ==========================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el índice de A4_rag_advanced_v2 en paralelo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos para cargar y trocear ficheros")
+    parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE, help="Chunks por lote de embeddings/upsert")
+    parser.add_argument("--no-web", action="store_true", help="No scrapear URLS_TO_SCRAPE, solo /data/")
+    args = parser.parse_args()
+
+    build_vectorstore(None if args.no_web else URLS_TO_SCRAPE, workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
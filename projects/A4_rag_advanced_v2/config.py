@@ -1,3 +1,4 @@
+import os
 from config_base import CHROMA_PATH, DEFAULT_EMBEDDING_MODEL
 
 COLLECTION_NAME = "a4_docs_v2"
@@ -7,4 +8,18 @@ URLS_TO_SCRAPE = [
     "https://es.wikipedia.org/wiki/Web_scraping",
     "https://es.wikipedia.org/wiki/Base_de_datos_de_vectores",
     # Añade más URLs según sea necesario
-]
\ No newline at end of file
+]
+
+# Crawler async (scraping de URLS_TO_SCRAPE)
+CRAWL_CACHE_PATH = os.path.join(CHROMA_PATH, f"{COLLECTION_NAME}_http_cache") # Respuestas cacheadas (ETag / Last-Modified)
+CRAWL_MAX_CONNECTIONS = 20       # Conexiones HTTP simultáneas en total
+CRAWL_PER_HOST_CONCURRENCY = 4   # Peticiones simultáneas máximas a un mismo host
+CRAWL_TIMEOUT = 10               # Timeout (segundos) por petición
+
+# Extracción HTML → texto (ver extractors.py)
+HTML_EXTRACTOR = "auto"     # "auto" | "selectolax" | "lxml" | "bs4"
+HTML_MAIN_CONTENT = True    # Quedarse solo con el contenido principal (sin menús, pies, formularios...)
+
+# Reranking con cross-encoder (ver app/services/reranker.py)
+RERANK_ENABLED = False      # Recuperar RERANK_CANDIDATES chunks, reordenarlos y quedarse con los mejores
+RERANK_CANDIDATES = 30      # Candidatos recuperados (búsqueda híbrida) antes de reordenar
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+import httpx
+from .config import CRAWL_CACHE_PATH, CRAWL_MAX_CONNECTIONS, CRAWL_PER_HOST_CONCURRENCY, CRAWL_TIMEOUT
+from .scraper import HEADERS
+
+logger = logging.getLogger(__name__)
+
+# ==========================================================
+# Crawler async para la ingesta web
+# ----------------------------------------------------------
+# - Un único httpx.AsyncClient (pool de conexiones compartido).
+# - Límite de peticiones simultáneas por host.
+# - Peticiones condicionales (If-None-Match / If-Modified-Since)
+#   a partir de una caché de respuestas en disco: si la página no
+#   ha cambiado (304, o mismo contenido) se marca como no cambiada
+#   y el indexado puede saltársela.
+# - crawl() NO escribe en la caché: quien indexa llama a
+#   ResponseCache.commit(page) cuando los chunks de esa página ya
+#   están guardados. Si el indexado falla a medias, la caché sigue
+#   con la versión anterior y la próxima ejecución la reprocesa.
+#
+# Para probarlo contra un servidor HTTP local basta con pasar un
+# `client` propio y un `cache_dir` temporal a crawl() (ver
+# tests/test_a4v2_crawler.py).
+# ==========================================================
+
+
+@dataclass
+class CrawlResult:
+    url: str
+    html: str | None          # Cuerpo de la página (descargado o desde caché)
+    changed: bool             # True si el contenido es nuevo o distinto del cacheado
+    from_cache: bool = False  # True si el cuerpo sale de la caché (respuesta 304)
+    status: int | None = None
+    error: str | None = None
+    etag: str | None = None           # Validadores a guardar en la caché (ResponseCache.commit)
+    last_modified: str | None = None
+
+
+# Caché de respuestas en disco: un JSON por URL con cuerpo, ETag y Last-Modified
+class ResponseCache:
+    def __init__(self, cache_dir: str = CRAWL_CACHE_PATH):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> dict | None:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url: str, body: str, etag: str | None, last_modified: str | None):
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+            "fetched_at": time.time(),
+            "body": body,
+        }
+        tmp_path = self._path(url) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(url))
+
+    # Guarda una página descargada (llamar solo cuando ya está indexada).
+    def commit(self, page: CrawlResult):
+        if page.html is not None:
+            self.put(page.url, page.html, page.etag, page.last_modified)
+
+
+# Descarga una URL respetando el límite del host y la caché condicional.
+async def _fetch(client: httpx.AsyncClient, url: str, cache: ResponseCache, host_limits: dict) -> CrawlResult:
+    host = urlsplit(url).netloc
+    semaphore = host_limits.setdefault(host, asyncio.Semaphore(CRAWL_PER_HOST_CONCURRENCY))
+
+    cached = cache.get(url)
+    headers = dict(HEADERS)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        async with semaphore:
+            resp = await client.get(url, headers=headers, follow_redirects=True)
+
+        # 304 → la página no ha cambiado desde la última descarga
+        if resp.status_code == 304 and cached:
+            return CrawlResult(
+                url, cached["body"], changed=False, from_cache=True, status=304,
+                etag=resp.headers.get("etag", cached.get("etag")),
+                last_modified=resp.headers.get("last-modified", cached.get("last_modified")),
+            )
+
+        resp.raise_for_status()
+        body = resp.text
+        changed = not cached or cached.get("sha256") != hashlib.sha256(body.encode("utf-8")).hexdigest()
+        return CrawlResult(
+            url, body, changed=changed, status=resp.status_code,
+            etag=resp.headers.get("etag"), last_modified=resp.headers.get("last-modified"),
+        )
+
+    except Exception as e:
+        logger.warning("Error descargando %s: %s", url, e)
+        return CrawlResult(url, None, changed=False, error=str(e))
+
+
+# Descarga todas las URLs en paralelo (solapando las esperas de red) y devuelve un resultado por URL, en el mismo orden.
+async def crawl(
+    urls: list[str],
+    client: httpx.AsyncClient | None = None,
+    cache_dir: str = CRAWL_CACHE_PATH,
+) -> list[CrawlResult]:
+    cache = ResponseCache(cache_dir)
+    host_limits: dict[str, asyncio.Semaphore] = {}
+
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=CRAWL_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(CRAWL_TIMEOUT),
+        )
+    try:
+        return await asyncio.gather(*(_fetch(client, url, cache, host_limits) for url in urls))
+    finally:
+        if own_client:
+            await client.aclose()
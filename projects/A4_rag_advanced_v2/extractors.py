@@ -0,0 +1,181 @@
+import importlib.util
+from .config import HTML_EXTRACTOR, HTML_MAIN_CONTENT
+
+# ==========================================================
+# Extracción HTML → texto (backends intercambiables)
+# ----------------------------------------------------------
+# Backends disponibles, de más rápido a más lento:
+#   - "selectolax" → parser en C (backend lexbor), opcional
+#   - "lxml"       → libxml2, opcional
+#   - "bs4"        → BeautifulSoup (usa lxml como parser si está instalado,
+#                    si no html.parser). Es el fallback de siempre.
+# Con HTML_EXTRACTOR = "auto" se usa el primero instalado.
+#
+# Extracción de contenido principal (HTML_MAIN_CONTENT):
+#   - se busca el contenedor principal (<main>, <article>, #mw-content-text, ...)
+#   - dentro se eliminan navegación, pies, formularios, cajas laterales, etc.
+#   - si no hay contenedor (o está vacío) se usa <body> sin <header>
+# Así se embeben menos chunks "basura" (menús, pies de página, enlaces legales).
+#
+# Comparativa de backends: benchmarks/bench_extractors.py
+# ==========================================================
+
+# Etiquetas que nunca contienen texto útil
+NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe"]
+
+# Etiquetas de "boilerplate" que se descartan con la extracción de contenido principal
+BOILERPLATE_TAGS = ["nav", "footer", "aside", "form"]
+
+# Clases de boilerplate habituales (cajas de navegación y enlaces de edición de Wikipedia, etc.)
+BOILERPLATE_CLASSES = ["navbox", "mw-editsection", "noprint", "sidebar", "cookie-banner"]
+
+# Contenedores de contenido principal, por orden de preferencia: (selector CSS, equivalente XPath)
+MAIN_CONTENT_SELECTORS = [
+    ("main", "//main"),
+    ("article", "//article"),
+    ('[role="main"]', '//*[@role="main"]'),
+    ("#content", '//*[@id="content"]'),
+    ("#mw-content-text", '//*[@id="mw-content-text"]'),
+]
+
+# Por debajo de este número de caracteres el contenedor principal se considera vacío
+MIN_MAIN_CONTENT_CHARS = 200
+
+
+# Limpieza común: líneas sin espacios sobrantes y sin líneas vacías.
+def _clean_lines(text: str) -> str:
+    return "\n".join(filter(None, map(str.strip, text.splitlines())))
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+# ----------------------------------------------------------
+# Backend selectolax
+# ----------------------------------------------------------
+def _extract_selectolax(html: str, main_content: bool) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(NOISE_TAGS)
+
+    root = None
+    if main_content:
+        tree.strip_tags(BOILERPLATE_TAGS)
+        for cls in BOILERPLATE_CLASSES:
+            for node in tree.css(f".{cls}"):
+                node.decompose()
+        for css, _ in MAIN_CONTENT_SELECTORS:
+            node = tree.css_first(css)
+            if node is not None and len(node.text(strip=True)) >= MIN_MAIN_CONTENT_CHARS:
+                root = node
+                break
+        if root is None:
+            tree.strip_tags(["header"])
+
+    root = root or tree.body or tree.root
+    return _clean_lines(root.text(separator="\n")) if root is not None else ""
+
+
+# ----------------------------------------------------------
+# Backend lxml
+# ----------------------------------------------------------
+def _xpath_class(cls: str) -> str:
+    return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+
+
+def _extract_lxml(html: str, main_content: bool) -> str:
+    import lxml.html
+
+    if not html.strip():
+        return ""
+    doc = lxml.html.document_fromstring(html)
+
+    def _drop(xpath: str):
+        for el in doc.xpath(xpath):
+            el.drop_tree()
+
+    _drop("|".join(f"//{tag}" for tag in NOISE_TAGS) + "|//comment()")
+
+    root = None
+    if main_content:
+        _drop("|".join(f"//{tag}" for tag in BOILERPLATE_TAGS))
+        for cls in BOILERPLATE_CLASSES:
+            _drop(_xpath_class(cls))
+        for _, xpath in MAIN_CONTENT_SELECTORS:
+            found = doc.xpath(xpath)
+            if found and len(found[0].text_content().strip()) >= MIN_MAIN_CONTENT_CHARS:
+                root = found[0]
+                break
+        if root is None:
+            _drop("//header")
+
+    if root is None:
+        bodies = doc.xpath("//body")
+        root = bodies[0] if bodies else doc
+    return _clean_lines("\n".join(root.itertext()))
+
+
+# ----------------------------------------------------------
+# Backend BeautifulSoup (fallback)
+# ----------------------------------------------------------
+def _extract_bs4(html: str, main_content: bool) -> str:
+    from bs4 import BeautifulSoup
+
+    # soup contiene el árbol DOM completo; con lxml instalado el parseo es bastante más rápido
+    soup = BeautifulSoup(html, "lxml" if _has_module("lxml") else "html.parser")
+
+    # Cada tag encontrado apunta al árbol de soup: decompose() lo elimina del DOM original
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    root = None
+    if main_content:
+        for tag in soup(BOILERPLATE_TAGS):
+            tag.decompose()
+        for tag in soup.select(", ".join(f".{cls}" for cls in BOILERPLATE_CLASSES)):
+            tag.decompose()
+        for css, _ in MAIN_CONTENT_SELECTORS:
+            node = soup.select_one(css)
+            if node is not None and len(node.get_text(strip=True)) >= MIN_MAIN_CONTENT_CHARS:
+                root = node
+                break
+        if root is None:
+            for tag in soup("header"):
+                tag.decompose()
+
+    root = root or soup.body or soup
+    return _clean_lines(root.get_text(separator="\n"))
+
+
+# Backends registrados: nombre → (módulo requerido, función)
+EXTRACTORS = {
+    "selectolax": ("selectolax", _extract_selectolax),
+    "lxml": ("lxml", _extract_lxml),
+    "bs4": ("bs4", _extract_bs4),
+}
+
+
+# Nombres de los backends instalados, en orden de preferencia.
+def available_extractors() -> list[str]:
+    return [name for name, (module, _) in EXTRACTORS.items() if _has_module(module)]
+
+
+# Resuelve el nombre del backend ("auto" → el primero instalado).
+def resolve_extractor(name: str | None = None) -> str:
+    name = name or HTML_EXTRACTOR
+    if name == "auto":
+        available = available_extractors()
+        if not available:
+            raise RuntimeError("No hay ningún parser HTML instalado (selectolax, lxml o beautifulsoup4)")
+        return available[0]
+    if name not in EXTRACTORS:
+        raise ValueError(f"Extractor HTML desconocido: {name}. Opciones: auto, {', '.join(EXTRACTORS)}")
+    return name
+
+
+# Convierte HTML en texto limpio (una línea por bloque de texto, sin líneas vacías).
+def extract_text(html: str, backend: str | None = None, main_content: bool | None = None) -> str:
+    _, extract = EXTRACTORS[resolve_extractor(backend)]
+    return extract(html, HTML_MAIN_CONTENT if main_content is None else main_content)
@@ -1,5 +1,12 @@
 from langchain_core.prompts import PromptTemplate
 
+# Compresión contextual: resume los chunks recuperados antes de pasarlos a rag_prompt
+compress_prompt = PromptTemplate.from_template("""
+Reduce y resume el siguiente texto manteniendo solo la información esencial para contestar preguntas:
+
+{context}
+""")
+
 rag_prompt = PromptTemplate.from_template("""
 Eres un asistente especializado en RAG. Debes responder **únicamente** con la información que aparezca en el siguiente contexto. 
 No inventes datos, no agregues conocimiento externo y no uses información general que no esté contenida explícitamente en el contexto.
@@ -1,76 +1,124 @@
-from sentence_transformers import SentenceTransformer
-from app.services.llm_client import llm
-from .config import COLLECTION_NAME, EMBEDDING_MODEL
+import asyncio
+from config_base import INDEX_BATCH_SIZE
+from app.services.llm_client import llm, llm_stream
+from app.services.embedding_batcher import aembed_query
+from app.services.answer_cache import bump_index_version, cached_llm_answer, cached_llm_stream
+from app.services.indexing import index_chunks, parallel_map
+from app.services.index_state import get_index_state
+from app.services.bm25 import ensure_bm25_index
+from app.services.hybrid import hybrid_query
+from app.services.reranker import arerank
+from .config import COLLECTION_NAME, EMBEDDING_MODEL, RERANK_ENABLED, RERANK_CANDIDATES
 from .chroma_client import collection
-from .loader import load_documents, split_documents
-from .prompts import rag_prompt
-from .utils import hash_text, is_chunk_indexed, format_sources
-from .scraper import scrape_webpage
+from .loader import list_data_files, chunk_file, chunk_documents
+from .prompts import compress_prompt, rag_prompt
+from .utils import format_sources
+from .scraper import html_to_documents
+from .crawler import crawl, ResponseCache
 
-# Modelo de embeddings del proyecto
-model = SentenceTransformer(EMBEDDING_MODEL)
+# Estado del índice (pending / building / ready / failed) para /a4v2/status y /ready
+index_state = get_index_state(COLLECTION_NAME)
 
 # ==========================================================
 # Construcción del índice (local + web) (siempre se reconstruye si hay nuevos documentos)
 # ==========================================================
 
+# Genera de forma perezosa los chunks {"id", "text", "metadata"} de los ficheros de /data/
+# (en paralelo si workers > 1)
+def _iter_file_chunks(paths: list[str], workers: int = 1):
+    for file_chunks in parallel_map(chunk_file, paths, workers):
+        yield from file_chunks
+        index_state.file_done()
+
+# True si la colección ya tiene algún chunk con esa fuente.
+def _is_source_indexed(source: str) -> bool:
+    return bool(collection.get(where={"source": source}, limit=1, include=[])["ids"])
+
+# Borra de la colección y del índice léxico todos los chunks de una fuente. Devuelve cuántos.
+def _remove_source(source: str, lexical) -> int:
+    ids = collection.get(where={"source": source}, include=[])["ids"]
+    if ids:
+        collection.delete(ids=ids)
+        lexical.remove(ids)
+    return len(ids)
+
+# Indexa las páginas descargadas por el crawler, una a una:
+#   - sin cambios y ya indexada → se salta
+#   - nueva o modificada → se borran sus chunks anteriores (misma `source`) y se indexa la versión actual
+# La caché HTTP de cada página se guarda solo DESPUÉS de insertar sus chunks: si algo falla
+# a medias, la próxima ejecución la ve como cambiada y la vuelve a indexar entera.
+def _index_pages(pages, lexical, batch_size: int, on_progress) -> tuple[int, int]:
+    cache = ResponseCache()
+    added = removed = 0
+    for page in pages:
+        page_added, page_removed = _index_page(page, cache, lexical, batch_size, on_progress)
+        added += page_added
+        removed += page_removed
+        # La página cuenta como hecha solo cuando ya está indexada (progreso / ETA fiables)
+        index_state.file_done()
+    return added, removed
+
+# Indexa una página descargada y guarda su respuesta en la caché de la descarga. Devuelve (añadidos, eliminados).
+def _index_page(page, cache: ResponseCache, lexical, batch_size: int, on_progress) -> tuple[int, int]:
+    if page.html is None:
+        return 0, 0
+    if not page.changed and _is_source_indexed(page.url):
+        print(f"Sin cambios: {page.url}")
+        return 0, 0
+    print(f"Procesando: {page.url}")
+    removed = _remove_source(page.url, lexical)
+    added = index_chunks(
+        collection,
+        chunk_documents(html_to_documents(page.url, page.html)),
+        EMBEDDING_MODEL,
+        batch_size=batch_size,
+        label=COLLECTION_NAME,
+        on_progress=on_progress,
+        lexical_index=lexical,
+    )
+    cache.commit(page)
+    return added, removed
+
 # Crea embeddings y guarda documentos nuevos en la colección persistente.
-def build_vectorstore(urls: list[str] = None):
+# Los documentos se leen, trocean, embeben e insertan por lotes: la memoria no crece con el corpus.
+# workers > 1 → carga y chunking en paralelo (modo offline / CLI, ver build_index.py).
+def build_vectorstore(urls: list[str] = None, workers: int = 1, batch_size: int = INDEX_BATCH_SIZE):
     print("📌 Iniciando indexado...")
-    
-    # list[Document] con todos los chunks sin procesar
-    raw_chunks = []
-    
-    # Documentos locales desde /data/
-    raw_chunks.extend(split_documents(load_documents()))
-    
-    # Documentos scrapeados desde URLs (si se proporcionan)
-    if urls:
-        for url in urls:
-            print(f"Scrapeando y procesando: {url}")
-            scraped_docs = scrape_webpage(url)
-            raw_chunks.extend(split_documents(scraped_docs))
-    
-    if not raw_chunks:
-        print("No se encontraron documentos para procesar.")
-        return collection
-    
-    # Lista de nuevos chunks a indexar
-    new_chunks = []
-
-    # Recorrer raw_chunks que es un list[Document] con documentos fragmentados y verificar duplicados, 
-    # cada elemento Document de la lista contiene las propiedades page_content y metadata
-    for chunk in raw_chunks:
-        chunk_text = chunk.page_content.strip() # Limpiar espacios en blanco alrededor y verificar texto vacío
-        if not chunk_text:
-            continue
-
-        chunk_id = hash_text(chunk_text)
-        if not is_chunk_indexed(chunk_id):
-            new_chunks.append({
-                "id": chunk_id,
-                "text": chunk_text,
-                "metadata": {"source": chunk.metadata.get("source", "desconocido")}
-            })
-
-    # Si hay nuevos chunks, calcular embeddings y añadirlos
-    if new_chunks:
-        print(f"Generando {len(new_chunks)} nuevos embeddings...")
-        
-        chunks_text = [item["text"] for item in new_chunks]
-        ids = [item["id"] for item in new_chunks]
-        metadatas = [item["metadata"] for item in new_chunks]
-        vectors = model.encode(chunks_text).tolist()
-        
-        collection.add(
-            ids=ids,
-            documents=chunks_text,
-            embeddings=vectors,
-            metadatas=metadatas
+
+    paths = list_data_files()
+    # Progreso por "fuentes" (ficheros locales + URLs) para estimar el total de chunks y el ETA
+    with index_state.building(files_total=len(paths) + len(urls or [])):
+        # Índice léxico (BM25) con los chunks ya indexados; se actualiza junto con la colección
+        lexical = ensure_bm25_index(collection)
+
+        # index_chunks() se llama varias veces: el progreso acumula lo ya procesado
+        chunks_before = 0
+        def _on_progress(processed: int, added: int):
+            index_state.progress(chunks_before + processed)
+
+        added = index_chunks(
+            collection,
+            _iter_file_chunks(paths, workers),
+            EMBEDDING_MODEL,
+            batch_size=batch_size,
+            label=COLLECTION_NAME,
+            on_progress=_on_progress,
+            lexical_index=lexical,
         )
-        print(f"{len(new_chunks)} fragmentos añadidos a '{COLLECTION_NAME}'.")
-    else:
-        print("No se encontraron nuevos fragmentos para indexar (colección ya actualizada).")
+        removed = 0
+
+        if urls:
+            chunks_before = index_state.chunks_done
+            # Descarga concurrente de todas las URLs (build_vectorstore corre en un hilo sin event loop propio)
+            pages = asyncio.run(crawl(urls))
+            pages_added, removed = _index_pages(pages, lexical, batch_size, _on_progress)
+            added += pages_added
+
+        if added or removed:
+            # Cambios en el índice → las respuestas cacheadas pueden haber quedado obsoletas
+            bump_index_version(COLLECTION_NAME)
+        else:
+            print("No se encontraron nuevos fragmentos para indexar (colección ya actualizada).")
 
     return collection
 
@@ -80,14 +128,7 @@ def build_vectorstore(urls: list[str] = None):
 
 # Usa el LLM para comprimir múltiples documentos en un solo contexto.
 async def compress_context(docs: list[str]) -> str:
-    joined = "\n\n".join(docs)
-
-    prompt = f"""
-        Reduce y resume el siguiente texto manteniendo solo la información esencial para contestar preguntas:
-
-        {joined}
-    """
-
+    prompt = compress_prompt.format(context="\n\n".join(docs))
     compressed = await llm(prompt)
     return compressed
 
@@ -96,25 +137,32 @@ async def compress_context(docs: list[str]) -> str:
 # ==========================================================
 
 # Recupera contexto relevante desde la colección Chroma.
-def retrieve_context(question: str, n_results: int = 3) -> (tuple[list[str], list[dict]]):
+async def retrieve_context(question: str, n_results: int = 3) -> tuple[list[str], list[dict], list[str]]:
     # Convertir pregunta → embedding
-    query_vec = model.encode([question]).tolist()[0]
+    query_vec = await aembed_query(question, EMBEDDING_MODEL)
 
-    # Consultar la colección en ChromaDB
-    results = collection.query(
-        query_embeddings=[query_vec],
-        n_results=n_results
-    )
+    # Búsqueda híbrida: ChromaDB (vectorial) + BM25 (léxica), fusionadas con RRF
+    # Con reranking se recuperan más candidatos y el cross-encoder elige los n_results mejores
+    candidates = max(n_results, RERANK_CANDIDATES) if RERANK_ENABLED else n_results
+    results = await hybrid_query(collection, question, query_vec, candidates)
 
     # Extraer documentos y metadatos (si no existen, usar listas vacías), distancias para posibles futuros usos
     retrieved_docs = results.get("documents", [[]])[0]
     metadatas = results.get("metadatas", [[]])[0]
     distances = results.get("distances", [[]])[0]
-    
+    chunk_ids = results.get("ids", [[]])[0]
+
+    if RERANK_ENABLED and len(retrieved_docs) > n_results:
+        order = await arerank(question, retrieved_docs, n_results)
+        retrieved_docs = [retrieved_docs[i] for i in order]
+        metadatas = [metadatas[i] for i in order]
+        distances = [distances[i] for i in order]
+        chunk_ids = [chunk_ids[i] for i in order]
+
     # Formatear las fuentes para la respuesta
     sources = format_sources(metadatas, distances)
 
-    return retrieved_docs, sources
+    return retrieved_docs, sources, chunk_ids
 
 
 # ==========================================================
@@ -132,12 +180,38 @@ async def _answer_with_llm(context: str, question: str) -> str:
 # Pipeline principal RAG
 # ==========================================================
 
+# La respuesta depende de los dos prompts: cambiar cualquiera de ellos invalida la caché
+_ANSWER_TEMPLATES = (compress_prompt, rag_prompt)
+
 # Ejecuta el pipeline RAG completo: recuperación, compresión y respuesta.
 async def answer_query(question: str):
-    docs, sources = retrieve_context(question)
-    
-    # compresión contextual
-    context_compressed = await compress_context(docs)
-    
-    answer = await _answer_with_llm(context_compressed, question)
+    docs, sources, chunk_ids = await retrieve_context(question)
+
+    # compresión contextual + respuesta (se omiten si la respuesta ya está cacheada)
+    async def _generate() -> str:
+        context_compressed = await compress_context(docs)
+        return await _answer_with_llm(context_compressed, question)
+
+    answer = await cached_llm_answer(
+        "/a4v2/query", COLLECTION_NAME, chunk_ids, _ANSWER_TEMPLATES, question,
+        _generate, EMBEDDING_MODEL,
+    )
     return {"answer": answer, "sources": sources}
+
+
+# Versión streaming del pipeline: devuelve las fuentes (para enviarlas primero)
+# y un generador async con los tokens de la respuesta (la compresión no se streamea).
+async def stream_answer_query(question: str):
+    docs, sources, chunk_ids = await retrieve_context(question)
+
+    async def _stream():
+        context_compressed = await compress_context(docs)
+        prompt = rag_prompt.format(context=context_compressed, question=question)
+        async for token in llm_stream(prompt):
+            yield token
+
+    tokens = cached_llm_stream(
+        "/a4v2/query", COLLECTION_NAME, chunk_ids, _ANSWER_TEMPLATES, question,
+        _stream, EMBEDDING_MODEL,
+    )
+    return sources, tokens
@@ -1,36 +1,19 @@
-import requests
-from bs4 import BeautifulSoup
 from langchain_core.documents import Document
+from .extractors import extract_text
 
-# Función para scrapear una página web y devolver su contenido como lista de Document
-def scrape_webpage(url: str) -> list[Document]:
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/123.0.0.0 Safari/537.36"
-        )
-    }
-    
-    resp = requests.get(url, headers=headers, timeout=10)
-    resp.raise_for_status()
+# Cabeceras de navegador para evitar bloqueos básicos anti-bots
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/123.0.0.0 Safari/537.36"
+    )
+}
 
-    # Parseamos el contenido HTML, soup contiene el árbol DOM completo
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    # Extraemos texto visible, obtenemos los tags no deseados y los eliminamos de soup
-    # tag representa cada etiqueta no deseada encontrada y es un apuntador a la misma en el árbol DOM que contiene soup
-    # tag no es un objeto independiente, por lo que al eliminarlo de soup, se elimina del árbol DOM original
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose() # Elimina etiquetas no deseadas
-
-    # Obtenemos el texto limpio del árbol DOM modificado
-    # retorna texto del dom sin tags HTML y separado por saltos de línea
-    text = soup.get_text(separator="\n")
-    # retorna una lista de líneas limpias sin espacios en blanco ni líneas vacías
-    clean_lines = [line.strip() for line in text.splitlines() if line.strip()]
-    # unimos las líneas limpias en un solo string separado por saltos de línea
-    clean_text = "\n".join(clean_lines)
+# Convierte el HTML de una página en una lista con un solo Document (texto limpio + URL como fuente).
+# El parser HTML y la extracción de contenido principal se configuran en extractors.py / config.py.
+def html_to_documents(url: str, html: str) -> list[Document]:
+    clean_text = extract_text(html)
 
     # Retornamos el contenido como una lista con un solo Document
     return [Document(page_content=clean_text, metadata={"source": url})]
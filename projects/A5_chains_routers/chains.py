@@ -1,5 +1,5 @@
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import RunnableBranch, RunnableLambda
 from app.services.llm_client import llm_chain
 from .prompts import (
     classifier_prompt,
@@ -27,52 +27,45 @@ parser = StrOutputParser()
 
 classifier_chain = classifier_prompt | llm | parser
 
+# Chains "de texto" (Prompt → LLM → Parser): devuelven solo el texto generado.
+# Se usan tal cual para streaming y, envueltas con metadata, en el router.
+general_text_chain = general_prompt | llm | parser
+code_text_chain = code_prompt | llm | parser
+summary_text_chain = summary_prompt | llm | parser
+math_text_chain = math_prompt | llm | parser
+
 general_chain = (
-    general_prompt
-    | llm
-    | parser
+    general_text_chain
     | RunnableLambda(lambda x: {"answer": x, "chain_used": "general_chain"})
 )
 
 code_chain = (
-    code_prompt
-    | llm
-    | parser
+    code_text_chain
     | RunnableLambda(lambda x: {"answer": x, "chain_used": "code_chain"})
 )
 
 summary_chain = (
-    summary_prompt
-    | llm
-    | parser
+    summary_text_chain
     | RunnableLambda(lambda x: {"answer": x, "chain_used": "summary_chain"})
 )
 
 math_chain = (
-    math_prompt
-    | llm
-    | parser
+    math_text_chain
     | RunnableLambda(lambda x: {"answer": x, "chain_used": "math_chain"})
 )
 
-# rag_chain = (
-#     rag_chain
-#     | RunnableLambda(lambda x: {"answer": x, "chain_used": "rag_chain"})
-# )
-
-rag_chain = (
-    # 1) Recibir la pregunta
-    {"input": RunnablePassthrough()} # filtro que solo pasa el input
+# Paso async del rag_chain: añade el contexto recuperado a la pregunta
+async def _add_context(x: dict) -> dict:
+    return {
+        "input": x["input"],
+        "context": await retrieve_context(x["input"])
+    }
 
-    # 2) Recuperar contexto
-    | RunnableLambda(
-        lambda x: {
-            "input": x["input"],
-            "context": retrieve_context(x["input"])
-        }
-    )
+rag_text_chain = (
+    # 1) Recibir {"intent", "input"} y recuperar contexto para la pregunta
+    RunnableLambda(_add_context)
 
-    # 3) Construir prompt
+    # 2) Construir prompt
     | RunnableLambda(
         lambda x: rag_prompt.format(
             context=x["context"],
@@ -80,11 +73,15 @@ rag_chain = (
         )
     )
 
-    # 4) LLM
+    # 3) LLM
     | llm
     | parser
+)
+
+rag_chain = (
+    rag_text_chain
 
-    # 5) Envolver salida con metadata
+    # 4) Envolver salida con metadata
     | RunnableLambda(lambda x: {"answer": x, "chain_used": "rag_chain"})
 )
 
@@ -116,8 +113,8 @@ router_chain = RunnableBranch(
 #         "answer": <respuesta>
 #     }
 async def run_router_chain(question: str):   
-    # Ejecutar classifier (sync)
-    intent = classifier_chain.invoke({"input": question}).strip().lower()
+    # Ejecutar classifier (async, usa el pool HTTP compartido sin bloquear el event loop)
+    intent = (await classifier_chain.ainvoke({"input": question})).strip().lower()
 
     # Ejecutar router de forma async
     answer_block = await router_chain.ainvoke(
@@ -129,3 +126,32 @@ async def run_router_chain(question: str):
         "chain_used": answer_block["chain_used"],
         "answer": answer_block["answer"].strip(),
     }
+
+
+# ======================================================
+# Versión streaming
+# ======================================================
+
+# Misma lógica de enrutado que router_chain, pero devuelve la chain de texto (streameable)
+def _select_text_chain(intent: str):
+    if "rag" in intent:
+        return "rag_chain", rag_text_chain
+    if "code" in intent:
+        return "code_chain", code_text_chain
+    if "summary" in intent:
+        return "summary_chain", summary_text_chain
+    if "math" in intent:
+        return "math_chain", math_text_chain
+    return "general_chain", general_text_chain
+
+# Igual que run_router_chain pero emite:
+#   1) {"intent": ..., "chain_used": ...} en cuanto se conoce la intención
+#   2) cada fragmento de texto (str) a medida que el LLM lo genera
+async def stream_router_chain(question: str):
+    intent = (await classifier_chain.ainvoke({"input": question})).strip().lower()
+    chain_used, text_chain = _select_text_chain(intent)
+    yield {"intent": intent, "chain_used": chain_used}
+
+    async for chunk in text_chain.astream({"intent": intent, "input": question}):
+        if chunk:
+            yield chunk
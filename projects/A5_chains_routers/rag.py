@@ -1,22 +1,18 @@
-from sentence_transformers import SentenceTransformer
 from app.services.llm_client import llm
+from app.services.embedding_batcher import aembed_query
+from app.services.hybrid import hybrid_query
 from config_base import DEFAULT_EMBEDDING_MODEL
-from projects.A4_rag_advanced_v2.chroma_client import collection
+from app.services.chroma_registry import get_collection
+from projects.A4_rag_advanced_v2.config import COLLECTION_NAME as A4V2_COLLECTION_NAME
 from .prompts import rag_prompt
 
-# Modelo de embeddings
-model = SentenceTransformer(DEFAULT_EMBEDDING_MODEL)
-
 # Recupera contexto relevante desde la colección Chroma del proyecto A4_rag_advanced_v2
-def retrieve_context(question: str, n_results: int = 3) -> str:
+async def retrieve_context(question: str, n_results: int = 3) -> str:
     # Convertir pregunta → embedding
-    query_vec = model.encode([question]).tolist()[0]
+    query_vec = await aembed_query(question, DEFAULT_EMBEDDING_MODEL)
     
-    # Consultar la colección en ChromaDB del proyecto A4_rag_advanced_v2
-    results = collection.query(
-        query_embeddings=[query_vec],
-        n_results=n_results
-    )
+    # Búsqueda híbrida (vectorial + BM25) en la colección del proyecto A4_rag_advanced_v2
+    results = await hybrid_query(get_collection(A4V2_COLLECTION_NAME), question, query_vec, n_results)
     
     # Extraer documentos (si no existen, usar listas vacías)
     retrieved_docs = results.get("documents", [[]])[0]
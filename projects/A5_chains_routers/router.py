@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from .schemas import A5Request, A5Response
-from .chains import run_router_chain
+from app.services.sse import sse_event, sse_response
+from .chains import run_router_chain, stream_router_chain
 
 router = APIRouter(
     prefix="/a5",
@@ -21,4 +22,27 @@ router = APIRouter(
 )
 async def query(req: A5Request):
     result = await run_router_chain(req.question)
-    return A5Response(**result)
\ No newline at end of file
+    return A5Response(**result)
+
+
+@router.post(
+    "/query/stream",
+    summary="Pipeline con clasificación y enrutado dinámico (streaming SSE)",
+    description="""
+    Igual que `/a5/query`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `meta`: intención detectada y chain usada (se envía primero).
+    - `token`: fragmentos de la respuesta a medida que el LLM los genera.
+    - `done`: fin del stream.
+    """,
+    response_description="Stream text/event-stream con intención y tokens",
+)
+async def query_stream(req: A5Request):
+    async def events():
+        async for item in stream_router_chain(req.question):
+            if isinstance(item, dict):
+                yield sse_event("meta", item)
+            else:
+                yield sse_event("token", {"text": item})
+        yield sse_event("done", {})
+
+    return sse_response(events())
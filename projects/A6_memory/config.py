@@ -1,4 +1,66 @@
-from config_base import CHROMA_PATH
+import os
+from config_base import CHROMA_PATH, DEFAULT_EMBEDDING_MODEL
 
 COLLECTION_NAME = "a6_memory"
-CHROMA_PATH = CHROMA_PATH
\ No newline at end of file
+CHROMA_PATH = CHROMA_PATH
+
+# Modelo local compartido para embeber memorias y preguntas (no el embedder implícito de Chroma)
+EMBEDDING_MODEL = DEFAULT_EMBEDDING_MODEL
+
+# === Almacén de memorias por usuario (SQLite) ===
+
+# Fuente de verdad para listar / borrar memorias por usuario (índice (user_id, created_at))
+MEMORY_DB_PATH = os.path.join(CHROMA_PATH, "a6_memory.sqlite3")
+
+# Máximo de memorias que devuelve GET /memory_state/{user_id}
+MEMORY_STATE_LIMIT = 100
+
+# === Selección de memorias para el prompt ===
+
+# Memorias más recientes del usuario que se puntúan en cada pregunta
+MEMORY_CANDIDATES = 200
+
+# Puntuación = (1 - w) · similitud con la pregunta + w · recencia,
+# con recencia = 0.5 ** (antigüedad / vida media)
+MEMORY_RECENCY_WEIGHT = 0.3
+MEMORY_RECENCY_HALF_LIFE_DAYS = 30
+
+# Tokens (estimados) máximos de memoria que se añaden al prompt
+MEMORY_TOKEN_BUDGET = 300
+
+# Recuperación semántica opcional (ChromaDB): añade a los candidatos las memorias
+# más parecidas a la pregunta aunque sean más antiguas que las MEMORY_CANDIDATES recientes
+MEMORY_SEMANTIC_RECALL = False
+MEMORY_SEMANTIC_TOP_K = 5
+
+# === Escritura de memoria en background ===
+
+# La destilación (LLM) y el guardado de la memoria se hacen fuera del camino crítico de /query
+MEMORY_WRITER_ENABLED = True
+MEMORY_WRITER_SHARDS = 4          # Colas independientes (las tareas de un mismo user_id van siempre a la misma, en orden)
+MEMORY_WRITER_QUEUE_SIZE = 1000   # Tareas máximas por cola; si se llena, /query espera (backpressure)
+MEMORY_WRITER_FLUSH_TIMEOUT = 30  # Segundos máximos para vaciar las colas al apagar el worker
+
+# === Sesiones de conversación (mensajes recientes + resumen incremental) ===
+
+# Estado de cada conversación (session_id): mensajes aún no resumidos + resumen de los anteriores
+SESSION_DB_PATH = os.path.join(CHROMA_PATH, "a6_sessions.sqlite3")
+SESSION_CACHE_SIZE = 1024                  # Sesiones en memoria (LRU) delante de SQLite
+
+# Cuando los mensajes sin resumir superan este nº de tokens (estimados), el LLM pliega
+# los más antiguos en el resumen (en background, sin retrasar la respuesta)
+SESSION_SUMMARIZE_THRESHOLD_TOKENS = 800
+SESSION_KEEP_MESSAGES = 4                  # Mensajes más recientes que se conservan literales al resumir
+SESSION_SUMMARY_MAX_TOKENS = 300           # Tamaño máximo del resumen
+
+# Tokens máximos de historial en el prompt (aunque el resumen esté pendiente):
+# prompt acotado = resumen + historial + memoria + pregunta, sin importar la longitud de la conversación
+SESSION_HISTORY_MAX_TOKENS = SESSION_SUMMARIZE_THRESHOLD_TOKENS
+
+# Tope duro de mensajes sin resumir guardados por sesión (si el resumidor falla una y otra vez,
+# se descartan los más antiguos en vez de crecer sin límite)
+SESSION_MAX_STORED_TOKENS = 4 * SESSION_SUMMARIZE_THRESHOLD_TOKENS
+
+# Colas del resumidor (los resúmenes de una misma sesión se hacen en orden)
+SESSION_SUMMARIZER_SHARDS = 2
+SESSION_SUMMARIZER_QUEUE_SIZE = 1000
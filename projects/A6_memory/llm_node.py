@@ -1,31 +1,41 @@
-from typing import List, Dict, Any, Union
-import uuid
+from typing import List, Dict, Any, Union, Tuple
+import asyncio
 import logging
+import time
 from .schemas import ChatState
 from app.services.llm_client import llm
+from app.services.retrieval import run_retrieval
+from app.services.embeddings import embed_documents
+from app.services.background_queue import ShardedTaskQueue
 from .prompts import memory_prompt, memory_preparation_prompt
 from .chroma_client import collection
-from .utils import clean_memory_text
+from .memory_store import get_memory_store
+from .memory_recall import select_memories
+from .config import EMBEDDING_MODEL, MEMORY_WRITER_ENABLED, MEMORY_WRITER_SHARDS, MEMORY_WRITER_QUEUE_SIZE
+from .session_store import format_messages
+from .utils import clean_memory_text, get_field
 
 logger = logging.getLogger(__name__)
 
-async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Nodo principal del grafo encargado de:
-    - Normalizar el estado entrante (dict o Pydantic)
-    - Preparar memoria nueva con ayuda de un LLM
-    - Guardar memoria del usuario en ChromaDB
-    - Consultar memoria previa relevante
-    - Generar respuesta usando dicha memoria
-    - Devolver un estado consistente para el siguiente nodo
+# Cola de escritura de memoria: destilar + guardar no retrasa la respuesta.
+# Las memorias de un mismo user_id se escriben en orden (misma cola).
+memory_writer = ShardedTaskQueue("a6_memory_writer", MEMORY_WRITER_SHARDS, MEMORY_WRITER_QUEUE_SIZE)
 
-    Este nodo es el corazón del sistema de memoria.
-    """
 
-    # ======================================================
-    # 1. Normalizar el estado recibido (puede ser dict o ChatState)
-    # ======================================================
-    # Extraemos user_id, mensajes, summary y meta sin importar el formato
+# ======================================================
+# Pasos reutilizables del nodo
+# ------------------------------------------------------
+# call_llm_node los ejecuta en orden. El endpoint de
+# streaming (/a6memory/query/stream) los reutiliza por
+# separado para poder enviar tokens antes de persistir
+# la memoria.
+# ======================================================
+
+def normalize_state(state: Union[ChatState, Dict[str, Any]]) -> Tuple[Any, List[Dict[str, str]], Any, Dict[str, Any]]:
+    """
+    Extrae (user_id, mensajes, summary, meta) de un estado que puede ser
+    dict o ChatState, y convierte los mensajes a dicts {"role", "content"}.
+    """
     if isinstance(state, dict):
         _user_id = state.get("user_id")
         _messages = state.get("messages") or []
@@ -38,9 +48,6 @@ async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, An
         _summary = getattr(state, "summary", None)
         _meta = getattr(state, "meta", {}) or {}
 
-    # ======================================================
-    # 2. Normalizar mensajes → convertirlos a dicts estándar
-    # ======================================================
     # LangGraph y Chroma deben trabajar con mensajes homogéneos
     msgs: List[Dict[str, str]] = []
     for m in _messages:
@@ -55,73 +62,137 @@ async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, An
         if role and content is not None:
             msgs.append({"role": role, "content": content})
 
-    # ======================================================
-    # 3. Preparar memoria mediante LLM (memory_preparation_prompt)
-    #    - Se extrae la parte relevante del último mensaje del usuario
-    #    - El LLM destila la información para almacenarla limpia
-    # ======================================================
-    if _user_id:
-        try:
-            # Buscar el último mensaje enviado por el usuario
-            user_last_msg = ""
-            for m in reversed(msgs):
-                if m["role"] == "user":
-                    user_last_msg = m["content"]
-                    break
-
-            # Enviar ese mensaje al prompt de preparación de memoria
-            prep_prompt = memory_preparation_prompt.format(input=user_last_msg)
-            prepared_memory = await llm(prep_prompt)
-            prepared_memory = clean_memory_text(prepared_memory)
-
-            # Guardar solo si el LLM devuelve algo útil
-            if prepared_memory:
-                collection.add(
-                    documents=[prepared_memory],
-                    metadatas=[{"user_id": _user_id}],
-                    ids=[f"{_user_id}_{uuid.uuid4().hex}"]
-                )
-        except Exception as e:
-            logger.exception("Error guardando memoria del usuario en ChromaDB: %s", e)
+    return _user_id, msgs, _summary, _meta
 
-    # ======================================================
-    # 4. Recuperar memoria existente del usuario
-    #    - Se consulta ChromaDB por todas sus memorias
-    #    - Nos quedamos con las últimas 10 para el prompt
-    # ======================================================
-    memory_docs: List[str] = []
-    if _user_id:
-        try:
-            results = collection.query(
-                query_texts=[""],   # consulta vacía → trae todas las memorias del user
-                n_results=100,
-                where={"user_id": _user_id}
+
+# Último mensaje enviado por el usuario (o "" si no hay).
+def last_user_message(msgs: List[Dict[str, str]]) -> str:
+    for m in reversed(msgs):
+        if m["role"] == "user":
+            return m["content"]
+    return ""
+
+
+async def store_user_memory(user_id: str, user_message: str) -> None:
+    """
+    Destila con el LLM (memory_preparation_prompt) la información útil del
+    mensaje del usuario y la guarda (SQLite + ChromaDB) si hay algo que recordar.
+    """
+    if not user_id:
+        return
+    try:
+        prep_prompt = memory_preparation_prompt.format(input=user_message)
+        prepared_memory = await llm(prep_prompt)
+        prepared_memory = clean_memory_text(prepared_memory)
+
+        # Guardar solo si el LLM devuelve algo útil
+        if prepared_memory:
+            # Embedding explícito con el modelo compartido: se guarda junto a la memoria
+            # (para las siguientes selecciones) y en Chroma con el mismo ID (recuperación semántica)
+            embeddings = await asyncio.to_thread(embed_documents, [prepared_memory], EMBEDDING_MODEL)
+            created_at = time.time()
+            memory_id = await run_retrieval(
+                get_memory_store().add, user_id, prepared_memory, None, created_at, embeddings[0], EMBEDDING_MODEL
+            )
+            await run_retrieval(
+                collection.add,
+                documents=[prepared_memory],
+                embeddings=embeddings,
+                metadatas=[{"user_id": user_id, "created_at": created_at}],  # Fecha también en Chroma (reimportable)
+                ids=[memory_id]
             )
+    except Exception as e:
+        logger.exception("Error guardando memoria del usuario: %s", e)
+
 
-            # results["documents"] es una lista de listas -> accedemos al primer grupo
-            memory_docs = results.get("documents", [[]])[0]
+# Encola la escritura de la memoria (o la hace en el momento si el writer está desactivado).
+async def enqueue_user_memory(user_id: str, user_message: str) -> None:
+    if not user_id:
+        return
+    if MEMORY_WRITER_ENABLED:
+        await memory_writer.submit(user_id, store_user_memory, user_id, user_message)
+    else:
+        await store_user_memory(user_id, user_message)
+
+
+async def load_user_memory(user_id: str, question: str = "") -> str:
+    """
+    Devuelve, listas para el prompt, las memorias del usuario más útiles
+    para la pregunta (similitud + recencia) que caben en MEMORY_TOKEN_BUDGET,
+    en orden cronológico. Sin pregunta se eligen solo por recencia.
+    """
+    memory_docs: List[str] = []
+    if user_id:
+        try:
+            memory_docs = await select_memories(user_id, question)
         except Exception as e:
             logger.exception("Error recuperando memoria para prompt: %s", e)
 
-    # Memoria concatenada (solo últimas 10 entradas)
-    memory_text = "\n".join(memory_docs[-10:] or [])
+    return "\n".join(memory_docs)
+
+
+# Prompt final de respuesta: memoria + resumen y últimos mensajes de la sesión + pregunta.
+def build_answer_prompt(memory_text: str, question: str, summary: str = "", history: List[Dict[str, str]] = None) -> str:
+    return memory_prompt.format(
+        memory=memory_text,
+        summary=summary or "",
+        history=format_messages(history or []),
+        input=question,
+    )
+
+
+# Mensajes anteriores a la pregunta actual (la ventana termina con ella).
+def history_before_question(msgs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return msgs[:-1] if msgs and msgs[-1]["role"] == "user" else msgs
+
+
+async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Nodo principal del grafo encargado de:
+    - Normalizar el estado entrante (dict o Pydantic)
+    - Encolar la preparación (LLM) y el guardado de la memoria nueva (en background)
+    - Seleccionar la memoria previa relevante (similitud + recencia, presupuesto de tokens)
+    - Generar respuesta usando dicha memoria
+    - Devolver un estado consistente para el siguiente nodo
+
+    Este nodo es el corazón del sistema de memoria.
+    """
 
     # ======================================================
-    # 5. Determinar la pregunta del usuario real
+    # 1. Normalizar el estado recibido (puede ser dict o ChatState)
+    #    y convertir los mensajes a dicts estándar
+    # ======================================================
+    _user_id, msgs, _summary, _meta = normalize_state(state)
+
+    # ======================================================
+    # 2. Preparar memoria mediante LLM (memory_preparation_prompt)
+    #    - Se extrae la parte relevante del último mensaje del usuario
+    #    - El LLM destila la información para almacenarla limpia
+    #    - Se hace en background (memory_writer): la respuesta no
+    #      espera a esta llamada al LLM. El mensaje actual ya va
+    #      en el prompt como pregunta.
+    # ======================================================
+    await enqueue_user_memory(_user_id, last_user_message(msgs))
+
+    # ======================================================
+    # 3. Determinar la pregunta del usuario real
     #    (puede venir desde meta o desde mensajes)
     # ======================================================
-    question = _meta.get("last_user_question", "")
-    if not question:
-        for m in reversed(msgs):
-            if m["role"] == "user":
-                question = m["content"]
-                break
+    question = _meta.get("last_user_question", "") or last_user_message(msgs)
+
+    # ======================================================
+    # 4. Recuperar memoria existente del usuario
+    #    - Puntuada por similitud con la pregunta y recencia
+    #    - Solo las que caben en el presupuesto de tokens
+    # ======================================================
+    memory_text = await load_user_memory(_user_id, question)
 
     # ======================================================
-    # 6. Generar respuesta del LLM usando memoria + pregunta
+    # 5. Generar respuesta del LLM usando memoria + contexto de la sesión + pregunta
     # ======================================================
+    answer_failed = False
     try:
-        prompt = memory_prompt.format(memory=memory_text, input=question)
+        prompt = build_answer_prompt(memory_text, question, _summary, history_before_question(msgs))
         answer = await llm(prompt)
 
         # Aseguramos que sea string
@@ -131,9 +202,10 @@ async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, An
     except Exception as e:
         logger.exception("Error llamando al LLM: %s", e)
         answer = "Error al generar la respuesta."
+        answer_failed = True  # save_session no guarda este turno en el historial
 
     # ======================================================
-    # 7. Construir el nuevo estado para el grafo
+    # 6. Construir el nuevo estado para el grafo
     # ======================================================
     assistant_msg = {"role": "assistant", "content": answer}
 
@@ -148,7 +220,9 @@ async def call_llm_node(state: Union[ChatState, Dict[str, Any]]) -> Dict[str, An
     # Devolvemos un estado totalmente normalizado en formato dict
     return {
         "user_id": _user_id,
+        "session_id": get_field(state, "session_id"),
         "messages": new_msgs,
         "summary": _summary,
         "meta": new_meta,
+        "answer_failed": answer_failed,
     }
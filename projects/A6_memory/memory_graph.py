@@ -1,5 +1,28 @@
 from langgraph.graph import StateGraph, START, END
+from app.services.retrieval import run_retrieval
 from .llm_node import call_llm_node
+from .session_store import get_session_store, trim_messages_to_tokens
+from .summarizer import schedule_summary
+from .config import SESSION_HISTORY_MAX_TOKENS, SESSION_MAX_STORED_TOKENS
+
+
+# ======================================================
+# Nodo 0: load_session_node
+# ------------------------------------------------------
+# Recupera la sesión (mensajes sin resumir + resumen) del
+# session_id (por defecto, el user_id) y antepone sus
+# mensajes al mensaje nuevo. La sesión está normalmente
+# en la LRU en memoria; si no, se lee de SQLite.
+# ======================================================
+async def load_session_node(state: dict) -> dict:
+    session_id = state.get("session_id") or state.get("user_id")
+    state["session_id"] = session_id
+
+    session = await run_retrieval(get_session_store().get, session_id) if session_id else None
+    if session:
+        state["messages"] = session["messages"] + (state.get("messages") or [])
+        state["summary"] = session["summary"]
+    return state
 
 
 # ======================================================
@@ -19,23 +42,41 @@ async def add_user_message_node(state: dict) -> dict:
 # ======================================================
 # Nodo 2: maybe_summarize_node
 # ------------------------------------------------------
-# Este nodo crea un pequeño resumen de los últimos mensajes.
-# El objetivo es mantener un "mini contexto" accesible para
-# otros nodos del grafo (por ejemplo para logging o análisis).
-#
-# Este resumen NO se guarda en ChromaDB.
-# Solo sirve como campo auxiliar dentro del estado del grafo.
+# Acota el historial que llega al prompt: solo los
+# mensajes más recientes que caben en
+# SESSION_HISTORY_MAX_TOKENS (+ la pregunta actual).
+# Los antiguos ya están (o estarán, en cuanto termine el
+# resumidor en background) en state["summary"].
 # ======================================================
 async def maybe_summarize_node(state: dict) -> dict:
     messages = state.get("messages", [])
-    
-    # Creamos un resumen concatenando los últimos 10 mensajes
-    # en formato: "role: contenido".
-    state["summary"] = "\n".join([
-        f"{m['role']}: {m['content']}" 
-        for m in messages[-10:]
-    ])
-    
+    if messages:
+        state["messages"] = trim_messages_to_tokens(messages[:-1], SESSION_HISTORY_MAX_TOKENS) + messages[-1:]
+    return state
+
+
+# ======================================================
+# Nodo 4: save_session_node
+# ------------------------------------------------------
+# Añade a la sesión los mensajes de este turno (pregunta
+# y respuesta, los dos últimos del estado) y, si los
+# mensajes sin resumir superan el umbral de tokens,
+# encola el resumen incremental (summarizer.py).
+# Si el LLM falló (answer_failed) el turno no se guarda:
+# el mensaje de error no debe acabar en el historial ni
+# en el resumen.
+# ======================================================
+async def save_session_node(state: dict) -> dict:
+    session_id = state.get("session_id")
+    if session_id and not state.get("answer_failed"):
+        session = await run_retrieval(
+            get_session_store().append,
+            session_id,
+            state.get("user_id") or "",
+            state.get("messages", [])[-2:],
+            SESSION_MAX_STORED_TOKENS,
+        )
+        await schedule_summary(session)
     return state
 
 
@@ -49,9 +90,11 @@ _COMPILED_CHAT_GRAPH = None
 # Crea el grafo conversacional completo de LangGraph.
 # La estructura del grafo es:
 #
-# START → add_user_message
+# START → load_session
+#         → add_user_message
 #         → maybe_summarize
 #         → call_llm
+#         → save_session
 #         → END
 #
 # El grafo se devuelve compilado para ser utilizado por
@@ -62,15 +105,19 @@ def build_chat_graph():
     graph = StateGraph(dict)
 
     # Añadimos los nodos del flujo
+    graph.add_node("load_session", load_session_node)
     graph.add_node("add_user_message", add_user_message_node)
     graph.add_node("maybe_summarize", maybe_summarize_node)
     graph.add_node("call_llm", call_llm_node)
+    graph.add_node("save_session", save_session_node)
 
     # Definimos transiciones entre nodos
-    graph.add_edge(START, "add_user_message")
+    graph.add_edge(START, "load_session")
+    graph.add_edge("load_session", "add_user_message")
     graph.add_edge("add_user_message", "maybe_summarize")
     graph.add_edge("maybe_summarize", "call_llm")
-    graph.add_edge("call_llm", END)
+    graph.add_edge("call_llm", "save_session")
+    graph.add_edge("save_session", END)
 
     # Compilamos el grafo para ejecución
     return graph.compile()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import List, Dict
+import numpy as np
+from app.services.embedding_batcher import aembed_query
+from app.services.embeddings import embed_documents
+from app.services.retrieval import run_retrieval
+from app.services.tokens import estimate_tokens
+from .chroma_client import collection
+from .memory_store import get_memory_store
+from .config import (
+    EMBEDDING_MODEL,
+    MEMORY_CANDIDATES,
+    MEMORY_RECENCY_WEIGHT,
+    MEMORY_RECENCY_HALF_LIFE_DAYS,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_SEMANTIC_RECALL,
+    MEMORY_SEMANTIC_TOP_K,
+)
+
+# ======================================================
+# Selección de memorias para el prompt
+# ------------------------------------------------------
+# 1. Candidatos: las MEMORY_CANDIDATES memorias más
+#    recientes del usuario (+ las más parecidas según
+#    Chroma si MEMORY_SEMANTIC_RECALL).
+# 2. Puntuación: similitud coseno con la pregunta
+#    combinada con un decaimiento exponencial por edad.
+# 3. Empaquetado: de mayor a menor puntuación mientras
+#    quepan en MEMORY_TOKEN_BUDGET tokens (estimados).
+#
+# Los vectores de las memorias se guardan junto a su texto
+# en el almacén de memorias (memory_store.py): los candidatos
+# llegan con su vector en la misma lectura. Solo se embeben
+# (una vez) las que no lo tienen: importadas de Chroma o de
+# otro EMBEDDING_MODEL.
+# ======================================================
+
+_SECONDS_PER_DAY = 86400
+
+
+# Puntuación de cada memoria: (1 - w) · similitud + w · recencia.
+def score_memories(
+    memories: List[Dict],
+    query_vec,
+    memory_vecs,
+    now: float | None = None,
+    recency_weight: float = MEMORY_RECENCY_WEIGHT,
+    half_life_days: float = MEMORY_RECENCY_HALF_LIFE_DAYS,
+) -> List[float]:
+    if not memories:
+        return []
+    now = time.time() if now is None else now
+
+    ages = np.array([max(now - m["created_at"], 0.0) for m in memories]) / _SECONDS_PER_DAY
+    recency = 0.5 ** (ages / half_life_days)
+
+    if query_vec is None:
+        return recency.tolist()
+
+    query = np.asarray(query_vec, dtype=np.float32)
+    vectors = np.asarray(memory_vecs, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    similarity = vectors @ query / np.where(norms == 0, 1.0, norms)
+
+    return ((1 - recency_weight) * similarity + recency_weight * recency).tolist()
+
+
+# Las memorias mejor puntuadas que caben en el presupuesto, en orden cronológico.
+def pack_memories(memories: List[Dict], scores: List[float], token_budget: int = MEMORY_TOKEN_BUDGET) -> List[Dict]:
+    chosen = []
+    used = 0
+    for i in sorted(range(len(memories)), key=lambda i: scores[i], reverse=True):
+        cost = estimate_tokens(memories[i]["text"]) + 1  # +1 por el salto de línea
+        # Una memoria que no cabe no corta la selección: otra más corta puede caber
+        if used + cost <= token_budget:
+            chosen.append(memories[i])
+            used += cost
+    return sorted(chosen, key=lambda m: m["created_at"])
+
+
+# Candidatos extra: memorias del usuario más cercanas a la pregunta según Chroma.
+async def _semantic_candidates(user_id: str, query_vec: List[float]) -> List[Dict]:
+    results = await run_retrieval(
+        collection.query,
+        query_embeddings=[query_vec],
+        n_results=MEMORY_SEMANTIC_TOP_K,
+        where={"user_id": user_id},
+        include=[],
+    )
+    return await run_retrieval(get_memory_store().get_many, results.get("ids", [[]])[0])
+
+
+# Vectores de los candidatos (float32, una fila por memoria); los que faltan se calculan y se guardan.
+async def _memory_vectors(memories: List[Dict]) -> np.ndarray:
+    missing = [m for m in memories if m["embedding"] is None or m["embedding_model"] != EMBEDDING_MODEL]
+    if missing:
+        vectors = await asyncio.to_thread(embed_documents, [m["text"] for m in missing], EMBEDDING_MODEL)
+        for memory, vector in zip(missing, vectors):
+            memory["embedding"] = np.asarray(vector, dtype=np.float32)
+            memory["embedding_model"] = EMBEDDING_MODEL
+        await run_retrieval(
+            get_memory_store().set_embeddings, EMBEDDING_MODEL, {m["id"]: m["embedding"] for m in missing}
+        )
+    return np.stack([m["embedding"] for m in memories])
+
+
+async def select_memories(user_id: str, question: str) -> List[str]:
+    memories = await run_retrieval(get_memory_store().recent, user_id, MEMORY_CANDIDATES)
+
+    query_vec = await aembed_query(question, EMBEDDING_MODEL) if question else None
+
+    if MEMORY_SEMANTIC_RECALL and query_vec is not None:
+        known = {m["id"] for m in memories}
+        memories += [m for m in await _semantic_candidates(user_id, query_vec) if m["id"] not in known]
+
+    if not memories:
+        return []
+
+    memory_vecs = None
+    if query_vec is not None:
+        memory_vecs = await _memory_vectors(memories)
+
+    scores = score_memories(memories, query_vec, memory_vecs)
+    return [m["text"] for m in pack_memories(memories, scores)]
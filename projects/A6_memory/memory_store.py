@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+import numpy as np
+from config_base import CHROMA_ID_LOOKUP_BATCH
+from .config import MEMORY_DB_PATH
+
+# ============================================================
+# Almacén de memorias por usuario (SQLite)
+# ============================================================
+# Antes, para listar las memorias de un usuario se hacía una
+# búsqueda ANN en Chroma con una consulta vacía ("" embebido con el
+# embedder por defecto) y n_results=100/1000, y memory_docs[-10:]
+# cogía diez cualesquiera, no las más recientes.
+#
+# Aquí cada memoria es una fila (id, user_id, created_at, text,
+# embedding) con un índice (user_id, created_at):
+#   - "últimas N" de un usuario → recorrido del índice, O(log n + N),
+#     ya con sus vectores (float32 + modelo que los generó) para la
+#     selección por similitud, sin otra lectura
+#   - borrar todo lo de un usuario → un DELETE por el mismo índice
+# Chroma solo se usa para la recuperación semántica (opcional) y
+# comparte los mismos IDs.
+
+# Fecha de las memorias importadas de Chroma sin fecha en sus metadatos:
+# una época fija antigua (1970), para que el decaimiento por recencia
+# no las confunda con memorias recién creadas.
+LEGACY_CREATED_AT = 0.0
+
+
+# Fecha (epoch) guardada en los metadatos de Chroma ("created_at" o "timestamp",
+# numérica o ISO 8601), o None si no hay.
+def _metadata_time(meta: dict | None) -> float | None:
+    for key in ("created_at", "timestamp"):
+        value = (meta or {}).get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+_COLUMNS = "id, created_at, text, embedding, embedding_model"
+
+
+def _to_blob(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+# Fila → {"id", "created_at", "text", "embedding" (np.float32 o None), "embedding_model"}
+def _row_to_memory(row) -> dict:
+    memory_id, created_at, text, blob, embedding_model = row
+    return {
+        "id": memory_id,
+        "created_at": created_at,
+        "text": text,
+        "embedding": np.frombuffer(blob, dtype=np.float32) if blob is not None else None,
+        "embedding_model": embedding_model,
+    }
+
+
+class MemoryStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Los endpoints llaman desde hilos distintos (run_retrieval): conexión compartida con lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS memories (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                text TEXT NOT NULL,
+                embedding BLOB,
+                embedding_model TEXT
+            )
+            """
+        )
+        # Tablas creadas antes de guardar los vectores (se rellenan al seleccionar memorias)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(memories)")}
+        if "embedding" not in columns:
+            self._conn.execute("ALTER TABLE memories ADD COLUMN embedding BLOB")
+            self._conn.execute("ALTER TABLE memories ADD COLUMN embedding_model TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_memories_user_time ON memories (user_id, created_at)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    # Guarda una memoria (con su vector, si se pasa) y devuelve su ID (el mismo que se usa en Chroma).
+    def add(
+        self,
+        user_id: str,
+        text: str,
+        memory_id: str | None = None,
+        created_at: float | None = None,
+        embedding=None,
+        embedding_model: str | None = None,
+    ) -> str:
+        memory_id = memory_id or f"{user_id}_{uuid.uuid4().hex}"
+        blob = _to_blob(embedding) if embedding is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memories (id, user_id, created_at, text, embedding, embedding_model) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (memory_id, user_id, time.time() if created_at is None else created_at, text, blob,
+                 embedding_model if blob is not None else None),
+            )
+            self._conn.commit()
+        return memory_id
+
+    # Guarda los vectores de memorias ya existentes ({id: vector}), p.ej. las importadas sin vector.
+    def set_embeddings(self, embedding_model: str, vectors: dict):
+        rows = [(_to_blob(vector), embedding_model, memory_id) for memory_id, vector in vectors.items()]
+        with self._lock:
+            self._conn.executemany("UPDATE memories SET embedding = ?, embedding_model = ? WHERE id = ?", rows)
+            self._conn.commit()
+
+    # Las `limit` memorias más recientes del usuario, en orden cronológico.
+    def recent(self, user_id: str, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM memories WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [_row_to_memory(row) for row in reversed(rows)]
+
+    # Memorias con esos IDs (p.ej. los devueltos por Chroma), en orden cronológico.
+    def get_many(self, ids: list[str]) -> list[dict]:
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM memories WHERE id IN ({','.join('?' * len(ids))}) ORDER BY created_at",
+                ids,
+            ).fetchall()
+        return [_row_to_memory(row) for row in rows]
+
+    # Borra todas las memorias del usuario y devuelve sus IDs (para borrarlos también de Chroma).
+    def delete_user(self, user_id: str) -> list[str]:
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM memories WHERE user_id = ?", (user_id,))]
+            self._conn.execute("DELETE FROM memories WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+        return ids
+
+    # Importa las memorias de una colección Chroma si el almacén está vacío.
+    # La fecha sale de los metadatos si existe; si no, LEGACY_CREATED_AT + posición
+    # (se conserva el orden de la colección como orden cronológico).
+    def import_from(self, collection, batch_size: int = CHROMA_ID_LOOKUP_BATCH) -> int:
+        if self.count() or not collection.count():
+            return 0
+        imported = 0
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            rows = [
+                (
+                    memory_id,
+                    (meta or {}).get("user_id", ""),
+                    _metadata_time(meta) or LEGACY_CREATED_AT + offset + i,
+                    doc or "",
+                )
+                for i, (memory_id, doc, meta) in enumerate(zip(page["ids"], page["documents"], page["metadatas"]))
+            ]
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO memories (id, user_id, created_at, text) VALUES (?, ?, ?, ?)", rows
+                )
+                self._conn.commit()
+            imported += len(rows)
+            offset += len(page["ids"])
+        return imported
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+
+_store: MemoryStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_memory_store() -> MemoryStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryStore(MEMORY_DB_PATH)
+    return _store
@@ -22,6 +22,12 @@ Eres un asistente que recuerda información del usuario.
 Memoria relevante del usuario:
 {memory}
 
+Resumen de la conversación anterior:
+{summary}
+
+Últimos mensajes de la conversación:
+{history}
+
 Pregunta del usuario:
 {input}
 
@@ -36,7 +42,27 @@ Instrucciones estrictas:
 7. Si no tienes suficiente información en la memoria para responder, di "No lo sé".
 8. No inventes datos ni respuestas.
 9. No te limites a repetir la memoria, intégrala en la respuesta.
+10. Usa el resumen y los últimos mensajes solo como contexto de la conversación (p.ej. para entender a qué se refiere la pregunta).
 
 
 Respuesta:
-""")
\ No newline at end of file
+""")
+
+session_summary_prompt = PromptTemplate.from_template("""
+Eres un asistente que mantiene el resumen de una conversación entre un usuario y un asistente.
+
+Resumen actual:
+{summary}
+
+Mensajes nuevos que hay que incorporar al resumen:
+{messages}
+
+Instrucciones:
+- Devuelve el resumen actualizado: el resumen actual más lo importante de los mensajes nuevos.
+- Conserva datos concretos (nombres, cifras, fechas, decisiones, preferencias) y los temas pendientes.
+- Elimina saludos, repeticiones y detalles sin importancia.
+- Escribe en tercera persona ("El usuario...", "El asistente...").
+- Máximo {max_words} palabras. Sin títulos ni listas.
+
+Resumen actualizado:
+""")
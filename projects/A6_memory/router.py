@@ -1,7 +1,16 @@
 from fastapi import APIRouter, HTTPException
+from starlette.background import BackgroundTask
 from .schemas import MemoryQuery, MemoryResponse, EmptyResponse, MemoryStateResponse
+from app.services.retrieval import run_retrieval
+from app.services.llm_client import llm_stream
+from app.services.sse import sse_event, sse_response
 from .memory_graph import get_chat_graph
+from .llm_node import load_user_memory, build_answer_prompt, enqueue_user_memory, store_user_memory, memory_writer
 from .chroma_client import collection
+from .memory_store import get_memory_store
+from .session_store import get_session_store, trim_messages_to_tokens
+from .summarizer import schedule_summary, summarizer_queue
+from .config import MEMORY_STATE_LIMIT, MEMORY_WRITER_ENABLED, MEMORY_WRITER_FLUSH_TIMEOUT, SESSION_HISTORY_MAX_TOKENS, SESSION_MAX_STORED_TOKENS
 from .utils import get_field
 import logging
 
@@ -16,6 +25,20 @@ import logging
 router = APIRouter(prefix="/a6memory", tags=["A6 - Memory (LangGraph)"])
 
 
+# Migración única: si el almacén SQLite está vacío, importa las memorias
+# que ya existían solo en ChromaDB (se ejecuta en el lifespan, fuera del event loop).
+def startup():
+    imported = get_memory_store().import_from(collection)
+    if imported:
+        print(f"[A6] {imported} memorias importadas desde ChromaDB")
+
+
+# Al apagar: procesar las memorias y los resúmenes que sigan en cola.
+async def shutdown():
+    await memory_writer.flush(MEMORY_WRITER_FLUSH_TIMEOUT)
+    await summarizer_queue.flush(MEMORY_WRITER_FLUSH_TIMEOUT)
+
+
 # ======================================================
 # POST /a6memory/query
 # ------------------------------------------------------
@@ -34,7 +57,7 @@ router = APIRouter(prefix="/a6memory", tags=["A6 - Memory (LangGraph)"])
     description="""
     Implementa un sistema de chat completo que utiliza **LangGraph** para:
     - Mantener el estado conversacional.
-    - Preparar y consultar memoria persistente usando ChromaDB.
+    - Preparar y consultar memoria persistente (SQLite + ChromaDB).
     - Generar respuestas contextuales con un LLM.
     """,
     response_description="Respuesta generada y detalles de memoria usada",
@@ -46,8 +69,10 @@ async def query_memory(req: MemoryQuery):
     graph = get_chat_graph()
 
     # Estado inicial que pasa al grafo
+    # (el grafo antepone la ventana y el resumen guardados de la sesión)
     initial_state = {
         "user_id": req.user_id,
+        "session_id": req.session_id or req.user_id,
         "messages": [{"role": "user", "content": req.question}],
         "meta": {}
     }
@@ -75,7 +100,7 @@ async def query_memory(req: MemoryQuery):
 
     # ------------------------------------------------------
     # Indicar qué tipo de memoria fue usada:
-    #  - summary → resumen de mensajes recientes
+    #  - summary → resumen de los mensajes anteriores a la ventana
     #  - buffer  → historial de la conversación
     # ------------------------------------------------------
     memory_used = []
@@ -90,11 +115,89 @@ async def query_memory(req: MemoryQuery):
     )
 
 
+# ======================================================
+# POST /a6memory/query/stream
+# ------------------------------------------------------
+# Versión streaming (SSE) de /query:
+#   1. Recupera la memoria existente del usuario y la
+#      sesión (ventana + resumen).
+#   2. Envía los tokens de la respuesta según se generan
+#      y guarda el turno en la sesión.
+#   3. Encola la preparación y el guardado de la nueva
+#      memoria (memory_writer), sin que el usuario tenga
+#      que esperar a esa llamada al LLM.
+# ======================================================
+@router.post(
+    "/query/stream",
+    summary="Consulta con memoria persistente (streaming SSE)",
+    description="""
+    Igual que `/a6memory/query`, pero devuelve la respuesta como **Server-Sent Events**:
+    - `token`: fragmentos de la respuesta a medida que el LLM los genera.
+    - `done`: fin del stream, con la memoria usada.
+
+    La persistencia de la nueva memoria se completa en segundo plano (cola de escritura).
+    """,
+    response_description="Stream text/event-stream con tokens",
+)
+async def query_memory_stream(req: MemoryQuery):
+    memory_text = await load_user_memory(req.user_id, req.question)
+
+    # Misma sesión que /query: resumen + historial reciente acotado
+    session_id = req.session_id or req.user_id
+    session = await run_retrieval(get_session_store().get, session_id) or {"messages": [], "summary": ""}
+    summary = session["summary"]
+    history = trim_messages_to_tokens(session["messages"], SESSION_HISTORY_MAX_TOKENS)
+    prompt = build_answer_prompt(memory_text, req.question, summary, history)
+
+    # Sin writer, la memoria se guarda al cerrar el stream (BackgroundTask)
+    background = None
+    if MEMORY_WRITER_ENABLED:
+        await enqueue_user_memory(req.user_id, req.question)
+    else:
+        background = BackgroundTask(store_user_memory, req.user_id, req.question)
+
+    async def events():
+        tokens = []
+        async for token in llm_stream(prompt):
+            tokens.append(token)
+            yield sse_event("token", {"text": token})
+        updated = await run_retrieval(get_session_store().append, session_id, req.user_id, [
+            {"role": "user", "content": req.question},
+            {"role": "assistant", "content": "".join(tokens).strip()},
+        ], SESSION_MAX_STORED_TOKENS)
+        await schedule_summary(updated)
+        yield sse_event("done", {"memory_used": ["summary", "buffer"] if summary else ["buffer"]})
+
+    return sse_response(events(), background=background)
+
+
+# ======================================================
+# GET /a6memory/status
+# ------------------------------------------------------
+# Métricas de la cola de escritura de memoria
+# (profundidad por cola, tareas procesadas / fallidas,
+# esperas por backpressure y retraso medio), del
+# resumidor de sesiones y de la caché de sesiones.
+# ======================================================
+@router.get(
+    "/status",
+    summary="Estado de la escritura de memoria en background",
+    description="Métricas de la cola de escritura de memoria (profundidad, backpressure, retraso).",
+)
+async def memory_status():
+    return {
+        "memory_writer": memory_writer.stats(),
+        "session_summarizer": summarizer_queue.stats(),
+        "sessions": get_session_store().stats(),
+    }
+
+
 # ======================================================
 # GET /a6memory/memory_state/{user_id}
 # ------------------------------------------------------
-# Devuelve todas las memorias almacenadas en ChromaDB para
-# el user_id indicado.
+# Devuelve las memorias más recientes (hasta
+# MEMORY_STATE_LIMIT) del user_id indicado, en orden
+# cronológico.
 #
 # Útil para debugging, validación o mostrar memoria al usuario.
 # ======================================================
@@ -106,16 +209,8 @@ async def query_memory(req: MemoryQuery):
 )
 async def memory_state(user_id: str):
     try:
-        results = collection.query(
-            query_texts=[""],        # Query vacía → recupera todo lo del usuario
-            n_results=100,
-            where={"user_id": user_id}
-        )
-        
-        # Los documentos vienen en una lista de listas
-        memory_texts = results.get("documents", [[]])[0] 
-        
-        return {"user_id": user_id, "memory": memory_texts}
+        memories = await run_retrieval(get_memory_store().recent, user_id, MEMORY_STATE_LIMIT)
+        return {"user_id": user_id, "memory": [m["text"] for m in memories]}
 
     except Exception as e:
         logging.exception("Error retrieving memory")
@@ -127,8 +222,9 @@ async def memory_state(user_id: str):
 # ------------------------------------------------------
 # Elimina TODAS las memorias de un usuario.
 # Pasos:
-#   1. Buscar todos los IDs asociados al user_id.
-#   2. Eliminar esos IDs en ChromaDB.
+#   1. Borrar sus filas del almacén SQLite (por índice).
+#   2. Borrar los mismos IDs en ChromaDB.
+#   3. Borrar sus sesiones de conversación.
 #
 # Ideal para pruebas o reiniciar el estado de un usuario.
 # ======================================================
@@ -140,18 +236,10 @@ async def memory_state(user_id: str):
 )
 async def clear_memory(user_id: str):
     try:
-        # Recuperar todas las memorias con sus IDs
-        results = collection.query(
-            query_texts=[""],
-            n_results=1000,
-            where={"user_id": user_id}
-        )
-
-        ids_to_delete = results["ids"][0] if results and "ids" in results else []
-
-        # Si existen, eliminar de ChromaDB
-        if ids_to_delete:
-            collection.delete(ids=ids_to_delete)
+        await run_retrieval(get_memory_store().delete_user, user_id)
+        # Filtro por metadatos: también elimina memorias que solo estuvieran en Chroma
+        await run_retrieval(collection.delete, where={"user_id": user_id})
+        await run_retrieval(get_session_store().delete_user, user_id)
 
         return EmptyResponse(ok=True)
 
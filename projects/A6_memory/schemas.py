@@ -13,8 +13,9 @@ class Message(BaseModel):
 # y pasar datos entre ellos.
 class ChatState(BaseModel):
     user_id: Optional[str] = None            # Identificador del usuario (para memoria en ChromaDB)
+    session_id: Optional[str] = None         # Conversación (ventana + resumen persistidos entre turnos)
     messages: Optional[List[Message]] = None # Conversación hasta el momento
-    summary: Optional[str] = None            # Resumen de los últimos mensajes (generado por el grafo)
+    summary: Optional[str] = None            # Resumen de los mensajes que salieron de la ventana
     meta: Optional[Dict[str, Any]] = None    # Información adicional para seguimiento del flujo (última pregunta, etc.)
 
 
@@ -23,6 +24,7 @@ class ChatState(BaseModel):
 class MemoryQuery(BaseModel):
     user_id: str = Field(..., example="fran.aragon")  
     question: str = Field(..., example="Mi número de cliente era 9843, recuérdalo.")
+    session_id: Optional[str] = Field(None, example="fran.aragon-chat-1")  # Por defecto, una sesión por user_id
 
 
 # Respuesta del endpoint /query.
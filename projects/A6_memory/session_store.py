@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict
+from app.services.tokens import estimate_tokens
+from .config import SESSION_DB_PATH, SESSION_CACHE_SIZE
+
+# ======================================================
+# Estado de las conversaciones (por session_id)
+# ------------------------------------------------------
+# Antes /a6memory/query creaba un estado nuevo con solo el
+# mensaje actual en cada llamada: el grafo nunca veía los
+# turnos anteriores.
+#
+# Cada sesión guarda:
+#   - messages: mensajes aún no resumidos (los más recientes)
+#   - summary:  resumen (LLM) de los mensajes anteriores
+#   - offset:   posición absoluta de messages[0] en la conversación
+#   - turns:    nº de turnos
+#
+# Las dos escrituras son read-modify-write atómicas (lock):
+#   - append():        cada turno añade SOLO sus mensajes (con un
+#                      tope duro de tokens por si el resumen falla)
+#   - apply_summary(): el resumidor (summarizer.py, en background)
+#                      sustituye el resumen y quita los mensajes
+#                      que ha plegado (hasta la posición `upto`)
+# Así un turno y un resumen que terminan a la vez no se pisan.
+#
+# SQLite es la fuente de verdad; delante hay una LRU en memoria
+# con las sesiones activas (escritura write-through).
+# ======================================================
+
+_COLUMNS = "user_id, messages, summary, msg_offset, turns, updated_at"
+
+
+class SessionStore:
+    def __init__(self, path: str, cache_size: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                messages TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                msg_offset INTEGER NOT NULL DEFAULT 0,
+                turns INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Tablas creadas antes de existir el resumen incremental
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "msg_offset" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN msg_offset INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+        self._conn.commit()
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, Dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_put(self, session: Dict):
+        if self.cache_size <= 0:
+            return
+        self._cache[session["session_id"]] = session
+        self._cache.move_to_end(session["session_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # Lectura sin copiar (llamar con el lock tomado).
+    def _load(self, session_id: str) -> Dict | None:
+        session = self._cache.get(session_id)
+        if session is not None:
+            self._cache.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+        self.misses += 1
+        row = self._conn.execute(f"SELECT {_COLUMNS} FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        user_id, messages, summary, offset, turns, updated_at = row
+        session = {
+            "session_id": session_id,
+            "user_id": user_id,
+            "messages": json.loads(messages),
+            "summary": summary,
+            "offset": offset,
+            "turns": turns,
+            "updated_at": updated_at,
+        }
+        self._cache_put(session)
+        return session
+
+    # Escritura (llamar con el lock tomado).
+    def _save(self, session: Dict):
+        session["updated_at"] = time.time()
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO sessions (session_id, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                session["session_id"],
+                session["user_id"],
+                json.dumps(session["messages"], ensure_ascii=False),
+                session["summary"],
+                session["offset"],
+                session["turns"],
+                session["updated_at"],
+            ),
+        )
+        self._conn.commit()
+        self._cache_put(session)
+
+    # Sesión guardada (copia) o None si no existe.
+    def get(self, session_id: str) -> Dict | None:
+        with self._lock:
+            session = self._load(session_id)
+            return _copy(session) if session else None
+
+    # Añade los mensajes de un turno (creando la sesión si no existe). Devuelve la sesión resultante.
+    # Con max_tokens, si los mensajes sin resumir lo superan se descartan los más antiguos
+    # (tope duro por si el resumidor no consigue plegarlos).
+    def append(self, session_id: str, user_id: str, messages: List[Dict[str, str]], max_tokens: int | None = None) -> Dict:
+        with self._lock:
+            session = self._load(session_id)
+            session = _copy(session) if session else {
+                "session_id": session_id, "user_id": user_id, "messages": [], "summary": "", "offset": 0, "turns": 0,
+            }
+            session["messages"] += messages
+            session["turns"] += 1
+            if max_tokens is not None and messages_tokens(session["messages"]) > max_tokens:
+                kept = trim_messages_to_tokens(session["messages"], max_tokens) or session["messages"][-1:]
+                session["offset"] += len(session["messages"]) - len(kept)
+                session["messages"] = kept
+            self._save(session)
+            return _copy(session)
+
+    # Sustituye el resumen y quita los mensajes ya plegados en él (posiciones absolutas < upto).
+    # Devuelve False si la sesión ya no existe o ya estaba resumida hasta ahí.
+    def apply_summary(self, session_id: str, upto: int, summary: str) -> bool:
+        with self._lock:
+            session = self._load(session_id)
+            if session is None or upto <= session["offset"]:
+                return False
+            session = _copy(session)
+            session["messages"] = session["messages"][upto - session["offset"]:]
+            session["offset"] = upto
+            session["summary"] = summary
+            self._save(session)
+            return True
+
+    # Borra todas las sesiones de un usuario.
+    def delete_user(self, user_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+            for session_id in [sid for sid, s in self._cache.items() if s["user_id"] == user_id]:
+                del self._cache[session_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def _copy(session: Dict) -> Dict:
+    return {**session, "messages": list(session["messages"])}
+
+
+_store: SessionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(SESSION_DB_PATH, SESSION_CACHE_SIZE)
+    return _store
+
+
+# ======================================================
+# Utilidades de mensajes
+# ======================================================
+
+def format_messages(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+def messages_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + 2 for m in messages)  # +2 por el rol y el salto de línea
+
+
+# Los mensajes más recientes que caben en `max_tokens` (en orden).
+def trim_messages_to_tokens(messages: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for m in reversed(messages):
+        cost = messages_tokens([m])
+        if used + cost > max_tokens:
+            break
+        kept.append(m)
+        used += cost
+    return kept[::-1]
@@ -0,0 +1,90 @@
+import logging
+from typing import Dict
+from app.services.llm_client import llm
+from app.services.retrieval import run_retrieval
+from app.services.background_queue import ShardedTaskQueue
+from app.services.tokens import truncate_to_tokens
+from .prompts import session_summary_prompt
+from .session_store import get_session_store, format_messages, messages_tokens
+from .config import (
+    SESSION_SUMMARIZE_THRESHOLD_TOKENS,
+    SESSION_KEEP_MESSAGES,
+    SESSION_SUMMARY_MAX_TOKENS,
+    SESSION_SUMMARIZER_SHARDS,
+    SESSION_SUMMARIZER_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+if SESSION_KEEP_MESSAGES < 0:
+    raise ValueError(f"SESSION_KEEP_MESSAGES debe ser >= 0 (es {SESSION_KEEP_MESSAGES})")
+
+# ======================================================
+# Resumen incremental de las sesiones
+# ------------------------------------------------------
+# Cuando los mensajes sin resumir de una sesión superan
+# SESSION_SUMMARIZE_THRESHOLD_TOKENS, se encola un trabajo
+# que pide al LLM:  resumen actual + mensajes antiguos
+# → resumen nuevo (máx. SESSION_SUMMARY_MAX_TOKENS), y
+# deja literales solo los SESSION_KEEP_MESSAGES últimos.
+#
+# - Incremental: cada llamada solo procesa los mensajes
+#   nuevos desde el último resumen, nunca el historial.
+# - En background: la respuesta no espera al LLM; mientras
+#   tanto el prompt recorta el historial (maybe_summarize).
+# - Cacheado por sesión: el resumen se guarda en la sesión
+#   (LRU + SQLite) y se reutiliza en todos los turnos hasta
+#   el siguiente pliegue.
+# ======================================================
+
+# Los resúmenes de una misma sesión se hacen en orden (misma cola)
+summarizer_queue = ShardedTaskQueue("a6_session_summarizer", SESSION_SUMMARIZER_SHARDS, SESSION_SUMMARIZER_QUEUE_SIZE)
+
+# Sesiones con un resumen ya encolado (evita encolar uno por turno mientras el LLM responde)
+_pending: set[str] = set()
+
+
+def needs_summary(session: Dict) -> bool:
+    return (
+        len(session["messages"]) > SESSION_KEEP_MESSAGES
+        and messages_tokens(session["messages"]) > SESSION_SUMMARIZE_THRESHOLD_TOKENS
+    )
+
+
+# Encola el resumen de la sesión si ha cruzado el umbral (y no hay otro pendiente).
+async def schedule_summary(session: Dict) -> bool:
+    session_id = session["session_id"]
+    if session_id in _pending or not needs_summary(session):
+        return False
+    _pending.add(session_id)
+    await summarizer_queue.submit(session_id, summarize_session, session_id)
+    return True
+
+
+async def summarize_session(session_id: str) -> None:
+    try:
+        store = get_session_store()
+        # Se relee: pueden haber llegado turnos desde que se encoló
+        session = await run_retrieval(store.get, session_id)
+        if not session or not needs_summary(session):
+            return
+
+        messages = session["messages"]
+        folded = messages[:len(messages) - SESSION_KEEP_MESSAGES]
+        prompt = session_summary_prompt.format(
+            summary=session["summary"] or "(vacío)",
+            messages=format_messages(folded),
+            max_words=int(SESSION_SUMMARY_MAX_TOKENS * 0.75),  # ~0.75 palabras por token
+        )
+        summary = truncate_to_tokens((await llm(prompt)).strip(), SESSION_SUMMARY_MAX_TOKENS)
+        if not summary:
+            return
+
+        # Se quitan solo los mensajes plegados: los turnos que lleguen mientras tanto se conservan
+        await run_retrieval(store.apply_summary, session_id, session["offset"] + len(folded), summary)
+    except Exception as e:
+        # Los mensajes siguen en la sesión: se reintentará en el siguiente turno
+        # (si sigue fallando, SESSION_MAX_STORED_TOKENS acota lo que se guarda)
+        logger.exception("Error resumiendo la sesión %s: %s", session_id, e)
+    finally:
+        _pending.discard(session_id)
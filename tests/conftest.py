@@ -0,0 +1,4 @@
+import os
+
+# llm_client lee la clave al importarse; los tests nunca llegan a llamar a OpenRouter
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from projects.A4_rag_advanced_v2.crawler import ResponseCache, crawl
+
+# Servidor HTTP local que hace de "web":
+#   /etag     → ETag fijo; responde 304 si llega If-None-Match con ese ETag
+#   /static   → mismo cuerpo siempre, sin validadores (200 con el mismo hash)
+#   /changing → cuerpo distinto en cada petición
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, None, {"ETag": '"v1"'})
+            else:
+                self._send(200, "<html><body><p>con etag</p></body></html>", {"ETag": '"v1"'})
+        elif self.path == "/static":
+            self._send(200, "<html><body><p>estática</p></body></html>")
+        elif self.path == "/changing":
+            self._send(200, f"<html><body><p>versión {_Handler.hits[self.path]}</p></body></html>")
+        else:
+            self._send(404, "no encontrada")
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        data = body.encode("utf-8") if body is not None else b""
+        if status != 304:
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _crawl(urls, cache_dir):
+    async def _run():
+        async with httpx.AsyncClient() as client:
+            return await crawl(urls, client=client, cache_dir=cache_dir)
+    return {page.url.rsplit("/", 1)[1]: page for page in asyncio.run(_run())}
+
+
+def test_crawl_conditional_requests(server, tmp_path):
+    urls = [f"{server}/etag", f"{server}/static", f"{server}/changing"]
+    cache_dir = str(tmp_path)
+
+    first = _crawl(urls, cache_dir)
+    assert all(page.status == 200 and page.changed for page in first.values())
+
+    # Sin commit (p.ej. el indexado falló) la caché no cambia: todo sigue "cambiado"
+    second = _crawl(urls, cache_dir)
+    assert all(page.changed for page in second.values())
+    assert second["etag"].status == 200
+
+    cache = ResponseCache(cache_dir)
+    for page in second.values():
+        cache.commit(page)
+
+    third = _crawl(urls, cache_dir)
+    # 304 → cuerpo desde la caché
+    assert third["etag"].status == 304
+    assert third["etag"].from_cache and not third["etag"].changed
+    assert third["etag"].html == second["etag"].html
+    # 200 con el mismo contenido → no cambiada
+    assert third["static"].status == 200 and not third["static"].changed
+    # 200 con contenido nuevo → cambiada
+    assert third["changing"].status == 200 and third["changing"].changed
+
+
+def test_crawl_reports_errors(server, tmp_path):
+    page = _crawl([f"{server}/missing"], str(tmp_path))["missing"]
+    assert page.html is None and page.error and not page.changed
@@ -0,0 +1,47 @@
+import asyncio
+import numpy as np
+import pytest
+from projects.A6_memory import memory_recall
+from projects.A6_memory.memory_store import MemoryStore
+
+_DAY = 86400
+
+
+def test_recency_breaks_similarity_ties():
+    memories = [{"created_at": 0.0, "text": "a"}, {"created_at": 9 * _DAY, "text": "b"}]
+    vecs = [[1.0, 0.0], [1.0, 0.0]]
+    scores = memory_recall.score_memories(memories, [1.0, 0.0], vecs, now=10 * _DAY, recency_weight=0.5, half_life_days=1)
+    assert scores[1] > scores[0]
+
+
+def test_pack_respects_budget_and_returns_chronological_order():
+    memories = [
+        {"created_at": 1.0, "text": "x" * 400},  # ~100 tokens
+        {"created_at": 2.0, "text": "corta"},
+        {"created_at": 3.0, "text": "otra corta"},
+    ]
+    chosen = memory_recall.pack_memories(memories, [0.9, 0.5, 0.8], token_budget=20)
+    assert [m["created_at"] for m in chosen] == [2.0, 3.0]
+
+
+def test_missing_vectors_are_embedded_once_and_stored(tmp_path, monkeypatch):
+    store = MemoryStore(str(tmp_path / "memories.sqlite3"))
+    monkeypatch.setattr(memory_recall, "get_memory_store", lambda: store)
+    embedded = []
+
+    def fake_embed(texts, model_name=None):
+        embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+    monkeypatch.setattr(memory_recall, "embed_documents", fake_embed)
+
+    store.add("u1", "con vector", embedding=[3.0, 4.0], embedding_model=memory_recall.EMBEDDING_MODEL)
+    store.add("u1", "sin", created_at=1.0)
+    store.add("u1", "de otro modelo", created_at=2.0, embedding=[9.0, 9.0], embedding_model="otro")
+
+    vecs = asyncio.run(memory_recall._memory_vectors(store.recent("u1", 10)))
+    assert vecs.shape == (3, 2) and vecs.dtype == np.float32
+    assert sorted(embedded) == ["de otro modelo", "sin"]
+
+    embedded.clear()
+    asyncio.run(memory_recall._memory_vectors(store.recent("u1", 10)))
+    assert embedded == []
@@ -0,0 +1,82 @@
+import pytest
+from projects.A6_memory.memory_store import LEGACY_CREATED_AT, MemoryStore
+
+
+class _FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows  # (id, documento, metadatos)
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit, offset):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [r[0] for r in page],
+            "documents": [r[1] for r in page],
+            "metadatas": [r[2] for r in page],
+        }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MemoryStore(str(tmp_path / "memories.sqlite3"))
+
+
+def test_recent_returns_latest_in_chronological_order(store):
+    for i in range(5):
+        store.add("u1", f"m{i}", created_at=1000.0 + i)
+    store.add("u2", "otra", created_at=2000.0)
+    assert [m["text"] for m in store.recent("u1", 3)] == ["m2", "m3", "m4"]
+
+
+def test_import_keeps_metadata_dates_and_dates_legacy_rows_as_old(store):
+    collection = _FakeCollection([
+        ("a", "sin fecha 1", {"user_id": "u1"}),
+        ("b", "con fecha", {"user_id": "u1", "created_at": 1_700_000_000.0}),
+        ("c", "sin fecha 2", {"user_id": "u1"}),
+        ("d", "fecha ISO", {"user_id": "u1", "timestamp": "2024-01-01T00:00:00+00:00"}),
+    ])
+    assert store.import_from(collection, batch_size=3) == 4
+
+    by_id = {m["id"]: m["created_at"] for m in store.recent("u1", 10)}
+    assert by_id["b"] == 1_700_000_000.0
+    assert by_id["d"] == 1_704_067_200.0
+    # Sin fecha: época fija antigua, conservando el orden de la colección
+    assert LEGACY_CREATED_AT <= by_id["a"] < by_id["c"] < 86400
+
+    # Solo se importa con el almacén vacío
+    assert store.import_from(collection) == 0
+
+
+def test_delete_user_returns_ids(store):
+    ids = {store.add("u1", "a"), store.add("u1", "b")}
+    store.add("u2", "c")
+    assert set(store.delete_user("u1")) == ids
+    assert store.recent("u1", 10) == [] and store.count() == 1
+
+
+def test_embeddings_are_stored_with_the_memory(store):
+    with_vec = store.add("u1", "con vector", created_at=1.0, embedding=[0.5, 1.5], embedding_model="m")
+    without = store.add("u1", "sin vector", created_at=2.0)
+
+    memories = {m["id"]: m for m in store.recent("u1", 10)}
+    assert memories[with_vec]["embedding"].tolist() == [0.5, 1.5]
+    assert memories[with_vec]["embedding_model"] == "m"
+    assert memories[without]["embedding"] is None
+
+    store.set_embeddings("m", {without: [2.0, 3.0]})
+    assert store.get_many([without])[0]["embedding"].tolist() == [2.0, 3.0]
+
+
+def test_old_table_is_migrated(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE memories (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, created_at REAL NOT NULL, text TEXT NOT NULL)")
+    conn.execute("INSERT INTO memories VALUES ('a', 'u1', 1.0, 'antigua')")
+    conn.commit()
+    conn.close()
+
+    memory = MemoryStore(path).recent("u1", 10)[0]
+    assert memory["text"] == "antigua" and memory["embedding"] is None
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from projects.A6_memory import memory_graph
+from projects.A6_memory.session_store import SessionStore
+
+
+def _msgs(*contents):
+    return [{"role": "user", "content": c} for c in contents]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite3"), cache_size=4)
+
+
+def test_append_creates_and_extends(store):
+    store.append("s1", "u1", _msgs("a", "b"))
+    session = store.append("s1", "u1", _msgs("c", "d"))
+    assert [m["content"] for m in session["messages"]] == ["a", "b", "c", "d"]
+    assert session["turns"] == 2 and session["offset"] == 0
+
+
+def test_apply_summary_keeps_messages_appended_meanwhile(store):
+    store.append("s1", "u1", _msgs("a", "b", "c", "d"))
+    # El resumidor leyó 4 mensajes y pliega los 2 primeros; mientras tanto llega otro turno
+    store.append("s1", "u1", _msgs("e", "f"))
+    assert store.apply_summary("s1", 2, "resumen de a y b")
+
+    session = store.get("s1")
+    assert session["summary"] == "resumen de a y b"
+    assert session["offset"] == 2
+    assert [m["content"] for m in session["messages"]] == ["c", "d", "e", "f"]
+
+
+def test_apply_summary_ignores_ranges_already_folded(store):
+    store.append("s1", "u1", _msgs("a", "b", "c", "d"))
+    assert store.apply_summary("s1", 3, "nuevo")
+    assert not store.apply_summary("s1", 2, "antiguo")
+    assert not store.apply_summary("missing", 2, "x")
+    session = store.get("s1")
+    assert session["summary"] == "nuevo" and session["offset"] == 3
+
+
+def test_session_survives_cache_eviction(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SessionStore(path, cache_size=1)
+    store.append("s1", "u1", _msgs("a"))
+    store.append("s2", "u1", _msgs("b"))  # expulsa s1 de la LRU
+    store.apply_summary("s1", 1, "resumen")
+    reopened = SessionStore(path, cache_size=1)
+    session = reopened.get("s1")
+    assert session["offset"] == 1 and session["messages"] == [] and session["summary"] == "resumen"
+
+
+def test_delete_user(store):
+    store.append("s1", "u1", _msgs("a"))
+    store.append("s2", "u2", _msgs("b"))
+    store.delete_user("u1")
+    assert store.get("s1") is None and store.get("s2") is not None
+
+
+def test_failed_answer_is_not_saved(store, monkeypatch):
+    monkeypatch.setattr(memory_graph, "get_session_store", lambda: store)
+    turn = {"session_id": "s1", "user_id": "u1", "messages": [
+        {"role": "user", "content": "hola"},
+        {"role": "assistant", "content": "Error al generar la respuesta."},
+    ]}
+    asyncio.run(memory_graph.save_session_node({**turn, "answer_failed": True}))
+    assert store.get("s1") is None
+
+    asyncio.run(memory_graph.save_session_node({**turn, "answer_failed": False}))
+    assert len(store.get("s1")["messages"]) == 2
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from projects.A6_memory import summarizer
+from projects.A6_memory.session_store import SessionStore
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"pregunta {i} " * 20}, {"role": "assistant", "content": f"respuesta {i} " * 20}]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"), cache_size=4)
+    monkeypatch.setattr(summarizer, "get_session_store", lambda: store)
+    monkeypatch.setattr(summarizer, "SESSION_SUMMARIZE_THRESHOLD_TOKENS", 100)
+    return store
+
+
+def _fill(store, turns):
+    for i in range(turns):
+        session = store.append("s1", "u1", _turn(i))
+    return session
+
+
+@pytest.mark.parametrize("keep", [0, 2])
+def test_summary_folds_all_but_keep_messages(store, monkeypatch, keep):
+    monkeypatch.setattr(summarizer, "SESSION_KEEP_MESSAGES", keep)
+
+    async def fake_llm(prompt):
+        return "resumen"
+    monkeypatch.setattr(summarizer, "llm", fake_llm)
+
+    session = _fill(store, 3)
+    assert summarizer.needs_summary(session)
+    asyncio.run(summarizer.summarize_session("s1"))
+
+    session = store.get("s1")
+    assert session["summary"] == "resumen"
+    assert len(session["messages"]) == keep
+    assert session["offset"] == 6 - keep
+    assert not summarizer.needs_summary(session)
+
+
+def test_failed_summary_keeps_messages(store, monkeypatch):
+    async def failing_llm(prompt):
+        raise RuntimeError("LLM caído")
+    monkeypatch.setattr(summarizer, "llm", failing_llm)
+
+    _fill(store, 3)
+    asyncio.run(summarizer.summarize_session("s1"))
+    session = store.get("s1")
+    assert session["summary"] == "" and len(session["messages"]) == 6 and session["offset"] == 0
+
+
+def test_append_hard_cap_drops_oldest(store):
+    from projects.A6_memory.session_store import messages_tokens
+    for i in range(10):
+        session = store.append("s1", "u1", _turn(i), max_tokens=200)
+    assert messages_tokens(session["messages"]) <= 200
+    assert session["messages"][-1] == _turn(9)[1]
+    assert session["offset"] + len(session["messages"]) == 20
+    assert store.get("s1") == session
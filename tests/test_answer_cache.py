@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from app.services import answer_cache as ac
+from app.services.llm_client import _report_model
+from config_base import DEFAULT_LLM_MODEL, FALLBACK_LLM_MODEL
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ac.AnswerCache(max_entries=8)
+    monkeypatch.setattr(ac, "answer_cache", cache)
+    return cache
+
+
+def _key(template="prompt {question}"):
+    return ac.answer_key("/test", ["c1", "c2"], template, DEFAULT_LLM_MODEL)
+
+
+def test_hit_ignores_whitespace_but_not_case(cache):
+    cache.put(_key(), "¿Qué es  RAG?", "respuesta", "col")
+    assert cache.get(_key(), " ¿Qué es RAG? ") == "respuesta"
+    assert cache.get(_key(), "¿qué es rag?") is None
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_index_version_bump_invalidates(cache):
+    cache.put(_key(), "pregunta", "respuesta", "col-bump")
+    cache.put(_key(), "otra pregunta", "otra", "col-otra")
+    ac.bump_index_version("col-bump")
+    assert cache.get(_key(), "pregunta") is None
+    assert cache.get(_key(), "otra pregunta") == "otra"  # otras colecciones no se tocan
+    assert cache.invalidations == 1
+
+
+def test_answer_generated_with_old_version_is_stale(cache):
+    version = ac.get_index_version("col-stale")
+    ac.bump_index_version("col-stale")
+    cache.put(_key(), "pregunta", "respuesta", "col-stale", version=version)
+    assert cache.get(_key(), "pregunta") is None
+
+
+def test_template_hash_covers_every_prompt():
+    assert ac.template_hash(("compresión", "rag")) != ac.template_hash(("compresión v2", "rag"))
+    assert ac.template_hash("rag") == ac.template_hash(("rag",))
+
+
+def _answer(cache, model_used):
+    async def generate():
+        _report_model(model_used)
+        return f"de {model_used}"
+    return asyncio.run(ac.cached_llm_answer("/test", "col-gen", ["c1"], "p", "pregunta", generate))
+
+
+def test_fallback_answer_is_not_cached(cache):
+    assert _answer(cache, FALLBACK_LLM_MODEL) == f"de {FALLBACK_LLM_MODEL}"
+    assert cache.stats()["entries"] == 0 and cache.fallback_skips == 1
+
+    assert _answer(cache, DEFAULT_LLM_MODEL) == f"de {DEFAULT_LLM_MODEL}"
+    assert _answer(cache, FALLBACK_LLM_MODEL) == f"de {DEFAULT_LLM_MODEL}"  # ahora sale de la caché
+
+
+def test_stream_caches_only_complete_primary_answers(cache):
+    def stream_from(model):
+        async def stream():
+            _report_model(model)
+            for token in ("hola", " mundo"):
+                yield token
+        return stream
+
+    async def collect(model):
+        return [t async for t in ac.cached_llm_stream("/test", "col-stream", ["c1"], "p", "q", stream_from(model))]
+
+    assert asyncio.run(collect(FALLBACK_LLM_MODEL)) == ["hola", " mundo"]
+    assert cache.stats()["entries"] == 0
+    asyncio.run(collect(DEFAULT_LLM_MODEL))
+    assert asyncio.run(collect(FALLBACK_LLM_MODEL)) == ["hola mundo"]
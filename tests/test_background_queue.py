@@ -0,0 +1,73 @@
+import asyncio
+import random
+from app.services.background_queue import ShardedTaskQueue
+
+
+def test_tasks_of_a_key_run_in_order_without_overlapping():
+    queue = ShardedTaskQueue("test-order", shards=3, maxsize=100)
+    done = {}
+    running = set()
+    overlaps = []
+
+    async def task(key, i):
+        if key in running:
+            overlaps.append(key)
+        running.add(key)
+        await asyncio.sleep(random.uniform(0, 0.002))
+        running.discard(key)
+        done.setdefault(key, []).append(i)
+
+    async def _run():
+        for i in range(20):
+            for key in ("u1", "u2", "u3", "u4"):
+                await queue.submit(key, task, key, i)
+        await queue.flush(timeout=5)
+
+    asyncio.run(_run())
+    assert all(order == list(range(20)) for order in done.values()) and len(done) == 4
+    assert overlaps == []
+    assert queue.stats()["processed"] == 80
+
+
+def test_failed_task_does_not_stop_the_queue():
+    queue = ShardedTaskQueue("test-fail", shards=1, maxsize=10)
+    done = []
+
+    async def fail():
+        raise RuntimeError("falla")
+
+    async def ok():
+        done.append(True)
+
+    async def _run():
+        await queue.submit("k", fail)
+        await queue.submit("k", ok)
+        await queue.flush(timeout=5)
+
+    asyncio.run(_run())
+    assert done == [True]
+    assert queue.stats()["failed"] == 1 and queue.stats()["processed"] == 2
+
+
+def test_full_queue_applies_backpressure():
+    queue = ShardedTaskQueue("test-backpressure", shards=1, maxsize=1)
+
+    async def _run():
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+
+        await queue.submit("k", slow)   # lo toma el consumidor
+        await asyncio.sleep(0)
+        await queue.submit("k", slow)   # ocupa el único hueco
+        waiter = asyncio.create_task(queue.submit("k", slow))  # tiene que esperar
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        gate.set()
+        await waiter
+        await queue.flush(timeout=5)
+
+    asyncio.run(_run())
+    stats = queue.stats()
+    assert stats["backpressure_waits"] == 1 and stats["processed"] == 3
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services import bm25
+from app.services.bm25 import BM25Index
+from app.services.hybrid import hybrid_query, reciprocal_rank_fusion
+
+_DOCS = {
+    "a": ("el gato duerme en el sofá", [1.0, 0.0]),
+    "b": ("configuración de ChromaDB y HNSW", [0.0, 1.0]),
+    "c": ("el perro ladra al gato", [0.8, 0.2]),
+}
+
+
+class _FakeCollection:
+    metadata = {"hnsw:space": "l2"}
+
+    def __init__(self, name):
+        self.name = name
+        self.pages_read = 0
+
+    def count(self):
+        return len(_DOCS)
+
+    def get(self, ids=None, include=None, limit=None, offset=0):
+        if ids is None:
+            self.pages_read += 1
+            time.sleep(0.01)  # da tiempo a que otras llamadas concurrentes lleguen
+            ids = list(_DOCS)[offset:offset + limit]
+        return {
+            "ids": ids,
+            "documents": [_DOCS[i][0] for i in ids],
+            "metadatas": [{"source": i} for i in ids],
+            "embeddings": [_DOCS[i][1] for i in ids],
+        }
+
+    # Búsqueda vectorial "densa": solo conoce el chunk a
+    def query(self, query_embeddings, n_results):
+        return {"ids": [["a"]], "documents": [[_DOCS["a"][0]]], "metadatas": [[{"source": "a"}]], "distances": [[0.0]]}
+
+
+def test_bm25_search_add_and_remove():
+    index = BM25Index()
+    index.add(list(_DOCS), [text for text, _ in _DOCS.values()])
+    assert [chunk_id for chunk_id, _ in index.search("chromadb", 3)] == ["b"]
+    assert {chunk_id for chunk_id, _ in index.search("GATO", 3)} == {"a", "c"}  # sin distinguir mayúsculas
+
+    index.remove(["a"])
+    index.add(["d"], ["otro gato"])  # reutiliza el slot libre
+    assert {chunk_id for chunk_id, _ in index.search("gato", 3)} == {"c", "d"}
+    assert len(index) == 3
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["x", "y", "z"], ["y", "z"]], k=60) == ["y", "z", "x"]
+
+
+def test_concurrent_first_use_loads_once():
+    collection = _FakeCollection("test-load-once")
+    threads = [threading.Thread(target=bm25.ensure_bm25_index, args=(collection,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert collection.pages_read == 1
+    assert len(bm25.get_bm25_index("test-load-once")) == len(_DOCS)
+
+
+def test_hybrid_query_adds_lexical_only_hits_with_real_distance():
+    collection = _FakeCollection("test-hybrid")
+    results = asyncio.run(hybrid_query(collection, "perro", [1.0, 0.0], n_results=2))
+    ids = results["ids"][0]
+    assert set(ids) == {"a", "c"}
+    distances = dict(zip(ids, results["distances"][0]))
+    assert distances["a"] == 0.0
+    assert distances["c"] == pytest.approx(0.08)  # l2 al cuadrado entre [1, 0] y [0.8, 0.2]
+    assert results["metadatas"][0][ids.index("c")] == {"source": "c"}
@@ -0,0 +1,73 @@
+import os
+import pytest
+from app.services.index_manifest import FileManifest
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name, text in {"a.txt": "uno", "b.txt": "dos", "c.txt": "tres"}.items():
+        (data / name).write_text(text, encoding="utf-8")
+    return data
+
+
+def _paths(data_dir):
+    return sorted(str(p) for p in data_dir.iterdir())
+
+
+def _indexed_manifest(tmp_path, data_dir):
+    manifest = FileManifest(str(tmp_path / "manifest.json"), str(data_dir))
+    for path in _paths(data_dir):
+        manifest.record(path, [f"{os.path.basename(path)}-0"])
+    manifest.save()
+    return FileManifest(str(tmp_path / "manifest.json"), str(data_dir))
+
+
+def test_everything_is_new_without_manifest(tmp_path, data_dir):
+    manifest = FileManifest(str(tmp_path / "manifest.json"), str(data_dir))
+    changed, removed = manifest.diff(_paths(data_dir))
+    assert changed == _paths(data_dir) and removed == []
+
+
+def test_changed_removed_and_unchanged_files(tmp_path, data_dir):
+    manifest = _indexed_manifest(tmp_path, data_dir)
+    (data_dir / "a.txt").write_text("uno editado", encoding="utf-8")
+    (data_dir / "b.txt").unlink()
+    (data_dir / "d.txt").write_text("nuevo", encoding="utf-8")
+
+    changed, removed = manifest.diff(_paths(data_dir))
+    assert [os.path.basename(p) for p in changed] == ["a.txt", "d.txt"]
+    assert removed == ["b.txt"]
+    assert manifest.chunk_ids("b.txt") == ["b.txt-0"]  # para borrar sus chunks
+
+
+def test_touched_file_with_same_content_is_not_reprocessed(tmp_path, data_dir):
+    manifest = _indexed_manifest(tmp_path, data_dir)
+    path = data_dir / "c.txt"
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert manifest.diff(_paths(data_dir)) == ([], [])
+    assert manifest.files["c.txt"]["mtime"] == stat.st_mtime + 10
+
+
+def test_same_size_edit_is_detected_by_hash(tmp_path, data_dir):
+    manifest = _indexed_manifest(tmp_path, data_dir)
+    path = data_dir / "a.txt"
+    stat = path.stat()
+    path.write_text("UNO", encoding="utf-8")  # mismo tamaño
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    changed, _ = manifest.diff(_paths(data_dir))
+    assert [os.path.basename(p) for p in changed] == ["a.txt"]
+
+
+def test_reset_and_referenced_ids(tmp_path, data_dir):
+    manifest = _indexed_manifest(tmp_path, data_dir)
+    assert manifest.referenced_ids() == {"a.txt-0", "b.txt-0", "c.txt-0"}
+    manifest.forget("a.txt")
+    assert "a.txt-0" not in manifest.referenced_ids()
+    manifest.reset()
+    changed, removed = manifest.diff(_paths(data_dir))
+    assert len(changed) == 3 and removed == []
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.services.index_state import IndexState, get_index_state, require_index_ready
+
+
+def test_progress_and_eta_estimate():
+    state = IndexState("t")
+    state.start(files_total=4)
+    state.progress(10)
+    state.file_done()
+    snapshot = state.snapshot()
+    assert snapshot["state"] == "building"
+    assert snapshot["chunks_total"] == 40  # estimado: 10 chunks por fichero
+    assert snapshot["files_done"] == 1 and snapshot["eta_seconds"] is not None
+
+
+def test_building_marks_failed_on_error():
+    state = IndexState("t")
+    with pytest.raises(RuntimeError):
+        with state.building():
+            raise RuntimeError("roto")
+    assert state.snapshot()["state"] == "failed" and state.error == "roto"
+
+
+def test_concurrent_file_done_is_not_lost():
+    state = IndexState("t")
+    state.start(files_total=8000)
+
+    def work():
+        for _ in range(1000):
+            state.file_done()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state.files_done == 8000
+
+
+def test_require_index_ready_returns_503_with_retry_after():
+    get_index_state("test-not-ready").start()
+    dependency = require_index_ready("test-not-ready", wait=0.01)
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(dependency())
+    assert info.value.status_code == 503
+    assert info.value.headers["Retry-After"] == "5"
+    assert info.value.detail["state"] == "building"
+
+
+def test_require_index_ready_waits_for_the_build():
+    state = get_index_state("test-becomes-ready")
+    state.start()
+
+    async def _run():
+        waiting = asyncio.create_task(require_index_ready("test-becomes-ready", wait=5)())
+        await asyncio.sleep(0.01)
+        threading.Thread(target=state.finish).start()  # el indexado termina en otro hilo
+        await waiting
+
+    asyncio.run(_run())
+    assert state.snapshot()["state"] == "ready"
@@ -0,0 +1,75 @@
+import asyncio
+import httpx
+from openai import APITimeoutError
+from app.services import llm_client
+from config_base import DEFAULT_LLM_MODEL, FALLBACK_LLM_MODEL, LLM_MAX_CONCURRENCY_PER_MODEL
+
+# Sustituye la llamada a OpenRouter por create(model, **kwargs)
+
+
+def _patch_create(monkeypatch, create):
+    async def fake_create(*, model, **kwargs):
+        return await create(model, **kwargs)
+    monkeypatch.setattr(llm_client.client.chat.completions, "create", fake_create)
+
+
+def _free_slots(model):
+    return llm_client._semaphore(model)._value
+
+
+def test_stream_cancelled_while_connecting_releases_slot(monkeypatch):
+    connecting = asyncio.Event()
+
+    async def create(model, **kwargs):
+        connecting.set()
+        await asyncio.sleep(3600)
+
+    _patch_create(monkeypatch, create)
+
+    async def _run():
+        async def consume():
+            async for _ in llm_client.llm_stream("hola"):
+                pass
+        task = asyncio.create_task(consume())
+        await connecting.wait()
+        assert _free_slots(DEFAULT_LLM_MODEL) == LLM_MAX_CONCURRENCY_PER_MODEL - 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert _free_slots(DEFAULT_LLM_MODEL) == LLM_MAX_CONCURRENCY_PER_MODEL
+
+    asyncio.run(_run())
+
+
+def test_primary_timeout_goes_straight_to_fallback(monkeypatch):
+    calls = []
+
+    class _Message:
+        content = "respuesta"
+
+    class _Choice:
+        message = _Message()
+
+    class _Response:
+        choices = [_Choice()]
+
+    async def create(model, **kwargs):
+        calls.append(model)
+        if model == DEFAULT_LLM_MODEL:
+            raise APITimeoutError(request=httpx.Request("POST", "http://test"))
+        return _Response()
+
+    _patch_create(monkeypatch, create)
+    monkeypatch.setattr(llm_client, "LLM_HEDGING_ENABLED", False)
+
+    with llm_client.track_llm_models() as models:
+        answer = asyncio.run(llm_client.llm("hola"))
+
+    assert answer == "respuesta"
+    assert calls == [DEFAULT_LLM_MODEL, FALLBACK_LLM_MODEL]
+    assert models == [FALLBACK_LLM_MODEL]
+
+
+def test_chain_model_shares_concurrency_limit():
+    chat = llm_client.llm_chain()
+    assert isinstance(chat, llm_client._LimitedChatOpenAI)
+    assert chat.model_name == DEFAULT_LLM_MODEL